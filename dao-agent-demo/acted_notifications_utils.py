@@ -0,0 +1,281 @@
+import os
+import uuid
+import atexit
+import threading
+
+from time import time
+from datetime import datetime, timedelta
+from typing import List, Dict, Tuple, Iterable, Callable, Optional
+
+from dotenv import load_dotenv
+
+from file_lock_utils import file_lock, write_file_atomic
+
+load_dotenv()
+
+# append-only log of acted notification hashes, one "<timestamp> <hash>" line each, claims are
+# "<timestamp> <hash> claim <owner> <expires>" and "<timestamp> <hash> release <owner>" lines
+ACTED_NOTIFICATIONS_FILE = os.getenv("ACTED_NOTIFICATIONS_FILE", "acted_notifications.log")
+# acted hashes older than this are dropped, notifications older than a day are never picked up again
+ACTED_NOTIFICATIONS_TTL_SEC = int(os.getenv("ACTED_NOTIFICATIONS_TTL_SEC", 86400))
+# seconds a claimed notification is held for its owner, a crashed process's claims expire after this
+ACTED_CLAIM_TTL_SEC = int(os.getenv("ACTED_CLAIM_TTL_SEC", 600))
+# seconds between compactions of the log
+ACTED_COMPACT_INTERVAL_SEC = 3600
+
+
+class ActedNotifications:
+    def __init__(self, path: Optional[str] = None, legacy: Optional[Callable[[], Iterable[Dict]]] = None,
+                 ttl: Optional[float] = ACTED_NOTIFICATIONS_TTL_SEC):
+        """
+        Acted notification hashes, kept in memory for O(1) membership and appended to a log file
+        Hashes older than `ttl` are compacted out of the log at start and then at most once an hour.
+        Processes sharing the log take a file lock and read the lines the others appended before every
+        change, so `claim` and `add` are a test and set across all of them.
+        A claim is a lease owned by this instance: it turns into an acted hash with `add`, is given up with
+        `release` (and at exit), and expires after ACTED_CLAIM_TTL_SEC if the process dies.
+        Args:
+            path (Optional[str]): The log file, defaults to ACTED_NOTIFICATIONS_FILE
+            legacy (Optional[Callable]): Returns the {'hash', 'timestamp'} records to import once, when the log does not exist yet
+            ttl (Optional[float]): Seconds a hash is kept, None (or 0) keeps all
+        """
+        self.path = path or ACTED_NOTIFICATIONS_FILE
+        self.lock_path = f"{self.path}.lock"
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        # hash -> iso timestamp it was acted on
+        self.acted: Dict[str, str] = {}
+        # hash -> (owner, expiry epoch seconds) of the claims not acted on or released yet
+        self.leases: Dict[str, Tuple[str, float]] = {}
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        # the log file read so far (inode, bytes), a compaction by another process replaces the file
+        self.inode: Optional[int] = None
+        self.offset = 0
+        self.compacted_at = 0.0
+        with self.lock, file_lock(self.lock_path):
+            if os.path.exists(self.path):
+                self._load()
+            elif legacy is not None:
+                self._import(legacy())
+            self._compact()
+        atexit.register(self.release_all)
+
+    def _load(self):
+        """Read the lines appended since the last read, or the whole log if it was rewritten, the caller holds the locks"""
+        try:
+            with open(self.path, "rb") as log_file:
+                stat = os.fstat(log_file.fileno())
+                if stat.st_ino != self.inode or stat.st_size < self.offset:
+                    self.acted.clear()
+                    self.leases.clear()
+                    self.inode, self.offset = stat.st_ino, 0
+                log_file.seek(self.offset)
+                lines = log_file.read().decode().splitlines(keepends=True)
+            for line in lines:
+                # a line without a newline is still being written
+                if not line.endswith("\n"):
+                    break
+                self.offset += len(line.encode())
+                self._apply(line.split())
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error loading acted notifications: {str(e)}")
+
+    def _apply(self, fields: List[str]):
+        """Apply one log line split in fields"""
+        if len(fields) == 2:
+            timestamp, notification_hash = fields
+            self.acted.setdefault(notification_hash, timestamp)
+            self.leases.pop(notification_hash, None)
+        elif len(fields) == 5 and fields[2] == "claim":
+            self.leases[fields[1]] = (fields[3], float(fields[4]))
+        elif len(fields) == 4 and fields[2] == "release" and self.leases.get(fields[1], ("",))[0] == fields[3]:
+            del self.leases[fields[1]]
+
+    def _append(self, line: str):
+        """Append a synced line to the log, the caller holds the locks and has read the log to its end"""
+        with open(self.path, "a") as log_file:
+            log_file.write(line)
+            log_file.flush()
+            os.fsync(log_file.fileno())
+            stat = os.fstat(log_file.fileno())
+        # nobody else writes while the lock is held, the log is read up to its end
+        self.inode, self.offset = stat.st_ino, stat.st_size
+
+    def _held_by_other(self, notification_hash: str) -> bool:
+        owner, expires = self.leases.get(notification_hash, (self.owner, 0.0))
+        return owner != self.owner and expires > time()
+
+    def _import(self, records: Iterable[Dict]):
+        """Write the hashes stored before the log existed into a new log"""
+        for record in records:
+            if record.get('hash'):
+                self.acted.setdefault(record['hash'], record.get('timestamp') or datetime.utcnow().isoformat())
+        try:
+            self._rewrite()
+            if self.acted:
+                print(f"imported {len(self.acted)} acted notifications into {self.path}")
+        except Exception as e:
+            print(f"Error importing acted notifications: {str(e)}")
+
+    def _rewrite(self):
+        """Write the current hashes to a new log (synced temp file, then rename), the caller holds the locks"""
+        now = datetime.utcnow().isoformat()
+        write_file_atomic(self.path, "".join(
+            [f"{timestamp} {notification_hash}\n" for notification_hash, timestamp in self.acted.items()] +
+            [f"{now} {notification_hash} claim {owner} {expires}\n"
+             for notification_hash, (owner, expires) in self.leases.items()]))
+        stat = os.stat(self.path)
+        self.inode, self.offset = stat.st_ino, stat.st_size
+
+    def _compact(self) -> int:
+        """
+        Drop the hashes older than the ttl and the expired claims and rewrite the log, the caller holds the locks
+        Returns:
+            int: Number of hashes dropped
+        """
+        self.compacted_at = time()
+        expired_leases = [notification_hash for notification_hash, (_, expires) in self.leases.items()
+                          if expires <= self.compacted_at]
+        for notification_hash in expired_leases:
+            del self.leases[notification_hash]
+        expired = []
+        if self.ttl:
+            cutoff = (datetime.utcnow() - timedelta(seconds=self.ttl)).isoformat()
+            # iso timestamps of the same format sort like the times they stand for
+            expired = [notification_hash for notification_hash, timestamp in self.acted.items() if timestamp < cutoff]
+            for notification_hash in expired:
+                del self.acted[notification_hash]
+        if not expired and not expired_leases:
+            return 0
+        try:
+            self._rewrite()
+            print(f"compacted {len(expired)} acted notifications older than {self.ttl}s "
+                  f"and {len(expired_leases)} expired claims")
+        except Exception as e:
+            print(f"Error compacting acted notifications: {str(e)}")
+        return len(expired)
+
+    def compact(self) -> int:
+        """
+        Drop the hashes older than the ttl from memory and from the log
+
+        Returns:
+            int: Number of hashes dropped
+        """
+        with self.lock, file_lock(self.lock_path):
+            self._load()
+            return self._compact()
+
+    def claim(self, notification_hash: str, lease: float = ACTED_CLAIM_TTL_SEC) -> bool:
+        """
+        Claim a notification for this instance before acting on it (test and set), claiming again renews the lease
+
+        Args:
+            notification_hash (str): The cast hash of the notification
+            lease (float): Seconds the claim is held
+
+        Returns:
+            bool: True if this instance holds the claim, False if it was acted on or another owner holds it
+        """
+        with self.lock, file_lock(self.lock_path):
+            self._load()
+            if notification_hash in self.acted or self._held_by_other(notification_hash):
+                return False
+            expires = round(time() + lease, 3)
+            self._append(f"{datetime.utcnow().isoformat()} {notification_hash} claim {self.owner} {expires}\n")
+            self.leases[notification_hash] = (self.owner, expires)
+            return True
+
+    def release(self, notification_hash: str) -> bool:
+        """
+        Give up a claim of this instance, so the notification can be claimed again (ex: the reply failed)
+
+        Args:
+            notification_hash (str): The cast hash of the notification
+
+        Returns:
+            bool: True if a claim was released
+        """
+        with self.lock, file_lock(self.lock_path):
+            self._load()
+            if self.leases.get(notification_hash, ("",))[0] != self.owner:
+                return False
+            self._append(f"{datetime.utcnow().isoformat()} {notification_hash} release {self.owner}\n")
+            del self.leases[notification_hash]
+            return True
+
+    def release_all(self):
+        """Release every claim of this instance (at exit)"""
+        for notification_hash in [notification_hash for notification_hash, (owner, _) in list(self.leases.items())
+                                  if owner == self.owner]:
+            try:
+                self.release(notification_hash)
+            except Exception as e:
+                print(f"Error releasing notification claim: {str(e)}")
+
+    def add(self, notification_hash: str) -> bool:
+        """
+        Mark a notification as acted (test and set), a claim of this instance becomes the acted hash
+
+        Args:
+            notification_hash (str): The cast hash of the notification
+
+        Returns:
+            bool: True if it was not acted on before, False if it already was or another owner claimed it
+        """
+        with self.lock, file_lock(self.lock_path):
+            self._load()
+            if notification_hash in self.acted or self._held_by_other(notification_hash):
+                return False
+            if time() - self.compacted_at > ACTED_COMPACT_INTERVAL_SEC:
+                self._compact()
+            timestamp = datetime.utcnow().isoformat()
+            self._append(f"{timestamp} {notification_hash}\n")
+            self.acted[notification_hash] = timestamp
+            self.leases.pop(notification_hash, None)
+            return True
+
+    def is_acted(self, notification_hash: str) -> bool:
+        """
+        Args:
+            notification_hash (str): The cast hash of the notification
+        Returns:
+            bool: True if the notification was acted on (by this process, or by another one before the last change)
+        """
+        return notification_hash in self.acted
+
+    def is_claimed(self, notification_hash: str) -> bool:
+        """
+        Args:
+            notification_hash (str): The cast hash of the notification
+        Returns:
+            bool: True if another owner holds an unexpired claim (as of the last change of this instance)
+        """
+        return self._held_by_other(notification_hash)
+
+    def holds(self, notification_hash: str) -> bool:
+        """
+        Args:
+            notification_hash (str): The cast hash of the notification
+        Returns:
+            bool: True if this instance holds an unexpired claim
+        """
+        owner, expires = self.leases.get(notification_hash, ("", 0.0))
+        return owner == self.owner and expires > time()
+
+    def __contains__(self, notification_hash: str) -> bool:
+        return self.is_acted(notification_hash)
+
+    def __len__(self) -> int:
+        return len(self.acted)
+
+    def all(self) -> List[Dict]:
+        """
+        Returns:
+            List[Dict]: {'hash', 'timestamp'} of every acted notification
+        """
+        with self.lock:
+            return [{'hash': notification_hash, 'timestamp': timestamp}
+                    for notification_hash, timestamp in self.acted.items()]
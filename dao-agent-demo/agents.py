@@ -2,7 +2,9 @@ import os
 import json
 
 from decimal import Decimal
-from typing import Union
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Union, Optional
 
 from openai import OpenAI
 from swarm import Agent
@@ -12,9 +14,15 @@ from eth_account import Account
 
 
 from farcaster_utils import FarcasterBot
+from farcaster_async_utils import SyncFarcasterBot
+from cast_queue_utils import CastQueue
+from thread_context_utils import ThreadContext
+from graph_format_utils import format_records
 from graph_utils import DaohausGraphData
+from dao_analytics_utils import DaoAnalytics
 from image_utils import ImageThumbnailer
 from memory_retention_utils import MemoryRetention
+from memory_consolidation_utils import MemoryConsolidator
 
 from dao_summon_helpers import assemble_meme_summoner_args, calculate_dao_address, assemble_yeeter_summoner_args
 
@@ -502,19 +510,34 @@ def get_proposal_count() -> str:
     except Exception as e:
         return f"Error getting proposals count: {str(e)}"
 
+def get_dao_analytics() -> str:
+    """
+    Get DAO governance analytics: pass rate, time to pass, turnout trend by month and top voters
+
+    Returns:
+        str: A small JSON summary of the DAO governance history
+    """
+    try:
+        return dao_analytics.get_summary()
+    except Exception as e:
+        return f"Error getting DAO analytics: {str(e)}"
+
 # function to cast to farcaster
-def cast_to_farcaster(content: str, channel_id: str = None) -> str:
+def cast_to_farcaster(content: str, channel_id: str = None, notification_hash: str = None) -> str:
     """
     Cast a message to Warpcast.
 
     Args:
         content (str): The content to cast
         channel_id (Optional[str]): The channel ID
+        notification_hash (Optional[str]): The hash of the notification this cast answers, if any. It is marked
+            as acted once the cast is posted, or released if posting fails
 
     Returns:
-        str: Status message about the cast
+        str: Status message about the cast (casts are queued and posted in the background)
     """
-    return farcaster_bot.post_cast(content, channel_id)
+    notification = notification_hash if notification_hash and memory_retention.holds_notification_claim(notification_hash) else None
+    return cast_queue.enqueue(content, channel_id, notification=notification)
 
 def check_cast_replies():
     """
@@ -535,32 +558,67 @@ def check_all_past_notifications():
     """
     return farcaster_bot.get_notifications()
 
-def check_recent_cast_notifications():
+def _unacted_notifications(fetch: bool = True):
     """
-    Check for a recent farcaster notification that is not acted on and not older than a day.
+    The pending notifications of the last day that no agent process acted on, oldest first
 
-    wrapcast url will be in this format: (https://warpcast.com/<author>/<hash>) 
+    Args:
+        fetch (bool): Ask farcaster for new notifications first (False only reads the pending ones)
 
     Returns:
-        str: Formatted string of recent notifications
+        list: The notifications, or the error message
     """
-    all_notifications = farcaster_bot.get_notifications()
+    # only notifications newer than the last fetch are requested, older unacted ones stay pending
+    all_notifications = farcaster_bot.get_pending_notifications(fetch)
     if isinstance(all_notifications, str):  # If an error occurred
         return all_notifications
-    acted_notifications = memory_retention.get_acted_notifications()
-    print("acted notes", acted_notifications)
-    # If no acted notifications exist, create an empty set
-    acted_hashes = {item.get('hash') for item in acted_notifications if 'hash' in item} if acted_notifications else set()
-    print("acted ahshes", acted_hashes)
-    # Filter out already acted notifications
-    new_notifications = [n for n in all_notifications if n['hash'] not in acted_hashes and n['age_in_sec'] <= 86400]
+    # Filter out already acted notifications (a set lookup per notification, independent of the history size)
+    # a notification with a reply pending or sent from the cast queue is answered already
+    new_notifications = [n for n in all_notifications
+                         if not memory_retention.is_notification_acted(n['hash']) and n['age_in_sec'] <= 86400
+                         and not cast_queue.is_answering(n['hash'])]
     print("new notes", new_notifications)
-    # Return the oldest notification based on 'age_in_sec', or None if no notifications exist
-    if new_notifications:
-        print("oldest, latest", min(new_notifications, key=lambda n: n['age_in_sec']))
-        return min(new_notifications, key=lambda n: n['age_in_sec'])
-    else:
-        return None
+    return sorted(new_notifications, key=lambda n: n['age_in_sec'])
+
+def has_recent_cast_notifications(fetch: bool = True) -> bool:
+    """
+    Check if there is a notification to act on, without claiming it (used by the autonomous loop)
+
+    Args:
+        fetch (bool): Ask farcaster for new notifications first (False only reads the pending ones)
+
+    Returns:
+        bool: True if a notification is waiting
+    """
+    notifications = _unacted_notifications(fetch)
+    return not isinstance(notifications, str) and len(notifications) > 0
+
+def check_recent_cast_notifications(fetch: bool = True):
+    """
+    Check for a recent farcaster notification that is not acted on and not older than a day.
+
+    wrapcast url will be in this format: (https://warpcast.com/<author>/<hash>) 
+
+    The notification comes with a `context` block (thread, author profile and the author's recent casts),
+    so there is no need to look those up separately before replying.
+
+    Args:
+        fetch (bool): Ask farcaster for new notifications first (False only reads the pending ones)
+
+    Returns:
+        str: Formatted string of recent notifications
+    """
+    notifications = _unacted_notifications(fetch)
+    if isinstance(notifications, str):
+        return notifications
+    # Return the oldest notification based on 'age_in_sec', or None if no notifications exist.
+    # It is claimed first, so an agent process sharing the memories never replies to the same cast
+    for latest in notifications:
+        if not memory_retention.claim_notification(latest['hash']):
+            continue
+        print("oldest, latest", latest)
+        return {**latest, "context": thread_context.get_context(latest)}
+    return None
 
 def mark_notification_as_acted(notification_hash: str):
 
@@ -570,8 +628,24 @@ def mark_notification_as_acted(notification_hash: str):
     Returns:
         bool: Status message about the cast
     """
+    if cast_queue.is_pending_reply(notification_hash):
+        # the queue marks it once the reply is posted, or releases it if the reply fails
+        return "The reply is still being posted, the notification is marked as acted once it is sent."
+    farcaster_bot.discard_notification(notification_hash)
     return memory_retention.mark_notification_as_acted(notification_hash)
 
+def release_notification(notification_hash: str):
+    """
+    Release a notification that could not be acted on (ex: the cast or transaction failed), so it is tried again.
+
+    Args:
+        notification_hash (str): The cast hash of the notification
+
+    Returns:
+        bool: True if the notification was released
+    """
+    return memory_retention.release_notification(notification_hash)
+
 def cast_reply(content: str, parentHash: str, parent_fid: int):
     """
     Cast a message to Warpcast as a reply to another cast.
@@ -582,11 +656,28 @@ def cast_reply(content: str, parentHash: str, parent_fid: int):
         parentHash (str): The parent cast hash (for reply)
 
     Returns:
-        str: Status message about the cast
+        str: Status message about the cast (casts are queued and posted in the background)
     """
-    response = farcaster_bot.post_cast(content, parent=parentHash, parent_fid=parent_fid)
+    # a reply to a claimed notification settles it: acted once posted, released if posting fails
+    notification = parentHash if memory_retention.holds_notification_claim(parentHash) else None
+    response = cast_queue.enqueue(content, parent=parentHash, parent_fid=parent_fid, notification=notification)
     return response
 
+def _settle_reply(notification_hash: str, sent: Optional[bool]):
+    """Called by the cast queue for a reply to a claimed notification (sent None while it is still pending)"""
+    if sent:
+        farcaster_bot.discard_notification(notification_hash)
+    memory_retention.settle_notification(notification_hash, sent)
+
+def check_outbound_casts():
+    """
+    Check the status of recently queued casts and replies (pending, sent or failed).
+
+    Returns:
+        str: List of recent casts with key, status, attempts, parent, cast hash and error
+    """
+    return cast_queue.get_status()
+
 def check_recent_agent_casts():
     """
     Get recent casts from the agent.
@@ -607,6 +698,28 @@ def check_recent_user_casts(fid: str):
     response = farcaster_bot.get_casts(fid)
     return response
 
+def check_cast_history(fid: str = "", hours: int = 24, max_count: int = 50, replies_only: bool = False):
+    """
+    Get the cast history of a user (or the agent) over a time window, newest first.
+    Use it to review a user's activity or audit what the agent posted.
+
+    Args:
+        fid (str): The fid of the user, empty for the agent
+        hours (int): How many hours back to look
+        max_count (int): Max casts returned
+        replies_only (bool): Only the replies of the user
+
+    Returns:
+        str: Compact list of casts (timestamp, hash, text), long results are cut to a token budget
+    """
+    try:
+        since = datetime.utcnow() - timedelta(hours=hours)
+        casts = farcaster_bot.iter_replies(fid or None, since) if replies_only \
+            else farcaster_bot.iter_casts(fid or None, since)
+        return format_records(list(islice(casts, max_count)))
+    except Exception as e:
+        return f"Error getting cast history: {str(e)}"
+
 def check_user_profile(fid: str):
     """
     Get user profile.
@@ -617,6 +730,18 @@ def check_user_profile(fid: str):
     response = farcaster_bot.get_user_by_username(fid)
     return response
 
+def check_user_profiles(users: str):
+    """
+    Get several user profiles in one lookup.
+
+    Args:
+        users (str): Comma separated fids or usernames (exclude @ sign)
+
+    Returns:
+        str: List of user profiles (fid, username, bio, follower counts, verified addresses)
+    """
+    return farcaster_bot.get_users([user.strip() for user in users.split(",") if user.strip()])
+
 # Functions to interact with memory retention
 # def store_memory(self, memory: Dict) -> str:
 def commit_memory(memory:str):
@@ -624,26 +749,88 @@ def commit_memory(memory:str):
     Store a memory
     """
     return memory_retention.store_memory({"type": "memory", "content": memory})
-def get_all_memories():
+def _memory_page(memories, total, offset: int, limit: int):
+    """Wrap a page of memories with the total and the offset of the next page"""
+    if isinstance(memories, str):
+        return memories
+    next_offset = offset + len(memories) if offset + len(memories) < total else None
+    return {"memories": memories, "total": total, "next_offset": next_offset}
+def get_all_memories(limit: int = 20, offset: int = 0, newest_first: bool = True, fields: str = ""):
     """
-    Get all memories
+    Get memories page by page, newest first by default
+
+    Args:
+        limit (int): Max memories returned (default 20, max 100)
+        offset (int): Memories skipped, use next_offset of the previous page
+        newest_first (bool): Most recent memories first (default True)
+        fields (str): Comma separated fields to return (ex: "content,timestamp"), all when empty
+
+    Returns:
+        Dict: memories, total and next_offset (None on the last page)
     """
-    return memory_retention.get_all_memories()
-def get_memories(query):
+    limit, offset = min(max(int(limit), 1), 100), max(int(offset), 0)
+    fields = [field.strip() for field in fields.split(",") if field.strip()]
+    memories = memory_retention.get_all_memories(limit, offset, newest_first=newest_first, fields=fields)
+    return _memory_page(memories, memory_retention.get_memory_count(), offset, limit)
+def recall_memories(query: str, k: int = 5):
     """
-    Get memories
+    Recall the memories most related to a text (ex: the notification you are answering),
+    use this instead of get_all_memories
+
+    Args:
+        query (str): The text to find related memories for
+        k (int): Max memories returned (default 5)
+
+    Returns:
+        List: The memories with a similarity score, most similar first
+    """
+    return memory_retention.recall_memories(query, min(max(int(k), 1), 20))
+def get_memories(query, limit: int = 20, offset: int = 0, newest_first: bool = True, fields: str = ""):
     """
-    return memory_retention.get_memories(query)
+    Get memories of a type page by page, newest first by default
+    Old memories are consolidated into memories of type "summary" (by day, then week, then month), get them
+    with {"type": "summary"}.
+
+    Args:
+        query (Dict): The memory type ({"type": "memory"} or {"type": "summary"})
+        limit (int): Max memories returned (default 20, max 100)
+        offset (int): Memories skipped, use next_offset of the previous page
+        newest_first (bool): Most recent memories first (default True)
+        fields (str): Comma separated fields to return, all when empty
+
+    Returns:
+        Dict: memories, total and next_offset (None on the last page)
+    """
+    limit, offset = min(max(int(limit), 1), 100), max(int(offset), 0)
+    fields = [field.strip() for field in fields.split(",") if field.strip()]
+    memories = memory_retention.get_memories(query, limit, offset, newest_first=newest_first, fields=fields)
+    return _memory_page(memories, memory_retention.get_memory_count(query), offset, limit)
+def get_memory_sources(summary_id: int, archived: bool = False):
+    """
+    Get the original memories a summary memory (type "summary") was made from
+    The sources of a week or month summary are day or week summaries, get their own sources with archived=True.
+
+    Args:
+        summary_id (int): The id of the summary
+        archived (bool): The summary is one of the sources returned before (an archived summary)
+
+    Returns:
+        List: The original memories
+    """
+    return memory_retention.get_memory_sources(int(summary_id), archived)
 def delete_memory(query):
     """
-    Delete a memory
+    Delete the memories of a type ({"type": ...}), consolidated memories have the type "summary"
     """
     return memory_retention.delete_memory(query)
-def get_memory_count():
+def get_memory_count(memory_type: str = ""):
     """
     Get the count of memories
+
+    Args:
+        memory_type (str): Only count memories of this type, all when empty
     """
-    return memory_retention.get_memory_count()
+    return memory_retention.get_memory_count({"type": memory_type} if memory_type else None)
 def get_knowledge_by_keywords(keywords: str) -> str:
     """
     get knowledge content from keywords
@@ -656,6 +843,23 @@ def get_knowledge_by_keywords(keywords: str) -> str:
     """
     print(keywords.lower().strip().split())
     return memory_retention.query_by_keywords(keywords.lower().strip().split())
+def search_knowledge(query: str, k: int = 5) -> str:
+    """
+    search the knowledge base with a free text question, returns the best matching passages ranked by score
+
+    Args:
+        query (str): The question or words to search for
+        k (int): Max passages returned (default 5)
+
+    Returns:
+        str: The passages with their file name and score, best first
+    """
+    results = memory_retention.search_knowledge(query, min(max(int(k), 1), 20))
+    if isinstance(results, str):
+        return results
+    if not results:
+        return f"No knowledge found for '{query}'."
+    return "\n\n".join(f"[{result['score']}] {result['file_name']}: {result['passage']}" for result in results)
 # Create the DAO Agent with all available functions
 
 print("Creating Agent...")
@@ -674,10 +878,14 @@ def dao_agent(instructions: str ):
         check_recent_cast_notifications,
         check_all_past_notifications,
         mark_notification_as_acted,
+        release_notification,
         cast_reply,
+        check_outbound_casts,
         check_recent_agent_casts,
         check_recent_user_casts,
         check_user_profile,
+        check_user_profiles,
+        check_cast_history,
         submit_dao_proposal,
         vote_on_dao_proposal,
         # get_current_proposal_count
@@ -686,19 +894,32 @@ def dao_agent(instructions: str ):
         get_dao_proposal,
         get_proposal_count,
         get_proposal_votes_data,
+        get_dao_analytics,
         summon_meme_token_dao,
         summon_crowd_fund_dao,
         commit_memory,
         get_all_memories,
-        get_knowledge_by_keywords
+        recall_memories,
+        get_memory_sources,
+        get_knowledge_by_keywords,
+        search_knowledge
 
     ],
 )
 
 # Initialize FarcvasterBot with your credentials
-farcaster_bot = FarcasterBot()
+# FARCASTER_ASYNC=true runs the asyncio client behind blocking wrappers (concurrent reads, one pool)
+farcaster_bot = SyncFarcasterBot() if os.getenv("FARCASTER_ASYNC", "false").lower() == "true" else FarcasterBot()
+# casts and replies are persisted and posted by a background worker
+cast_queue = CastQueue(farcaster_bot, on_settle=_settle_reply)
+# thread, author profile and recent casts of incoming mentions, fetched in parallel and cached
+thread_context = ThreadContext(farcaster_bot)
 # init the graph
 dh_graph = DaohausGraphData()
+# governance analytics over the dao history
+dao_analytics = DaoAnalytics(dh_graph)
 # init memory retention
 memory_retention = MemoryRetention()
+# old memories are replaced by summaries in the background
+memory_consolidator = MemoryConsolidator(memory_retention)
     
@@ -0,0 +1,161 @@
+import io
+import os
+import uuid
+import asyncio
+import argparse
+
+from time import perf_counter
+from typing import Dict, List, Callable
+from contextlib import redirect_stdout
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_neynar_server import start_fake_neynar_server
+
+# the client side limiter would cap every variant at the same rate, the benchmark measures the transport
+UNLIMITED = {name: (1e9, 10**9, 0) for name in ("all", "read", "write")}
+
+# method name -> call with the bot and the call index (sync methods return results, async ones coroutines)
+CALLS: Dict[str, Callable] = {
+    "get_notifications": lambda bot, i: bot.get_notifications(),
+    "get_replies": lambda bot, i: bot.get_replies(),
+    "get_casts": lambda bot, i: bot.get_casts(str(2 + i % 19)),
+    "get_user_by_username": lambda bot, i: bot.get_user_by_username(f"user{2 + i % 19}"),
+    "post_cast": lambda bot, i: bot.post_cast(f"benchmark cast {i} {uuid.uuid4().hex[:8]}"),
+    "mark_notifications_as_seen": lambda bot, i: bot.mark_notifications_as_seen(),
+}
+
+VARIANTS = ("unpooled", "pooled", "async")
+
+
+def _failed(result) -> bool:
+    return isinstance(result, str) and result.startswith("Error")
+
+
+def _summary(method: str, stats, errors: int, elapsed: float) -> Dict:
+    return {
+        "method": method,
+        "calls": stats.count,
+        "errors": errors,
+        "req_s": round(stats.count / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(stats.percentile(50), 1),
+        "p99_ms": round(stats.percentile(99), 1),
+    }
+
+
+def run_sync(base_url: str, pooled: bool, methods: List[str], calls: int, concurrency: int,
+             client_limits: bool) -> List[Dict]:
+    """
+    Benchmark FarcasterBot with a thread pool
+    Args:
+        base_url (str): The api url
+        pooled (bool): Reuse connections (False sends Connection: close, a new connection per request)
+        methods (List[str]): Methods to call
+        calls (int): Calls per method
+        concurrency (int): Concurrent callers
+        client_limits (bool): Keep the client side rate limiter
+    Returns:
+        List[Dict]: Results per method
+    """
+    from farcaster_utils import FarcasterBot, EndpointStats
+
+    bot = FarcasterBot(base_url=base_url, backoff=0.05, max_backoff=1,
+                       rate_limits=None if client_limits else UNLIMITED)
+    bot.profiles.ttl = -1
+    if not pooled:
+        bot.session.headers["Connection"] = "close"
+
+    results = []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for method in methods:
+            stats, errors = EndpointStats(window=calls), 0
+
+            def call(i: int):
+                start = perf_counter()
+                result = CALLS[method](bot, i)
+                stats.record((perf_counter() - start) * 1000, error=_failed(result))
+                return _failed(result)
+
+            start = perf_counter()
+            errors = sum(executor.map(call, range(calls)))
+            results.append(_summary(method, stats, errors, perf_counter() - start))
+    bot.session.close()
+    return results
+
+
+async def _run_async(base_url: str, methods: List[str], calls: int, concurrency: int,
+                     client_limits: bool) -> List[Dict]:
+    from farcaster_utils import EndpointStats
+    from farcaster_async_utils import AsyncFarcasterBot
+
+    bot = AsyncFarcasterBot(base_url=base_url, backoff=0.05, max_backoff=1, max_connections=concurrency,
+                            rate_limits=None if client_limits else UNLIMITED)
+    bot.profiles.ttl = -1
+    semaphore = asyncio.Semaphore(concurrency)
+
+    results = []
+    for method in methods:
+        stats = EndpointStats(window=calls)
+
+        async def call(i: int) -> bool:
+            async with semaphore:
+                start = perf_counter()
+                result = await CALLS[method](bot, i)
+                stats.record((perf_counter() - start) * 1000, error=_failed(result))
+                return _failed(result)
+
+        start = perf_counter()
+        errors = sum(await asyncio.gather(*(call(i) for i in range(calls))))
+        results.append(_summary(method, stats, errors, perf_counter() - start))
+    await bot.aclose()
+    return results
+
+
+def run_async(base_url: str, methods: List[str], calls: int, concurrency: int, client_limits: bool) -> List[Dict]:
+    """
+    Benchmark AsyncFarcasterBot with `concurrency` coroutines in flight
+    Returns:
+        List[Dict]: Results per method
+    """
+    return asyncio.run(_run_async(base_url, methods, calls, concurrency, client_limits))
+
+
+def print_results(variant: str, results: List[Dict]):
+    print(f"\n{variant}")
+    print(f"{'method':<28}{'calls':>7}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for row in results:
+        print(f"{row['method']:<28}{row['calls']:>7}{row['errors']:>8}{row['req_s']:>10}"
+              f"{row['p50_ms']:>10}{row['p99_ms']:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the farcaster clients against the fake neynar api.")
+    parser.add_argument('--url', type=str, default=None, help="Api url (default: start a local fake server)")
+    parser.add_argument('--calls', type=int, default=200, help="Calls per method (default: 200)")
+    parser.add_argument('--concurrency', type=int, default=8, help="Concurrent callers (default: 8)")
+    parser.add_argument('--variants', type=str, default=",".join(VARIANTS), help="Comma separated: unpooled,pooled,async")
+    parser.add_argument('--methods', type=str, default=",".join(CALLS), help="Comma separated bot methods")
+    parser.add_argument('--client_limits', action='store_true', help="Keep the client side rate limiter")
+    parser.add_argument('--latency_ms', type=float, default=20, help="Fake server latency per request in ms")
+    parser.add_argument('--jitter_ms', type=float, default=5, help="Fake server latency variation in ms")
+    parser.add_argument('--error_rate', type=float, default=0, help="Fake server share of 503 answers (0-1)")
+    parser.add_argument('--rate_limit', type=float, default=0, help="Fake server requests per second (default: off)")
+    args = parser.parse_args()
+
+    os.environ.setdefault("FARCASTER_FID", "1")
+    os.environ.setdefault("NAYNAR_SIGNER_UUID", "fake-signer")
+    base_url = args.url
+    if base_url is None:
+        server, base_url = start_fake_neynar_server(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                                    error_rate=args.error_rate, rate_limit=args.rate_limit)
+    print(f"benchmarking {base_url} with {args.calls} calls per method, concurrency {args.concurrency}")
+
+    methods = [method for method in args.methods.split(",") if method]
+    for variant in [variant for variant in args.variants.split(",") if variant]:
+        # the bots print every post, keep the report readable
+        with redirect_stdout(io.StringIO()):
+            if variant == "async":
+                results = run_async(base_url, methods, args.calls, args.concurrency, args.client_limits)
+            else:
+                results = run_sync(base_url, variant == "pooled", methods, args.calls, args.concurrency,
+                                   args.client_limits)
+        print_results(variant, results)
@@ -0,0 +1,88 @@
+import random
+import argparse
+
+from time import perf_counter
+from typing import List, Dict
+
+import numpy as np
+
+from memory_vector_utils import VectorIndex, embed, VECTOR_DIM
+
+WORDS = ("dao proposal vote treasury token launch meme yeeter fair price member shares loot ragequit summon "
+         "farcaster cast reply mention channel quarters agent wallet base eth gas swap liquidity pool airdrop "
+         "alice bob carol dave pickle rick blacksmith iron forge grant fund raise refund deadline minimum goal").split()
+
+
+def synthetic_memories(count: int, seed: int = 1) -> List[str]:
+    """
+    Returns:
+        List[str]: Short memory like sentences
+    """
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 16))) + f" #{i}" for i in range(count)]
+
+
+def _percentiles(samples: List[float]) -> Dict:
+    return {"p50_ms": round(float(np.percentile(samples, 50)), 3), "p99_ms": round(float(np.percentile(samples, 99)), 3)}
+
+
+def run(size: int, queries: int, k: int, dim: int, ivf_lists: int, nprobe: int) -> Dict:
+    """
+    Benchmark exact and IVF recall over `size` synthetic memories
+    Returns:
+        Dict: embedding rate, query latencies and the IVF recall against the exact results
+    """
+    texts = synthetic_memories(size)
+    start = perf_counter()
+    vectors = np.stack([embed(text, dim) for text in texts])
+    embed_s = perf_counter() - start
+
+    exact = VectorIndex(dim, ivf_lists=0)
+    exact.add_vectors(range(1, size + 1), vectors)
+    query_texts = synthetic_memories(queries, seed=2)
+    query_vectors = [embed(text, dim) for text in query_texts]
+
+    exact_latency, exact_results = [], []
+    for query in query_vectors:
+        start = perf_counter()
+        exact_results.append(exact.search_vector(query, k))
+        exact_latency.append((perf_counter() - start) * 1000)
+    result = {"size": size, "embed_per_s": round(size / embed_s), "exact": _percentiles(exact_latency)}
+
+    if ivf_lists:
+        ivf = VectorIndex(dim, ivf_lists=ivf_lists, nprobe=nprobe)
+        start = perf_counter()
+        ivf.add_vectors(range(1, size + 1), vectors)
+        # adding trains the lists once there are enough vectors per list, small sizes are trained here
+        if ivf.centroids is None:
+            ivf.train()
+        train_s = perf_counter() - start
+        ivf_latency, hits = [], 0
+        for query, expected in zip(query_vectors, exact_results):
+            start = perf_counter()
+            found = ivf.search_vector(query, k)
+            ivf_latency.append((perf_counter() - start) * 1000)
+            hits += len({record_id for record_id, _ in found} & {record_id for record_id, _ in expected})
+        result["ivf"] = {**_percentiles(ivf_latency), "train_s": round(train_s, 2),
+                         f"recall@{k}": round(hits / max(sum(len(expected) for expected in exact_results), 1), 3)}
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark memory recall over the hashed n-gram vector index.")
+    parser.add_argument('--sizes', type=str, default="10000,100000", help="Comma separated memory counts")
+    parser.add_argument('--queries', type=int, default=200, help="Queries per size (default: 200)")
+    parser.add_argument('--k', type=int, default=5, help="Memories per query (default: 5)")
+    parser.add_argument('--dim', type=int, default=VECTOR_DIM, help=f"Vector size (default: {VECTOR_DIM})")
+    parser.add_argument('--ivf_lists', type=int, default=256, help="IVF lists, 0 skips the ivf run (default: 256)")
+    parser.add_argument('--nprobe', type=int, default=8, help="IVF lists scanned per query (default: 8)")
+    args = parser.parse_args()
+
+    print(f"{'memories':>9}{'embed/s':>10}{'exact p50':>11}{'exact p99':>11}{'ivf p50':>9}{'ivf p99':>9}"
+          f"{'recall':>8}{'train s':>9}")
+    for size in [int(size) for size in args.sizes.split(",") if size]:
+        row = run(size, args.queries, args.k, args.dim, args.ivf_lists, args.nprobe)
+        ivf = row.get("ivf", {})
+        print(f"{row['size']:>9}{row['embed_per_s']:>10}{row['exact']['p50_ms']:>11}{row['exact']['p99_ms']:>11}"
+              f"{ivf.get('p50_ms', '-'):>9}{ivf.get('p99_ms', '-'):>9}{ivf.get(f'recall@{args.k}', '-'):>8}"
+              f"{ivf.get('train_s', '-'):>9}")
@@ -0,0 +1,140 @@
+import os
+import sys
+import json
+import random
+import signal
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+from time import perf_counter, sleep
+from typing import Dict, Callable
+
+import numpy as np
+
+from memory_storage_utils import TinyDBStorage, SQLiteStorage
+
+VARIANTS = ("json", "cached", "sqlite")
+
+KEYWORDS = ("dao", "proposal", "token", "launch", "meme", "yeeter", "vote", "treasury", "member", "grant")
+
+
+def _record(i: int) -> Dict:
+    return {"type": f"memory_{i % 50}", "content": f"memory number {i} " + "x" * 80,
+            "keywords": random.sample(KEYWORDS, 2)}
+
+
+def open_variant(variant: str, directory: str):
+    if variant == "json":
+        return TinyDBStorage(os.path.join(directory, "db.json"), cached=False)
+    if variant == "cached":
+        return TinyDBStorage(os.path.join(directory, "db.json"), cached=True)
+    return SQLiteStorage(os.path.join(directory, "memory.db"))
+
+
+def _time(operation: Callable[[int], object], ops: int) -> float:
+    samples = []
+    for i in range(ops):
+        start = perf_counter()
+        operation(i)
+        samples.append((perf_counter() - start) * 1000)
+    return round(float(np.percentile(samples, 50)), 3)
+
+
+def run(variant: str, size: int, ops: int) -> Dict:
+    """
+    Per operation latency (p50 ms) of a storage prefilled with `size` records
+    Returns:
+        Dict: insert, find, contains and keyword lookup latencies
+    """
+    directory = tempfile.mkdtemp(prefix="memory-bench-")
+    try:
+        storage = open_variant(variant, directory)
+        storage.insert_many(_record(i) for i in range(size))
+        result = {
+            "variant": variant,
+            "size": size,
+            "insert": _time(lambda i: storage.insert(_record(size + i)), ops),
+            "find": _time(lambda i: storage.find("type", f"memory_{i % 50}"), ops),
+            "contains": _time(lambda i: storage.contains("hash", f"0x{i}"), ops),
+            "keywords": _time(lambda i: storage.lookup_keywords([KEYWORDS[i % len(KEYWORDS)]], 5), ops),
+        }
+        storage.close()
+        return result
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def crash_writer(path: str):
+    """Insert records as fast as possible until killed, with small batches so many flushes are interrupted"""
+    storage = TinyDBStorage(path, cached=True)
+    storage.db.storage.flush_writes = 7
+    storage.db.storage.flush_interval = 0.01
+    i = storage.count()
+    while True:
+        storage.insert({"type": "memory", "content": f"crash check {i}", "seq": i})
+        i += 1
+
+
+def crash_check(rounds: int) -> bool:
+    """
+    Kill a writer at random times and check that db.json is always a complete, consistent earlier state
+    Returns:
+        bool: True if every round left a readable file with an unbroken sequence of records
+    """
+    directory = tempfile.mkdtemp(prefix="memory-crash-")
+    path = os.path.join(directory, "db.json")
+    ok = True
+    try:
+        for round_number in range(rounds):
+            previous = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+            writer = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--crash_writer", path],
+                                      stdout=subprocess.DEVNULL, cwd=os.path.dirname(os.path.abspath(__file__)))
+            # kill at a random point once the writer is past its imports and has flushed at least once
+            while writer.poll() is None and (os.stat(path).st_mtime_ns if os.path.exists(path) else None) == previous:
+                sleep(0.05)
+            sleep(random.uniform(0.05, 1.0))
+            writer.send_signal(signal.SIGKILL)
+            writer.wait()
+            try:
+                with open(path, "r") as db_file:
+                    data = json.load(db_file)
+                sequence = sorted(record["seq"] for record in data.get("_default", {}).values())
+                # every run continues from the last flushed state, so the records are 0..n-1 without gaps
+                consistent = sequence == list(range(len(sequence)))
+            except Exception as e:
+                print(f"round {round_number}: unreadable db.json: {str(e)}")
+                consistent, sequence = False, []
+            leftovers = [name for name in os.listdir(directory) if name.endswith(".tmp")]
+            for name in leftovers:
+                os.remove(os.path.join(directory, name))
+            print(f"round {round_number}: {len(sequence)} records, consistent={consistent}")
+            ok = ok and consistent
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the memory storages and check the cached store crash safety.")
+    parser.add_argument('--sizes', type=str, default="1000,5000,20000", help="Comma separated record counts")
+    parser.add_argument('--ops', type=int, default=100, help="Operations timed per kind (default: 100)")
+    parser.add_argument('--variants', type=str, default=",".join(VARIANTS), help="Comma separated: json,cached,sqlite")
+    parser.add_argument('--crash_rounds', type=int, default=0, help="Run the crash check with this many kills")
+    parser.add_argument('--crash_writer', type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.crash_writer:
+        crash_writer(args.crash_writer)
+    elif args.crash_rounds:
+        passed = crash_check(args.crash_rounds)
+        print("crash check passed" if passed else "crash check FAILED")
+        sys.exit(0 if passed else 1)
+    else:
+        print(f"{'variant':<8}{'records':>9}{'insert ms':>11}{'find ms':>10}{'contains ms':>13}{'keywords ms':>13}")
+        for size in [int(size) for size in args.sizes.split(",") if size]:
+            for variant in [variant for variant in args.variants.split(",") if variant]:
+                row = run(variant, size, args.ops)
+                print(f"{row['variant']:<8}{row['size']:>9}{row['insert']:>11}{row['find']:>10}"
+                      f"{row['contains']:>13}{row['keywords']:>13}")
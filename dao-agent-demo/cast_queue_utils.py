@@ -0,0 +1,414 @@
+import os
+import json
+import uuid
+import atexit
+import random
+import threading
+
+from time import time
+from typing import List, Dict, Callable, Optional
+
+from dotenv import load_dotenv
+
+from farcaster_utils import cast_idempotency_key, cast_result, describe_cast_result
+from file_lock_utils import file_lock, file_signature, write_file_atomic
+
+load_dotenv()
+
+# outbound cast intents survive restarts in this file
+CAST_QUEUE_FILE = os.getenv("CAST_QUEUE_FILE", "cast_queue.json")
+# a repeated intent within this many seconds of the last one is a retry, answered with the sent entry,
+# a later one is posted again as a new cast (a pending intent is always answered with its entry)
+CAST_DEDUPE_WINDOW_SEC = float(os.getenv("CAST_DEDUPE_WINDOW_SEC", 600))
+# seconds sent and failed entries are kept for check_outbound_casts
+CAST_RETENTION_SEC = 86400
+# attempts per cast before it is marked failed
+CAST_MAX_ATTEMPTS = 6
+# seconds a worker holds a cast it is posting, a crashed worker's cast is retried after this
+CAST_LEASE_SEC = 120
+# seconds between checks for casts queued by other agent processes sharing the file
+CAST_QUEUE_POLL_SEC = 30
+# seconds between renewals of the claim of a notification whose reply is still pending
+CAST_CLAIM_RENEW_SEC = 120
+
+CAST_PENDING = "pending"
+CAST_SENT = "sent"
+CAST_FAILED = "failed"
+
+
+def cast_thread(parent: Optional[str], channel_id: Optional[str]) -> str:
+    """
+    Args:
+        parent (Optional[str]): The parent cast hash
+        channel_id (Optional[str]): The channel ID
+    Returns:
+        str: The thread a cast is ordered in, replies by parent and top level casts by channel
+    """
+    if parent:
+        return parent
+    return f"channel:{channel_id}" if channel_id else "root"
+
+
+class CastQueue:
+    def __init__(self, bot, path: Optional[str] = None, max_attempts: int = CAST_MAX_ATTEMPTS,
+                 backoff: float = 2, max_backoff: float = 300, dedupe_window: float = CAST_DEDUPE_WINDOW_SEC,
+                 on_settle: Optional[Callable[[str, Optional[bool]], object]] = None, start: bool = True):
+        """
+        Durable outbound cast queue
+        Every cast intent is persisted with a content derived idempotency key and posted by a background
+        worker, so agent turns do not wait on the api. Retries reuse the key (neynar dedupes them) and
+        casts of the same thread are posted in order. The same intent queued again within `dedupe_window` of
+        the last one is taken for a retry of it, later it is a new cast with a new key.
+        Agent processes sharing the file change it under a file lock after reading the changes of the others,
+        and a worker leases the casts it posts, so every cast is posted by one worker.
+        A reply queued for a notification is reported to `on_settle` by the process that queued it: with True
+        once posted, False once failed and None every CAST_CLAIM_RENEW_SEC while pending.
+        Args:
+            bot: FarcasterBot or SyncFarcasterBot used to post
+            path (Optional[str]): The queue file, defaults to CAST_QUEUE_FILE
+            max_attempts (int): Attempts before a cast is marked failed
+            backoff (float): Base seconds between attempts, doubled on every attempt
+            max_backoff (float): Max seconds between attempts
+            dedupe_window (float): Seconds a sent intent answers a repeat of it, 0 posts every repeat
+            on_settle (Optional[Callable]): Called with (notification hash, sent) for replies to notifications
+            start (bool): Start the worker right away
+        """
+        print("initializing cast queue")
+        self.bot = bot
+        self.path = path or CAST_QUEUE_FILE
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.dedupe_window = dedupe_window
+        self.on_settle = on_settle
+        # key -> last time the claim of the notification of a pending reply was renewed
+        self.renewed: Dict[str, float] = {}
+        self.lock_path = f"{self.path}.lock"
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.signature = None
+        self.entries: Dict[str, Dict] = self._load()
+        self._worker: Optional[threading.Thread] = None
+        self._stopped = False
+        if start:
+            self.start()
+
+    def _load(self) -> Dict[str, Dict]:
+        """
+        Returns:
+            Dict[str, Dict]: Queue entries keyed by idempotency key, in enqueue order
+        """
+        self.signature = file_signature(self.path)
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r") as queue_file:
+                    return json.load(queue_file)
+        except Exception as e:
+            print(f"Error loading cast queue: {str(e)}")
+        return {}
+
+    def _save(self):
+        """Persist the queue (synced temp file, then rename), the caller holds the locks"""
+        try:
+            write_file_atomic(self.path, json.dumps(self.entries))
+            self.signature = file_signature(self.path)
+        except Exception as e:
+            print(f"Error saving cast queue: {str(e)}")
+
+    def _refresh(self):
+        """Reload the queue if another process saved it, the caller holds the lock"""
+        if file_signature(self.path) != self.signature:
+            self.entries = self._load()
+
+    def start(self):
+        """Start the background worker, pending casts from a previous run are resumed"""
+        if self._worker and self._worker.is_alive():
+            return
+        self._stopped = False
+        self._worker = threading.Thread(target=self._run, name="cast-queue", daemon=True)
+        self._worker.start()
+        atexit.register(self.flush, 10)
+
+    def stop(self):
+        """Stop the worker, pending casts stay persisted"""
+        with self.lock:
+            self._stopped = True
+            self.wakeup.notify_all()
+        if self._worker:
+            self._worker.join(timeout=5)
+
+    def enqueue(self, content: str, channel_id: Optional[str] = None, parent: Optional[str] = None,
+                parent_fid: Optional[int] = None, notification: Optional[str] = None) -> str:
+        """
+        Queue a cast
+
+        Args:
+            content (str): The content of the cast
+            channel_id (Optional[str]): The channel ID, defaults to FARCASTER_CHANNEL_ID
+            parent (Optional[str]): The parent cast hash (for reply)
+            parent_fid (Optional[int]): The parent author fid
+            notification (Optional[str]): The claimed notification the cast answers, settled with `on_settle`
+
+        Returns:
+            str: Status message with the cast key
+        """
+        channel_id = channel_id or os.getenv("FARCASTER_CHANNEL_ID")
+        key = cast_idempotency_key(content, parent, channel_id)
+        now = time()
+        with self.lock, file_lock(self.lock_path):
+            self._refresh()
+            entry = self.entries.get(key)
+            if entry and (entry["status"] == CAST_PENDING or
+                          (entry["status"] == CAST_SENT and now - entry["created_at"] <= self.dedupe_window)):
+                return self._describe(entry, duplicate=True)
+            entry = {
+                "key": key,
+                # neynar dedupes a key for a while, an intentional repeat gets a fresh one
+                "idem": key if entry is None else uuid.uuid4().hex[:16],
+                "text": content,
+                "channel_id": channel_id,
+                "parent": parent,
+                "parent_fid": parent_fid,
+                "thread": cast_thread(parent, channel_id),
+                "status": CAST_PENDING,
+                "attempts": 0,
+                "next_attempt_at": now,
+                "created_at": now,
+                "cast_hash": None,
+                "error": None,
+                "owner": None,
+                "lease_until": 0,
+                "notification": notification,
+                "enqueued_by": self.owner,
+                "settled": False,
+            }
+            # re-insert so the dict keeps enqueue order
+            self.entries.pop(key, None)
+            self.entries[key] = entry
+            self._prune(now)
+            self._save()
+            self.wakeup.notify_all()
+            return self._describe(entry)
+
+    def _describe(self, entry: Dict, duplicate: bool = False) -> str:
+        """
+        Returns:
+            str: Short status of an entry for the llm
+        """
+        prefix = "Cast already queued" if duplicate else "Cast queued"
+        if entry["status"] == CAST_SENT:
+            return f"{prefix} and posted with ID: {entry['cast_hash']} (key {entry['key']})"
+        if entry["status"] == CAST_FAILED:
+            return f"{prefix} but failed after {entry['attempts']} attempts: {entry['error']} (key {entry['key']})"
+        return f"{prefix}, it will be posted in the background (key {entry['key']})"
+
+    def _prune(self, now: float):
+        """Drop sent and failed entries older than CAST_RETENTION_SEC, the caller holds the lock"""
+        for key, entry in list(self.entries.items()):
+            if entry["status"] != CAST_PENDING and now - entry["created_at"] > CAST_RETENTION_SEC:
+                del self.entries[key]
+
+    def is_answering(self, notification_hash: str) -> bool:
+        """
+        Args:
+            notification_hash (str): The cast hash of a notification
+        Returns:
+            bool: True if a reply to it is pending or was sent (by any process sharing the queue)
+        """
+        with self.lock:
+            self._refresh()
+            return any(entry.get("notification") == notification_hash and entry["status"] != CAST_FAILED
+                       for entry in self.entries.values())
+
+    def is_pending_reply(self, notification_hash: str) -> bool:
+        """
+        Args:
+            notification_hash (str): The cast hash of a notification
+        Returns:
+            bool: True if a reply to it queued by this process is not posted or failed yet
+        """
+        with self.lock:
+            self._refresh()
+            return any(entry.get("notification") == notification_hash and entry.get("enqueued_by") == self.owner
+                       and entry["status"] == CAST_PENDING for entry in self.entries.values())
+
+    def _unsettled(self, entry: Dict) -> bool:
+        """True for a reply this process queued for a notification and has not reported as posted or failed"""
+        return bool(entry.get("notification")) and entry.get("enqueued_by") == self.owner and not entry.get("settled")
+
+    def _settle(self):
+        """Report the replies this process queued for notifications to `on_settle`, renew the pending ones"""
+        if self.on_settle is None:
+            return
+        with self.lock:
+            self._refresh()
+            if not any(self._unsettled(entry) for entry in self.entries.values()):
+                return
+        now = time()
+        due = []
+        with self.lock, file_lock(self.lock_path):
+            self._refresh()
+            settled = False
+            for entry in self.entries.values():
+                if not self._unsettled(entry):
+                    continue
+                if entry["status"] != CAST_PENDING:
+                    entry["settled"] = settled = True
+                    self.renewed.pop(entry["key"], None)
+                    due.append((entry["notification"], entry["status"] == CAST_SENT))
+                elif now - self.renewed.get(entry["key"], entry["created_at"]) >= CAST_CLAIM_RENEW_SEC:
+                    self.renewed[entry["key"]] = now
+                    due.append((entry["notification"], None))
+            if settled:
+                self._save()
+        for notification_hash, sent in due:
+            try:
+                self.on_settle(notification_hash, sent)
+            except Exception as e:
+                print(f"Error settling notification {notification_hash}: {str(e)}")
+
+    def _heads(self) -> List[Dict]:
+        """
+        Returns:
+            List[Dict]: The oldest pending entry of every thread, later casts wait for it
+        """
+        heads = {}
+        for entry in self.entries.values():
+            if entry["status"] == CAST_PENDING and entry["thread"] not in heads:
+                heads[entry["thread"]] = entry
+        return list(heads.values())
+
+    def _due_at(self, entry: Dict) -> float:
+        """The time an entry can be attempted, after the lease of another worker posting it"""
+        if entry.get("owner") not in (None, self.owner):
+            return max(entry["next_attempt_at"], entry.get("lease_until", 0))
+        return entry["next_attempt_at"]
+
+    def _ready(self, now: float) -> List[Dict]:
+        """
+        Returns:
+            List[Dict]: Thread heads whose next attempt is due
+        """
+        return [entry for entry in self._heads() if self._due_at(entry) <= now]
+
+    def _next_due(self) -> float:
+        """
+        Returns:
+            float: Seconds until the next attempt, at most CAST_QUEUE_POLL_SEC to see casts of other processes
+        """
+        due = [self._due_at(entry) for entry in self._heads()]
+        return min(max(min(due) - time(), 0), CAST_QUEUE_POLL_SEC) if due else CAST_QUEUE_POLL_SEC
+
+    def _lease(self) -> List[Dict]:
+        """
+        Lease the due thread heads to this worker, the caller holds the lock
+        Returns:
+            List[Dict]: Copies of the leased entries
+        """
+        with file_lock(self.lock_path):
+            self._refresh()
+            now = time()
+            batch = self._ready(now)
+            for entry in batch:
+                entry["owner"], entry["lease_until"] = self.owner, now + CAST_LEASE_SEC
+            if batch:
+                self._save()
+            return [dict(entry) for entry in batch]
+
+    def _run(self):
+        while True:
+            self._settle()
+            with self.lock:
+                self._refresh()
+                # one wait per pass, so the claims of pending replies are renewed in between
+                if not self._stopped and not self._ready(time()):
+                    self.wakeup.wait(timeout=self._next_due())
+                    self._refresh()
+                if self._stopped:
+                    return
+                if not self._ready(time()):
+                    continue
+                batch = self._lease()
+            for entry in batch:
+                self._post(entry)
+
+    def _post(self, entry: Dict):
+        """Post one entry and record the outcome"""
+        try:
+            result = self.bot.send_cast(entry["text"], entry["channel_id"], parent=entry["parent"],
+                                        parent_fid=entry["parent_fid"], idem=entry.get("idem", entry["key"]))
+        except Exception as e:
+            result = cast_result(error=str(e))
+
+        with self.lock, file_lock(self.lock_path):
+            self._refresh()
+            current = self.entries.get(entry["key"])
+            if current is None:
+                return
+            current["owner"], current["lease_until"] = None, 0
+            current["attempts"] += 1
+            status_code = result["status_code"]
+            if result["hash"]:
+                current["status"], current["cast_hash"], current["error"] = CAST_SENT, result["hash"], None
+            elif (status_code and 400 <= status_code < 500 and status_code != 429) \
+                    or current["attempts"] >= self.max_attempts:
+                # rejected by the api or out of attempts, later casts of the thread go ahead
+                current["status"], current["error"] = CAST_FAILED, describe_cast_result(result)
+            else:
+                delay = min(self.backoff * (2 ** (current["attempts"] - 1)), self.max_backoff)
+                current["next_attempt_at"] = time() + delay * random.uniform(0.5, 1.5)
+                current["error"] = describe_cast_result(result)
+            print(f"cast {current['key']}: {current['status']} ({current['attempts']} attempts)")
+            self._save()
+            self.wakeup.notify_all()
+        if current["status"] != CAST_PENDING:
+            self._settle()
+
+    def flush(self, timeout: float = 30) -> bool:
+        """
+        Wait until no cast is pending
+
+        Args:
+            timeout (float): Max seconds to wait
+
+        Returns:
+            bool: True if the queue is drained
+        """
+        deadline = time() + timeout
+        with self.lock:
+            self._refresh()
+            while any(entry["status"] == CAST_PENDING for entry in self.entries.values()):
+                remaining = deadline - time()
+                if remaining <= 0 or self._stopped:
+                    return False
+                # casts posted by other processes only show up in the file
+                self.wakeup.wait(timeout=min(remaining, 1))
+                self._refresh()
+            return True
+
+    def get_status(self, limit: int = 10) -> List[Dict]:
+        """
+        Get the most recent queue entries
+
+        Args:
+            limit (int): Max entries returned
+
+        Returns:
+            List[Dict]: key, status, attempts, thread, cast hash, error and a short text per entry
+        """
+        with self.lock:
+            self._refresh()
+            entries = list(self.entries.values())[-limit:]
+            return [
+                {
+                    "key": entry["key"],
+                    "status": entry["status"],
+                    "attempts": entry["attempts"],
+                    "parent": entry["parent"],
+                    "cast_hash": entry["cast_hash"],
+                    "error": entry["error"],
+                    "text": entry["text"][:80],
+                }
+                for entry in reversed(entries)
+            ]
@@ -0,0 +1,261 @@
+import json
+
+from time import time
+from datetime import datetime, timezone
+from typing import List, Dict
+
+import numpy as np
+import pandas as pd
+
+from graph_utils import DaohausGraphData, QueryPlan, GRAPH_URL
+
+# the graph returns at most this many entities per query
+PAGE_SIZE = 1000
+
+PROPOSAL_HISTORY_QUERY = """
+    query ($dao: String!, $lastId: String!, $first: Int!) {
+        proposals(first: $first, orderBy: id, orderDirection: asc, where: {dao: $dao, id_gt: $lastId}) {
+            id
+            proposalId
+            createdAt
+            processTxAt
+            processed
+            passed
+            cancelled
+            yesVotes
+            noVotes
+        }
+    }
+"""
+
+# votes never change once cast, so later refreshes only ask for votes at or after the newest one seen
+VOTE_HISTORY_QUERY = """
+    query ($dao: String!, $since: BigInt!, $first: Int!, $skip: Int!) {
+        votes(first: $first, skip: $skip, orderBy: createdAt, orderDirection: asc,
+              where: {daoAddress: $dao, createdAt_gte: $since}) {
+            id
+            createdAt
+            approved
+            balance
+            member { memberAddress }
+            proposal { proposalId }
+        }
+    }
+"""
+
+
+class DaoAnalytics:
+    def __init__(self, graph: DaohausGraphData, cache_ttl: int = 300):
+        """
+        Governance analytics over the proposal and vote history of a DAO
+        History is loaded into pandas/numpy columns, votes are refreshed incrementally.
+        Args:
+            graph (DaohausGraphData): The graph data instance, its client and DAO are reused
+            cache_ttl (int): Seconds the loaded history is reused before refreshing
+        """
+        print("initializing dao analytics")
+        self.graph = graph
+        self.dao_id = graph.dao_id.lower()
+        self.cache_ttl = cache_ttl
+
+        self.proposal_plan = QueryPlan(GRAPH_URL, "proposals", PROPOSAL_HISTORY_QUERY)
+        self.vote_plan = QueryPlan(GRAPH_URL, "votes", VOTE_HISTORY_QUERY)
+
+        self.proposals = pd.DataFrame()
+        self.votes = pd.DataFrame()
+        self._loaded_at = 0.0
+
+    def _fetch_proposals(self) -> List[Dict]:
+        """
+        Returns:
+            List[Dict]: Every proposal of the DAO, paged by id
+        """
+        rows, last_id = [], ""
+        while True:
+            page = self.proposal_plan.run(dao=self.dao_id, lastId=last_id, first=PAGE_SIZE)
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                return rows
+            last_id = page[-1]["id"]
+
+    def _fetch_votes(self, since: int) -> List[Dict]:
+        """
+        Args:
+            since (int): Only votes created at or after this timestamp
+        Returns:
+            List[Dict]: The votes, paged by creation time
+        """
+        rows = []
+        while True:
+            page = self.vote_plan.run(dao=self.dao_id, since=str(since), first=PAGE_SIZE, skip=0)
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                return rows
+            newest = int(page[-1]["createdAt"])
+            if newest == since:
+                # a single timestamp holds more than a page, step through it with skip
+                skip = PAGE_SIZE
+                while len(page) == PAGE_SIZE:
+                    page = self.vote_plan.run(dao=self.dao_id, since=str(since), first=PAGE_SIZE, skip=skip)
+                    rows.extend(page)
+                    skip += PAGE_SIZE
+                newest += 1
+            since = newest
+
+    def refresh(self, force: bool = False):
+        """
+        Load or refresh the proposal and vote history
+        Args:
+            force (bool): Refresh even if the cached history is fresh
+        """
+        if not force and time() - self._loaded_at < self.cache_ttl:
+            return
+
+        proposals = pd.json_normalize(self._fetch_proposals())
+        if len(proposals):
+            for column in ("createdAt", "processTxAt", "yesVotes", "noVotes"):
+                proposals[column] = pd.to_numeric(proposals[column]).fillna(0).astype("int64")
+            for column in ("processed", "passed", "cancelled"):
+                proposals[column] = proposals[column].fillna(False).astype(bool)
+        self.proposals = proposals
+
+        since = int(self.votes["createdAt"].max()) if len(self.votes) else 0
+        new_votes = pd.json_normalize(self._fetch_votes(since))
+        if len(new_votes):
+            new_votes = new_votes.rename(columns={
+                "member.memberAddress": "voter",
+                "proposal.proposalId": "proposalId",
+            })
+            new_votes["createdAt"] = pd.to_numeric(new_votes["createdAt"]).astype("int64")
+            new_votes["balance"] = new_votes["balance"].astype(float) / 10**18
+            new_votes["approved"] = new_votes["approved"].astype(bool)
+            votes = pd.concat([self.votes, new_votes], ignore_index=True) if len(self.votes) else new_votes
+            self.votes = votes.drop_duplicates(subset="id", keep="last").reset_index(drop=True)
+
+        self._loaded_at = time()
+
+    def pass_rate(self) -> Dict:
+        """
+        Returns:
+            Dict: Proposal totals and the share of processed proposals that passed
+        """
+        p = self.proposals
+        if not len(p):
+            return {"proposals": 0}
+        processed = p["processed"].to_numpy() & ~p["cancelled"].to_numpy()
+        passed = p["passed"].to_numpy() & processed
+        return {
+            "proposals": int(len(p)),
+            "processed": int(processed.sum()),
+            "passed": int(passed.sum()),
+            "cancelled": int(p["cancelled"].sum()),
+            "pass_rate": round(float(passed.sum() / processed.sum()), 3) if processed.any() else None,
+        }
+
+    def time_to_pass(self) -> Dict:
+        """
+        Returns:
+            Dict: Median, mean and p90 hours from submission to processing of passed proposals
+        """
+        p = self.proposals
+        if not len(p):
+            return {}
+        mask = p["passed"].to_numpy() & (p["processTxAt"].to_numpy() > 0)
+        hours = (p["processTxAt"].to_numpy()[mask] - p["createdAt"].to_numpy()[mask]) / 3600
+        if not len(hours):
+            return {}
+        return {
+            "median_hours": round(float(np.median(hours)), 1),
+            "mean_hours": round(float(hours.mean()), 1),
+            "p90_hours": round(float(np.percentile(hours, 90)), 1),
+        }
+
+    def turnout_trend(self, months: int = 6) -> List[Dict]:
+        """
+        Args:
+            months (int): Number of most recent months
+        Returns:
+            List[Dict]: Per month proposals, votes, unique voters and votes per proposal
+        """
+        p, v = self.proposals, self.votes
+        if not len(p):
+            return []
+        proposal_month = pd.to_datetime(p["createdAt"], unit="s", utc=True).dt.strftime("%Y-%m")
+        proposals_per_month = proposal_month.value_counts()
+        trend = pd.DataFrame({"proposals": proposals_per_month})
+        if len(v):
+            vote_month = pd.to_datetime(v["createdAt"], unit="s", utc=True).dt.strftime("%Y-%m")
+            grouped = v.groupby(vote_month)
+            trend = trend.join(pd.DataFrame({
+                "votes": grouped.size(),
+                "voters": grouped["voter"].nunique(),
+            }), how="outer")
+        trend = trend.fillna(0).astype("int64").sort_index().tail(months)
+        if "votes" in trend:
+            trend["votes_per_proposal"] = np.round(
+                np.divide(trend["votes"], trend["proposals"], out=np.zeros(len(trend)),
+                          where=trend["proposals"].to_numpy() > 0), 2)
+        return [{"month": month, **row} for month, row in trend.to_dict(orient="index").items()]
+
+    def top_voters(self, limit: int = 5) -> List[Dict]:
+        """
+        Args:
+            limit (int): Number of voters returned
+        Returns:
+            List[Dict]: Most active voters with votes cast, yes share and voting weight
+        """
+        v = self.votes
+        if not len(v):
+            return []
+        voters, index = np.unique(v["voter"].to_numpy(), return_inverse=True)
+        counts = np.bincount(index)
+        yes = np.bincount(index, weights=v["approved"].to_numpy().astype(float))
+        weight = np.bincount(index, weights=v["balance"].to_numpy())
+        order = np.lexsort((-weight, -counts))[:limit]
+        return [
+            {
+                "voter": voters[i],
+                "votes": int(counts[i]),
+                "yes_share": round(float(yes[i] / counts[i]), 2),
+                "total_weight": round(float(weight[i]), 2),
+            }
+            for i in order
+        ]
+
+    def participation(self) -> Dict:
+        """
+        Returns:
+            Dict: Vote totals and average votes per proposal
+        """
+        v, p = self.votes, self.proposals
+        if not len(v):
+            return {"votes": 0}
+        return {
+            "votes": int(len(v)),
+            "unique_voters": int(v["voter"].nunique()),
+            "avg_votes_per_proposal": round(len(v) / max(len(p), 1), 2),
+        }
+
+    def get_summary(self, months: int = 6, top: int = 5) -> str:
+        """
+        Get a small governance analytics summary
+        Args:
+            months (int): Months included in the turnout trend
+            top (int): Number of top voters
+        Returns:
+            str: JSON summary
+        """
+        try:
+            self.refresh()
+            summary = {
+                "dao": self.dao_id,
+                "as_of": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                **self.pass_rate(),
+                "time_to_pass": self.time_to_pass(),
+                "participation": self.participation(),
+                "turnout_trend": self.turnout_trend(months),
+                "top_voters": self.top_voters(top),
+            }
+            return json.dumps(summary, separators=(",", ":"))
+        except Exception as e:
+            return f"Error getting DAO analytics: {str(e)}"
@@ -0,0 +1,362 @@
+import os
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+
+from typing import List, Dict, Optional, Tuple
+from datetime import datetime, timedelta
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# local stand-in for the parts of the neynar v2 api used by farcaster_utils.py
+API_PREFIX = "/v2/farcaster/"
+
+
+def _timestamp(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.") + f"{dt.microsecond // 1000:03d}Z"
+
+
+def _cast_hash(seed: str) -> str:
+    return "0x" + hashlib.sha1(seed.encode()).hexdigest()[:40]
+
+
+class FakeNeynarState:
+    def __init__(self, users: int = 20, casts_per_user: int = 60, notifications: int = 40, agent_fid: int = 1):
+        """
+        Deterministic users, casts and notifications served by the fake server
+        Args:
+            users (int): Number of users
+            casts_per_user (int): Number of casts per user
+            notifications (int): Number of mention/reply notifications for the agent
+            agent_fid (int): The fid of the agent
+        """
+        self.lock = threading.Lock()
+        self.agent_fid = agent_fid
+        now = datetime.utcnow()
+        self.by_hash: Dict[str, Dict] = {}
+        self.users: Dict[int, Dict] = {}
+        for fid in range(agent_fid, agent_fid + users):
+            self.users[fid] = {
+                "object": "user",
+                "fid": fid,
+                "username": "agent" if fid == agent_fid else f"user{fid}",
+                "display_name": f"User {fid}",
+                "follower_count": fid * 7,
+                "following_count": fid * 3,
+                "profile": {"bio": {"text": f"bio of user {fid}"}},
+                "verified_addresses": {"eth_addresses": [f"0x{fid:040x}"], "sol_addresses": []},
+            }
+        # newest first, like the neynar feeds
+        self.casts: List[Dict] = []
+        for i in range(users * casts_per_user):
+            fid = agent_fid + i % users
+            self.casts.append(self._make_cast(fid, f"cast {i} from {fid}", now - timedelta(minutes=i),
+                                              parent=self.casts[-1]["hash"] if i % 4 == 3 else None))
+        agent_casts = [cast["hash"] for cast in self.casts if cast["author"]["fid"] == agent_fid]
+        self.notifications: List[Dict] = []
+        for i in range(notifications):
+            fid = agent_fid + 1 + i % max(users - 1, 1)
+            kind = "mention" if i % 2 else "reply"
+            # replies answer one of the agent casts
+            parent = agent_casts[i % len(agent_casts)] if kind == "reply" and agent_casts else None
+            cast = self._make_cast(fid, f"@agent notification {i}", now - timedelta(minutes=5 * i), parent=parent)
+            self.notifications.append({"object": "notification", "type": kind, "cast": cast,
+                                       "most_recent_timestamp": cast["timestamp"]})
+        self.posted: List[Dict] = []
+        self.seen_marks = 0
+
+    def _make_cast(self, fid: int, text: str, when: datetime, parent: Optional[str] = None) -> Dict:
+        user = self.users[fid]
+        parent_cast = self.by_hash.get(parent) if parent else None
+        cast = {
+            "object": "cast",
+            "hash": _cast_hash(f"{fid}:{text}:{when.isoformat()}"),
+            "parent_hash": parent,
+            "parent_author": {"fid": parent_cast["author"]["fid"] if parent_cast else None},
+            "thread_hash": (parent_cast["thread_hash"] if parent_cast else parent) or None,
+            "text": text,
+            "timestamp": _timestamp(when),
+            "author": user,
+            "replies": {"count": 0},
+            "reactions": {"likes_count": 0, "recasts_count": 0},
+        }
+        cast["thread_hash"] = cast["thread_hash"] or cast["hash"]
+        self.by_hash[cast["hash"]] = cast
+        return cast
+
+    def conversation(self, cast_hash: str, params: Dict) -> Optional[Dict]:
+        """
+        Args:
+            cast_hash (str): The cast hash
+            params (Dict): The query parameters (limit, include_chronological_parent_casts)
+        Returns:
+            Optional[Dict]: The cast with its direct replies and parent chain, None if unknown
+        """
+        cast = self.by_hash.get(cast_hash)
+        if cast is None:
+            return None
+        replies = [c for c in self.by_hash.values() if c["parent_hash"] == cast_hash]
+        replies.sort(key=lambda c: c["timestamp"])
+        parents = []
+        if params.get("include_chronological_parent_casts") == "true":
+            parent = self.by_hash.get(cast["parent_hash"]) if cast["parent_hash"] else None
+            while parent:
+                parents.insert(0, parent)
+                parent = self.by_hash.get(parent["parent_hash"]) if parent["parent_hash"] else None
+        return {"cast": {**cast, "direct_replies": replies[:int(params.get("limit", 20))]},
+                "chronological_parent_casts": parents}
+
+    def page(self, items: List[Dict], params: Dict, default_limit: int = 25) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Slice a newest first list with an offset cursor
+        Args:
+            items (List[Dict]): The items
+            params (Dict): The query parameters (limit, cursor)
+            default_limit (int): Limit when none is given
+        Returns:
+            Tuple[List[Dict], Optional[str]]: The page and the next cursor
+        """
+        limit = int(params.get("limit", default_limit))
+        offset = int(params.get("cursor") or 0)
+        page = items[offset:offset + limit]
+        next_cursor = str(offset + limit) if offset + limit < len(items) else None
+        return page, next_cursor
+
+    def add_notification(self, fid: int, text: str, kind: str = "mention") -> Dict:
+        """Add a notification for the agent, newest first"""
+        with self.lock:
+            cast = self._make_cast(fid, text, datetime.utcnow())
+            notification = {"object": "notification", "type": kind, "cast": cast,
+                            "most_recent_timestamp": cast["timestamp"]}
+            self.notifications.insert(0, notification)
+            return notification
+
+
+class FakeNeynarHandler(BaseHTTPRequestHandler):
+    server_version = "FakeNeynar/0.1"
+    # keep-alive, so pooled clients can reuse connections like against the real api
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, without this delayed acks stall keep-alive connections
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self) -> FakeNeynarState:
+        return self.server.state
+
+    def _send(self, status: int, body: Dict, headers: Optional[Dict] = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _injected_failure(self) -> bool:
+        """
+        Simulate api latency and failures: sleep `latency_ms` (+/- `jitter_ms`), answer with a 429 once the
+        server rate limit is exhausted and with a 503 on every `fail_every`-th request or at `error_rate`
+        """
+        server = self.server
+        if server.latency_ms or server.jitter_ms:
+            time.sleep(max(server.latency_ms + random.uniform(-server.jitter_ms, server.jitter_ms), 0) / 1000)
+        with server.counter_lock:
+            server.requests += 1
+            count = server.requests
+            limited_for = 0.0
+            if server.rate_limit:
+                now = time.monotonic()
+                server.tokens = min(server.burst, server.tokens + (now - server.tokens_at) * server.rate_limit)
+                server.tokens_at = now
+                if server.tokens >= 1:
+                    server.tokens -= 1
+                else:
+                    limited_for = (1 - server.tokens) / server.rate_limit
+        if limited_for:
+            server.rate_limited += 1
+            self._send(429, {"message": "Rate limit exceeded"}, {"Retry-After": f"{limited_for:.2f}"})
+            return True
+        if (server.fail_every and count % server.fail_every == 0) or \
+                (server.error_rate and random.random() < server.error_rate):
+            server.failed += 1
+            self._send(503, {"message": "injected failure"}, {"Retry-After": str(server.retry_after)})
+            return True
+        return False
+
+    def _route(self) -> Tuple[str, Dict]:
+        parsed = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        return parsed.path[len(API_PREFIX):] if parsed.path.startswith(API_PREFIX) else parsed.path, params
+
+    def do_GET(self):
+        if self._injected_failure():
+            return
+        endpoint, params = self._route()
+        state = self.state
+        if endpoint == "notifications":
+            types = set(params.get("type", "mentions,replies").replace("mentions", "mention")
+                        .replace("replies", "reply").split(","))
+            items = [n for n in state.notifications if n["type"] in types]
+            page, cursor = state.page(items, params)
+            return self._send(200, {"notifications": page, "next": {"cursor": cursor}})
+        if endpoint == "feed/user/casts":
+            fid = int(params.get("fid", state.agent_fid))
+            items = [c for c in state.casts + state.posted if c["author"]["fid"] == fid]
+            if params.get("include_replies") == "false":
+                items = [c for c in items if not c["parent_hash"]]
+            page, cursor = state.page(items, params)
+            return self._send(200, {"casts": page, "next": {"cursor": cursor}})
+        if endpoint == "feed/user/replies_and_recasts":
+            fid = int(params.get("fid", state.agent_fid))
+            items = [c for c in state.casts if c["author"]["fid"] == fid and c["parent_hash"]]
+            page, cursor = state.page(items, params)
+            return self._send(200, {"casts": page, "next": {"cursor": cursor}})
+        if endpoint == "cast/conversation":
+            conversation = state.conversation(params.get("identifier", ""), params)
+            if conversation is None:
+                return self._send(404, {"message": "cast not found"})
+            return self._send(200, {"conversation": conversation})
+        if endpoint == "user/bulk":
+            fids = [int(fid) for fid in params.get("fids", "").split(",") if fid]
+            return self._send(200, {"users": [state.users[fid] for fid in fids if fid in state.users]})
+        if endpoint == "user/by_username":
+            for user in state.users.values():
+                if user["username"] == params.get("username"):
+                    return self._send(200, {"user": user})
+            return self._send(404, {"message": "user not found"})
+        return self._send(404, {"message": f"unknown endpoint {endpoint}"})
+
+    def do_POST(self):
+        # read the body first, an unread body would be parsed as the next request of the keep-alive connection
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if self._injected_failure():
+            return
+        endpoint, _ = self._route()
+        state = self.state
+        if endpoint == "cast":
+            with state.lock:
+                for cast in state.posted:
+                    # neynar dedupes casts by idempotency key
+                    if body.get("idem") and cast.get("idem") == body.get("idem"):
+                        return self._send(200, {"success": True, "cast": cast})
+                cast = state._make_cast(state.agent_fid, body.get("text", ""), datetime.utcnow(),
+                                        parent=body.get("parent"))
+                cast["idem"] = body.get("idem")
+                state.posted.insert(0, cast)
+            return self._send(200, {"success": True, "cast": {"hash": cast["hash"], "text": cast["text"]}})
+        if endpoint == "notifications/seen":
+            state.seen_marks += 1
+            return self._send(200, {"success": True})
+        return self._send(404, {"message": f"unknown endpoint {endpoint}"})
+
+
+class FakeNeynarServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # the default backlog (5) drops connections under a concurrent benchmark
+    request_queue_size = 128
+
+
+def start_fake_neynar_server(host: str = "127.0.0.1", port: int = 0, state: Optional[FakeNeynarState] = None,
+                             fail_every: int = 0, retry_after: float = 0, latency_ms: float = 0,
+                             jitter_ms: float = 0, error_rate: float = 0, rate_limit: float = 0,
+                             burst: int = 0) -> Tuple[FakeNeynarServer, str]:
+    """
+    Start the fake server on a background thread
+    Args:
+        host (str): The host
+        port (int): The port, 0 picks a free one
+        state (Optional[FakeNeynarState]): The served data
+        fail_every (int): Answer every n-th request with a 503, 0 disables
+        retry_after (float): Retry-After seconds sent with injected failures
+        latency_ms (float): Added latency per request
+        jitter_ms (float): Random +/- variation of the added latency
+        error_rate (float): Share of requests answered with a 503 (0-1)
+        rate_limit (float): Requests per second before answering 429, 0 disables
+        burst (int): Burst size of the rate limit, defaults to one second of requests
+    Returns:
+        Tuple[FakeNeynarServer, str]: The server and its v2 api base url
+    """
+    server = FakeNeynarServer((host, port), FakeNeynarHandler)
+    server.state = state or FakeNeynarState()
+    server.fail_every = fail_every
+    server.retry_after = retry_after
+    server.latency_ms = latency_ms
+    server.jitter_ms = jitter_ms
+    server.error_rate = error_rate
+    server.rate_limit = rate_limit
+    server.burst = burst or max(rate_limit, 1)
+    server.tokens = float(server.burst)
+    server.tokens_at = time.monotonic()
+    server.requests = 0
+    server.failed = 0
+    server.rate_limited = 0
+    server.counter_lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}{API_PREFIX}"
+
+
+def run_check(base_url: str, agent_fid: int, async_client: bool = False):
+    """
+    Exercise every FarcasterBot method against the fake server and print the latency stats
+    Args:
+        base_url (str): The fake server v2 api url
+        agent_fid (int): The fid of the agent
+        async_client (bool): Check the asyncio client (through its blocking wrapper)
+    """
+    os.environ["FARCASTER_FID"] = str(agent_fid)
+    os.environ.setdefault("NAYNAR_SIGNER_UUID", "fake-signer")
+    if async_client:
+        from farcaster_async_utils import SyncFarcasterBot
+        bot = SyncFarcasterBot(base_url=base_url, backoff=0.05)
+    else:
+        from farcaster_utils import FarcasterBot
+        bot = FarcasterBot(base_url=base_url, backoff=0.05)
+
+    print("notifications:", len(bot.get_notifications()))
+    print("replies:", len(bot.get_replies()))
+    print("casts:", len(bot.get_casts(str(agent_fid + 1))))
+    print("user:", bot.get_user_by_username(f"user{agent_fid + 1}")["username"])
+    print("bulk users:", len(bot.get_users([str(agent_fid + i) for i in range(1, 6)] + ["agent"])))
+    if async_client:
+        context = bot.get_mention_context(agent_fid + 1)
+        print("mention context:", {key: len(value) if isinstance(value, list) else value.get("username")
+                                   for key, value in context.items()})
+    print(bot.post_cast("hello from the fake server check"))
+    print(bot.mark_notifications_as_seen())
+    print(json.dumps(bot.get_latency_stats(), indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local fake neynar api server.")
+    parser.add_argument('--host', type=str, default='127.0.0.1', help="Host to bind (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8787, help="Port to bind (default: 8787)")
+    parser.add_argument('--fail_every', type=int, default=0, help="Answer every n-th request with a 503 (default: off)")
+    parser.add_argument('--retry_after', type=float, default=0, help="Retry-After seconds of injected failures")
+    parser.add_argument('--latency_ms', type=float, default=0, help="Added latency per request in ms")
+    parser.add_argument('--jitter_ms', type=float, default=0, help="Random +/- variation of the latency in ms")
+    parser.add_argument('--error_rate', type=float, default=0, help="Share of requests answered with a 503 (0-1)")
+    parser.add_argument('--rate_limit', type=float, default=0, help="Requests per second before 429s (default: off)")
+    parser.add_argument('--burst', type=int, default=0, help="Burst size of the rate limit")
+    parser.add_argument('--check', action='store_true', help="Exercise FarcasterBot against the server and exit")
+    parser.add_argument('--async_client', action='store_true', help="Use the asyncio client for --check")
+    args = parser.parse_args()
+
+    server, base_url = start_fake_neynar_server(args.host, args.port, fail_every=args.fail_every,
+                                                retry_after=args.retry_after, latency_ms=args.latency_ms,
+                                                jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                                                rate_limit=args.rate_limit, burst=args.burst)
+    print(f"fake neynar api listening on {base_url}")
+    if args.check:
+        run_check(base_url, server.state.agent_fid, args.async_client)
+        server.shutdown()
+    else:
+        print(f"set NAYNAR_API_URL={base_url} to point the agent at it")
+        threading.Event().wait()
@@ -0,0 +1,536 @@
+import os
+import asyncio
+import functools
+import threading
+
+from time import perf_counter, monotonic
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple, AsyncIterator, Callable
+
+import httpx
+from dotenv import load_dotenv
+
+from farcaster_utils import (
+    FarcasterClientBase,
+    BULK_USER_LIMIT,
+    CASTS_PAGE_SIZE,
+    REPLIES_PAGE_SIZE,
+    cast_payload,
+    cast_result,
+    describe_cast_result,
+    feed_page,
+    parse_cast,
+    parse_conversation,
+    parse_notification,
+    parse_reply,
+    project_user,
+)
+
+load_dotenv()
+
+
+class AsyncFarcasterBot(FarcasterClientBase):
+    def __init__(self, base_url: Optional[str] = None, timeout: Tuple[float, float] = (3.05, 15),
+                 max_retries: int = 3, backoff: float = 0.5, max_backoff: float = 20,
+                 rate_limits: Optional[Dict[str, Tuple[float, int, int]]] = None, max_connections: int = 16):
+        """
+        Asyncio variant of FarcasterBot with the same methods as coroutines
+        Requests share one httpx connection pool, so independent reads can be gathered concurrently.
+        Limiter, retries, read coalescing, profile cache and notification state behave like FarcasterBot.
+        Args:
+            base_url (Optional[str]): The neynar v2 api url, defaults to NAYNAR_API_URL
+            timeout (Tuple[float, float]): Connect and read timeouts in seconds
+            max_retries (int): Max retries of a GET request
+            backoff (float): Base backoff in seconds, doubled on every retry
+            max_backoff (float): Max seconds to wait between retries (also caps Retry-After)
+            rate_limits (Optional[Dict]): (rate, capacity, reserve) per class ("all", "read", "write")
+            max_connections (int): Size of the connection pool
+        """
+        print("initializing async bot")
+        super().__init__(base_url, timeout, max_retries, backoff, max_backoff, rate_limits)
+
+        self.client = httpx.AsyncClient(
+            # requests drops unset headers (ex: no api key against the fake server), httpx rejects them
+            headers={key: value for key, value in self.headers.items() if value is not None},
+            timeout=httpx.Timeout(timeout[1], connect=timeout[0]),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        # created lazily, an asyncio lock binds to the running loop
+        self._notification_lock: Optional[asyncio.Lock] = None
+
+    async def aclose(self):
+        """Close the connection pool"""
+        await self.client.aclose()
+
+    async def _request(self, method: str, endpoint: str, params: Optional[Dict] = None,
+                       json: Optional[Dict] = None) -> httpx.Response:
+        """
+        Send a request to the neynar api over the pooled client
+        GETs are retried on connection errors, timeouts and 429/5xx responses.
+        Args:
+            method (str): The http method
+            endpoint (str): The endpoint path relative to the v2 url (ex: notifications)
+            params (Optional[Dict]): The query parameters
+            json (Optional[Dict]): The json body
+        Returns:
+            httpx.Response: The last response
+        """
+        stats = self._endpoint_stats(endpoint)
+        endpoint_class, priority = self._endpoint_class(endpoint)
+        read_key = (endpoint, tuple(sorted((params or {}).items()))) if method == "GET" else None
+        if read_key and (coalesced := self._coalesced_read(read_key, endpoint_class)) is not None:
+            stats.coalesced += 1
+            return coalesced
+
+        retries = self.max_retries if method == "GET" else 0
+        attempt = 0
+        while True:
+            waited = await self._acquire(endpoint_class, priority)
+            if waited > 0.001:
+                stats.limiter_waits += 1
+                stats.limiter_wait_ms += waited * 1000
+            start = perf_counter()
+            response = None
+            try:
+                response = await self.client.request(method, self.v2_url + endpoint, params=params, json=json)
+            except (httpx.TransportError, httpx.TimeoutException):
+                stats.record((perf_counter() - start) * 1000, error=True)
+                if attempt >= retries:
+                    raise
+            else:
+                failed = self._record_response(stats, endpoint_class, read_key, response,
+                                               (perf_counter() - start) * 1000)
+                if not failed or attempt >= retries:
+                    return response
+            stats.retries += 1
+            await asyncio.sleep(self._retry_delay(attempt, response))
+            attempt += 1
+
+    async def _acquire(self, endpoint_class: str, priority: int) -> float:
+        """
+        Take a token from the shared bucket and the endpoint class bucket without blocking the loop
+        Returns:
+            float: Seconds waited
+        """
+        start = monotonic()
+        for bucket in (self.buckets["all"], self.buckets[endpoint_class]):
+            with bucket.waiting(priority):
+                while (delay := bucket.try_acquire(priority)) > 0:
+                    await asyncio.sleep(delay)
+        return monotonic() - start
+
+    async def gather(self, *calls):
+        """
+        Run bot coroutines concurrently
+
+        Args:
+            *calls: Coroutines (ex: bot.get_casts(fid), bot.get_replies())
+
+        Returns:
+            List: Their results in order
+        """
+        return await asyncio.gather(*calls)
+
+    async def send_cast(self, content: str, channel_id: Optional[str] = None, parent: Optional[str] = None,
+                        parent_fid: Optional[str] = None, idem: Optional[str] = None) -> Dict:
+        """
+        Post a cast and return the outcome as data (used by the cast queue)
+
+        Args:
+            content (str): The content of the cast
+            channel_id (Optional[str]): The channel ID
+            parent (Optional[str]): The parent cast hash (for reply)
+            idem (Optional[str]): The idempotency key, defaults to one derived from the content
+
+        Returns:
+            Dict: see cast_result
+        """
+        try:
+            channel_id = channel_id or os.getenv("FARCASTER_CHANNEL_ID")
+            payload = cast_payload(content, channel_id, parent, parent_fid, idem)
+            response = await self._request("POST", "cast", json=payload)
+            if response.status_code != 200:
+                return cast_result(status_code=response.status_code, error=response.text)
+            return cast_result(cast_hash=response.json()['cast']['hash'], status_code=response.status_code)
+        except Exception as e:
+            return cast_result(error=str(e))
+
+    async def post_cast(self, content: str, channel_id: Optional[str] = None, parent: Optional[str] = None,
+                        parent_fid: Optional[str] = None, idem: Optional[str] = None) -> str:
+        """
+        Post a cast
+
+        Args:
+            content (str): The content of the cast
+            channel_id (Optional[str]): The channel ID
+            parent (Optional[str]): The parent cast hash (for reply)
+            idem (Optional[str]): The idempotency key, defaults to one derived from the content
+
+        Returns:
+            str: Status message about the cast
+        """
+        return describe_cast_result(await self.send_cast(content, channel_id, parent, parent_fid, idem))
+
+    async def get_replies(self) -> List[Dict]:
+        """
+        Get recent replies
+
+        Returns:
+            List[Dict]: Replies containing timestamp, parent hash, hash, text and author
+        """
+        try:
+            params = {"fid": os.getenv("FARCASTER_FID"), "filter": "all", "limit": 25}
+            response = await self._request("GET", "feed/user/replies_and_recasts", params=params)
+            if response.status_code != 200:
+                return f"Error getting relies: {response.status_code} - {response.text}"
+            return [parse_reply(reply) for reply in response.json().get('casts', [])]
+        except Exception as e:
+            return f"Error getting replies: {str(e)}"
+
+    async def get_notifications(self) -> List[Dict]:
+        """
+        Get recent notifications
+
+        Returns:
+            List[Dict]: List of relevant notifications containing timestamp, thread hash, text, and author
+        """
+        try:
+            params = {"fid": os.getenv("FARCASTER_FID"), "type": "mentions,replies", "priority_mode": "false"}
+            response = await self._request("GET", "notifications", params=params)
+            if response.status_code != 200:
+                return f"Error getting notifications: {response.status_code} - {response.text}"
+            return [
+                parse_notification(notification)
+                for notification in response.json().get('notifications', [])
+                if notification.get('type') in ['reply', 'mention'] and 'cast' in notification
+            ]
+        except Exception as e:
+            return f"Error getting notifications: {str(e)}"
+
+    async def fetch_new_notifications(self, max_pages: Optional[int] = None) -> List[Dict]:
+        """
+        Fetch only notifications newer than the newest one already seen, see FarcasterBot.fetch_new_notifications
+
+        Args:
+            max_pages (Optional[int]): Max pages fetched by this call, None reads the whole burst
+
+        Returns:
+            List[Dict]: The new notifications, also added to the pending notifications
+        """
+        if self._notification_lock is None:
+            self._notification_lock = asyncio.Lock()
+        async with self._notification_lock:
+            scan = self.notifications.scan(max_pages)
+            try:
+                params = next(scan)
+                while True:
+                    response = await self._request("GET", "notifications", params=params)
+                    if response.status_code != 200:
+                        raise httpx.HTTPStatusError(f"{response.status_code} - {response.text}",
+                                                    request=response.request, response=response)
+                    params = scan.send(response.json())
+            except StopIteration as done:
+                return done.value
+
+    async def get_pending_notifications(self, fetch: bool = True) -> List[Dict]:
+        """
+        Get notifications that are not discarded yet and not older than the notification window
+
+        Args:
+            fetch (bool): Fetch new notifications first
+
+        Returns:
+            List[Dict]: Pending notifications with a fresh age_in_sec
+        """
+        try:
+            if fetch:
+                await self.fetch_new_notifications()
+            return self.notifications.pending()
+        except Exception as e:
+            return f"Error getting notifications: {str(e)}"
+
+    async def mark_notifications_as_seen(self) -> str:
+        """
+        Mark notifications as seen
+
+        Returns:
+            str: Status message about the action
+        """
+        try:
+            payload = {"signer_uuid": os.getenv("NAYNAR_SIGNER_UUID")}
+            response = await self._request("POST", "notifications/seen", json=payload)
+            return f"Successfully marked notifications as seen {response}"
+        except Exception as e:
+            return f"Error marking notification as seen: {str(e)}"
+
+    async def get_casts(self, fid: str = os.getenv("FARCASTER_FID"), limit: int = 25,
+                        include_replies: bool = True) -> List[Dict]:
+        """
+        Get recent casts
+
+        Args:
+            fid (str): The fid of the user
+            limit (int): The number of casts to fetch
+            include_replies (bool): Whether to include replies in the casts
+
+        Returns:
+            List[Dict]: List of relevant casts containing timestamp, hash, text, and author
+        """
+        try:
+            params = {"fid": fid, "viewer_fid": os.getenv("FARCASTER_FID"), "limit": limit,
+                      "include_replies": str(include_replies).lower()}
+            response = await self._request("GET", "feed/user/casts", params=params)
+            if response.status_code != 200:
+                return f"Error getting casts: {response.status_code} - {response.text}"
+            return [parse_cast(cast) for cast in response.json().get('casts', [])]
+        except Exception as e:
+            return f"Error getting casts: {str(e)}"
+
+    async def _iter_feed(self, endpoint: str, params: Dict, page_size: int, parse: Callable[[Dict], Dict],
+                         since: Optional[datetime], max_count: Optional[int]) -> AsyncIterator[Dict]:
+        """
+        Follow the cursor of a newest first feed, one page is requested at a time
+        """
+        cursor, count = None, 0
+        while True:
+            page_params = {**params, "limit": page_size if max_count is None else min(page_size, max_count - count)}
+            if cursor:
+                page_params["cursor"] = cursor
+            response = await self._request("GET", endpoint, params=page_params)
+            if response.status_code != 200:
+                raise httpx.HTTPStatusError(f"{response.status_code} - {response.text}",
+                                            request=response.request, response=response)
+            records, cursor = feed_page(response.json(), parse, since,
+                                        None if max_count is None else max_count - count)
+            for record in records:
+                yield record
+            count += len(records)
+            if not cursor:
+                return
+
+    def iter_casts(self, fid: Optional[str] = None, since: Optional[datetime] = None, max_count: Optional[int] = None,
+                   include_replies: bool = True) -> AsyncIterator[Dict]:
+        """
+        Lazily walk the casts of a user, newest first, following the neynar cursor
+
+        Args:
+            fid (Optional[str]): The fid of the user, defaults to the agent
+            since (Optional[datetime]): Stop at casts older than this (naive utc)
+            max_count (Optional[int]): Stop after this many casts
+            include_replies (bool): Whether to include replies
+
+        Returns:
+            AsyncIterator[Dict]: Casts containing timestamp, hash, text, and author
+        """
+        params = {"fid": fid or os.getenv("FARCASTER_FID"), "viewer_fid": os.getenv("FARCASTER_FID"),
+                  "include_replies": str(include_replies).lower()}
+        return self._iter_feed("feed/user/casts", params, CASTS_PAGE_SIZE, parse_cast, since, max_count)
+
+    def iter_replies(self, fid: Optional[str] = None, since: Optional[datetime] = None,
+                     max_count: Optional[int] = None) -> AsyncIterator[Dict]:
+        """
+        Lazily walk the replies of a user, newest first, following the neynar cursor
+
+        Args:
+            fid (Optional[str]): The fid of the user, defaults to the agent
+            since (Optional[datetime]): Stop at replies older than this (naive utc)
+            max_count (Optional[int]): Stop after this many replies
+
+        Returns:
+            AsyncIterator[Dict]: Replies containing timestamp, hash, text, author and parent hash
+        """
+        params = {"fid": fid or os.getenv("FARCASTER_FID"), "filter": "replies"}
+        return self._iter_feed("feed/user/replies_and_recasts", params, REPLIES_PAGE_SIZE, parse_reply, since,
+                               max_count)
+
+    async def get_conversation(self, cast_hash: str, reply_limit: int = 20) -> Dict:
+        """
+        Get the thread around a cast: its parent casts and direct replies
+
+        Args:
+            cast_hash (str): The cast hash
+            reply_limit (int): Max direct replies
+
+        Returns:
+            Dict: parents (oldest first), the cast and its direct replies
+        """
+        try:
+            params = {"identifier": cast_hash, "type": "hash", "reply_depth": 1,
+                      "include_chronological_parent_casts": "true", "limit": reply_limit,
+                      "viewer_fid": os.getenv("FARCASTER_FID")}
+            response = await self._request("GET", "cast/conversation", params=params)
+            if response.status_code != 200:
+                return f"Error getting conversation: {response.status_code} - {response.text}"
+            return parse_conversation(response.json())
+        except Exception as e:
+            return f"Error getting conversation: {str(e)}"
+
+    async def get_user_by_username(self, username: str) -> Dict:
+        """
+        Get user information by username
+
+        Args:
+            username (str): The username of the user
+
+        Returns:
+            Dict: User profile (fid, username, display name, bio, follower counts, verified addresses)
+        """
+        try:
+            username = username.strip().lstrip("@")
+            cached = self.profiles.get(username=username)
+            if cached:
+                return cached
+            params = {"username": username, "viewer_fid": os.getenv("FARCASTER_FID")}
+            response = await self._request("GET", "user/by_username", params=params)
+            if response.status_code != 200:
+                return f"Error getting user by username: {response.status_code} - {response.text}"
+            profile = project_user(response.json()['user'])
+            self.profiles.put(profile)
+            return profile
+        except Exception as e:
+            return f"Error getting user by username: {str(e)}"
+
+    async def get_users_by_fids(self, fids: List[int]) -> List[Dict]:
+        """
+        Get user profiles by fid, cache misses are fetched in concurrent bulk requests (100 fids each)
+
+        Args:
+            fids (List[int]): The fids
+
+        Returns:
+            List[Dict]: User profiles in the order of the fids, unknown fids are skipped
+        """
+        try:
+            fids = [int(fid) for fid in fids]
+            found = {}
+            missing = []
+            for fid in dict.fromkeys(fids):
+                cached = self.profiles.get(fid=fid)
+                if cached:
+                    found[fid] = cached
+                else:
+                    missing.append(fid)
+
+            responses = await asyncio.gather(*[
+                self._request("GET", "user/bulk", params={
+                    "fids": ",".join(str(fid) for fid in missing[i:i + BULK_USER_LIMIT]),
+                    "viewer_fid": os.getenv("FARCASTER_FID"),
+                })
+                for i in range(0, len(missing), BULK_USER_LIMIT)
+            ])
+            for response in responses:
+                if response.status_code != 200:
+                    return f"Error getting users: {response.status_code} - {response.text}"
+                for user in response.json().get('users', []):
+                    profile = project_user(user)
+                    self.profiles.put(profile)
+                    found[profile['fid']] = profile
+
+            return [found[fid] for fid in dict.fromkeys(fids) if fid in found]
+        except Exception as e:
+            return f"Error getting users: {str(e)}"
+
+    async def get_users(self, users: List[str]) -> List[Dict]:
+        """
+        Resolve many users at once, numbers are treated as fids and everything else as usernames
+        Fids are fetched in bulk. Neynar has no bulk lookup by username, every uncached username is one
+        user/by_username request, those are awaited together.
+
+        Args:
+            users (List[str]): fids or usernames
+
+        Returns:
+            List[Dict]: User profiles
+        """
+        fids = [int(user) for user in users if str(user).strip().isdigit()]
+        usernames = list(dict.fromkeys(str(user).strip().lstrip("@") for user in users
+                                       if not str(user).strip().isdigit()))
+        profiles, *by_username = await asyncio.gather(
+            self.get_users_by_fids(fids) if fids else asyncio.sleep(0, []),
+            *[self.get_user_by_username(username) for username in usernames],
+        )
+        if isinstance(profiles, str):
+            return profiles
+        return profiles + [profile for profile in by_username if isinstance(profile, dict)]
+
+    async def get_mention_context(self, author_fid: int, casts_limit: int = 10) -> Dict:
+        """
+        Gather what the agent reads before answering a mention in one round trip:
+        pending notifications, recent replies, the author's recent casts and profile
+
+        Args:
+            author_fid (int): The fid of the mention author
+            casts_limit (int): Number of recent author casts
+
+        Returns:
+            Dict: notifications, replies, author_casts and author (errors are kept as strings)
+        """
+        notifications, replies, casts, users = await asyncio.gather(
+            self.get_pending_notifications(),
+            self.get_replies(),
+            self.get_casts(str(author_fid), casts_limit),
+            self.get_users_by_fids([author_fid]),
+        )
+        return {
+            "notifications": notifications,
+            "replies": replies,
+            "author_casts": casts,
+            "author": users[0] if isinstance(users, list) and users else users,
+        }
+
+
+class SyncFarcasterBot:
+    def __init__(self, **kwargs):
+        """
+        Blocking wrapper around AsyncFarcasterBot for the swarm tool functions
+        The async bot runs on a private event loop thread, every coroutine method is exposed as a
+        blocking method with the same name and arguments, other attributes are passed through.
+        Args:
+            **kwargs: AsyncFarcasterBot arguments
+        """
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="farcaster-async", daemon=True)
+        self._thread.start()
+        self.bot = self._run(self._create(kwargs))
+
+    @staticmethod
+    async def _create(kwargs: Dict) -> AsyncFarcasterBot:
+        return AsyncFarcasterBot(**kwargs)
+
+    def _run(self, coroutine):
+        """Run a coroutine on the bot loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def _iterate(self, iterator):
+        """Pull an async iterator item by item on the bot loop"""
+        while True:
+            try:
+                yield self._run(iterator.__anext__())
+            except StopAsyncIteration:
+                return
+
+    def iter_casts(self, *args, **kwargs):
+        """Blocking AsyncFarcasterBot.iter_casts"""
+        return self._iterate(self.bot.iter_casts(*args, **kwargs))
+
+    def iter_replies(self, *args, **kwargs):
+        """Blocking AsyncFarcasterBot.iter_replies"""
+        return self._iterate(self.bot.iter_replies(*args, **kwargs))
+
+    def __getattr__(self, name: str):
+        if name == "bot":
+            raise AttributeError(name)
+        attribute = getattr(self.bot, name)
+        if not asyncio.iscoroutinefunction(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def blocking(*args, **kwargs):
+            return self._run(attribute(*args, **kwargs))
+        return blocking
+
+    def close(self):
+        """Close the connection pool and stop the loop thread"""
+        self._run(self.bot.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
@@ -1,63 +1,876 @@
 import os
+import json
 
-from time import sleep
-from typing import List, Dict, Optional
+from time import sleep, perf_counter, monotonic
+from typing import List, Dict, Optional, Tuple, Generator, Iterator, Callable
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import random
+import threading
 import requests
-import uuid
+import hashlib
+from requests.adapters import HTTPAdapter
 
 from dotenv import load_dotenv
 from datetime import datetime
 
+from file_lock_utils import file_lock, file_signature, write_file_atomic
+
 load_dotenv()
 
-class FarcasterBot:
-    def __init__(self):
-        """Initialize Warpcast bot with credentials"""
-        print("initializing bot")
+# base url of the neynar v2 api, can point to a local fake server (see fake_neynar_server.py)
+NAYNAR_API_URL = os.getenv("NAYNAR_API_URL", "https://api.neynar.com/v2/farcaster/")
+
+# responses worth retrying for idempotent requests
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# incremental notification state (newest seen timestamp, resume cursor, pending notifications)
+FARCASTER_STATE_FILE = os.getenv("FARCASTER_STATE_FILE", "farcaster_state.json")
+# notifications older than this are not worth acting on
+NOTIFICATION_WINDOW_SEC = 86400
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+# limiter priority lanes, lower goes first
+PRIORITY_WRITE = 0
+PRIORITY_READ = 1
+
+# endpoints that publish, everything else is a read
+WRITE_ENDPOINTS = ("cast", "notifications/seen")
+
+# (requests per second, burst capacity, tokens reserved for writes) per endpoint class, "all" is shared
+# by every request, defaults stay under the neynar starter plan limits (300 rpm per endpoint)
+DEFAULT_RATE_LIMITS = {
+    "all": (8.0, 40, 4),
+    "read": (5.0, 25, 0),
+    "write": (2.0, 10, 0),
+}
+
+# when a bucket runs low, identical reads within this many seconds are served from the last response
+COALESCE_WINDOW_SEC = 30
+
+# user profiles are cached this long, the cache keeps at most PROFILE_CACHE_SIZE profiles
+PROFILE_TTL_SEC = 600
+PROFILE_CACHE_SIZE = 1000
+# neynar user/bulk accepts up to 100 fids per request
+BULK_USER_LIMIT = 100
+# concurrent user/by_username requests of get_users (neynar has no bulk lookup by username)
+USERNAME_LOOKUP_CONCURRENCY = 8
+
+# page sizes used by the feed generators (max allowed by neynar per endpoint)
+CASTS_PAGE_SIZE = 150
+REPLIES_PAGE_SIZE = 50
+
+
+def project_user(user: Dict) -> Dict:
+    """
+    Keep only the user profile fields the agent uses
+
+    Args:
+        user (Dict): A neynar user object
+
+    Returns:
+        Dict: fid, username, display name, bio, follower counts and verified eth addresses
+    """
+    return {
+        'fid': user.get('fid'),
+        'username': user.get('username'),
+        'display_name': user.get('display_name'),
+        'bio': ((user.get('profile') or {}).get('bio') or {}).get('text'),
+        'follower_count': user.get('follower_count'),
+        'following_count': user.get('following_count'),
+        'verified_addresses': (user.get('verified_addresses') or {}).get('eth_addresses', []),
+    }
+
+
+class ProfileCache:
+    def __init__(self, ttl: float = PROFILE_TTL_SEC, max_size: int = PROFILE_CACHE_SIZE):
+        """
+        TTL + LRU cache of projected user profiles, keyed by fid with a username index
+        Args:
+            ttl (float): Seconds a profile stays valid
+            max_size (int): Max profiles kept, least recently used are evicted first
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.profiles: "OrderedDict[int, Tuple[float, Dict]]" = OrderedDict()
+        self.usernames: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, fid: Optional[int] = None, username: Optional[str] = None) -> Optional[Dict]:
+        """
+        Args:
+            fid (Optional[int]): The fid
+            username (Optional[str]): The username, used if no fid is given
+        Returns:
+            Optional[Dict]: The cached profile, or None if missing or expired
+        """
+        with self.lock:
+            if fid is None:
+                fid = self.usernames.get((username or "").lower())
+            entry = self.profiles.get(fid) if fid is not None else None
+            if entry is None or monotonic() - entry[0] > self.ttl:
+                self.misses += 1
+                return None
+            self.profiles.move_to_end(fid)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, profile: Dict):
+        """Add or refresh a projected profile"""
+        with self.lock:
+            fid = profile['fid']
+            self.profiles[fid] = (monotonic(), profile)
+            self.profiles.move_to_end(fid)
+            if profile.get('username'):
+                self.usernames[profile['username'].lower()] = fid
+            while len(self.profiles) > self.max_size:
+                _, (_, evicted) = self.profiles.popitem(last=False)
+                if evicted.get('username'):
+                    self.usernames.pop(evicted['username'].lower(), None)
+
+
+def parse_timestamp(timestamp: str) -> datetime:
+    """
+    Parse a neynar timestamp (ex: 2024-11-20T10:00:00.000Z) as naive utc
+    """
+    return datetime.strptime(timestamp, TIMESTAMP_FORMAT)
+
+
+def parse_notification(notification: Dict) -> Dict:
+    """
+    Extract the fields the agent uses from a neynar notification
+
+    Args:
+        notification (Dict): A reply or mention notification
+
+    Returns:
+        Dict: timestamp, hash, text, author, author fid, author verified address, parent and thread hash,
+            type and age
+    """
+    cast = notification['cast']
+    eth_addresses = cast['author'].get('verified_addresses', {}).get('eth_addresses', [])
+    return {
+        'timestamp': cast['timestamp'],
+        'hash': cast['hash'],
+        'text': cast['text'],
+        'author': cast['author']['username'],
+        'author_fid': cast['author']['fid'],
+        'author_verified_address': eth_addresses[0] if eth_addresses else None,
+        'parent_hash': cast.get('parent_hash'),
+        'thread_hash': cast.get('thread_hash') or cast['hash'],
+        'type': notification['type'],
+        'age_in_sec': (datetime.utcnow() - parse_timestamp(cast['timestamp'])).total_seconds()
+    }
+
+
+
+def parse_cast(cast: Dict) -> Dict:
+    """
+    Extract the fields the agent uses from a neynar cast
+
+    Args:
+        cast (Dict): A cast
+
+    Returns:
+        Dict: timestamp, hash, text, author and author fid
+    """
+    return {
+        'timestamp': cast['timestamp'],
+        'hash': cast['hash'],
+        'text': cast['text'],
+        'author': cast['author']['username'],
+        'author_fid': cast['author']['fid'],
+    }
+
+
+
+
+def parse_conversation(response_data: Dict) -> Dict:
+    """
+    Extract a thread from a neynar cast/conversation response
+
+    Args:
+        response_data (Dict): The response json
+
+    Returns:
+        Dict: parents (oldest first), the cast and its direct replies
+    """
+    conversation = response_data.get('conversation') or {}
+    cast = conversation.get('cast') or {}
+    return {
+        'parents': [parse_cast(parent) for parent in conversation.get('chronological_parent_casts') or []],
+        'cast': parse_cast(cast) if cast else None,
+        'replies': [parse_cast(reply) for reply in cast.get('direct_replies') or []],
+    }
+
+
+def feed_page(response_data: Dict, parse: Callable[[Dict], Dict], since: Optional[datetime],
+              remaining: Optional[int]) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Parse one page of a newest first cast feed
+
+    Args:
+        response_data (Dict): The response json
+        parse (Callable): Converts a cast into a compact record
+        since (Optional[datetime]): Casts older than this (naive utc) end the feed
+        remaining (Optional[int]): Records still wanted, None for no limit
+
+    Returns:
+        Tuple[List[Dict], Optional[str]]: The records and the next cursor, None when the feed is done
+    """
+    records = []
+    for cast in response_data.get('casts', []):
+        if since is not None and parse_timestamp(cast['timestamp']) < since:
+            return records, None
+        if remaining is not None and len(records) >= remaining:
+            return records, None
+        records.append(parse(cast))
+    cursor = (response_data.get('next') or {}).get('cursor')
+    if remaining is not None and len(records) >= remaining:
+        cursor = None
+    return records, cursor
+
+
+def parse_reply(reply: Dict) -> Dict:
+    """
+    Extract the fields the agent uses from a reply cast
+
+    Args:
+        reply (Dict): A reply cast
+
+    Returns:
+        Dict: timestamp, hash, text, author, author fid and parent hash
+    """
+    return {**parse_cast(reply), 'parent_hash': reply['parent_hash']}
+
+def cast_idempotency_key(text: str, parent: Optional[str] = None, channel_id: Optional[str] = None,
+                         signer_uuid: Optional[str] = None) -> str:
+    """
+    Content derived neynar idempotency key, a retried or repeated cast intent gets the same key
+
+    Args:
+        text (str): The cast text
+        parent (Optional[str]): The parent cast hash
+        channel_id (Optional[str]): The channel ID
+        signer_uuid (Optional[str]): The signer, defaults to NAYNAR_SIGNER_UUID
+
+    Returns:
+        str: 16 hex characters of the sha256 of the intent
+    """
+    signer_uuid = signer_uuid or os.getenv("NAYNAR_SIGNER_UUID") or ""
+    intent = "\n".join([signer_uuid, channel_id or "", parent or "", " ".join(text.split())])
+    return hashlib.sha256(intent.encode()).hexdigest()[:16]
+
+def cast_payload(content: str, channel_id: Optional[str] = None, parent: Optional[str] = None,
+                 parent_fid: Optional[str] = None, idem: Optional[str] = None) -> Dict:
+    """
+    Returns:
+        Dict: The body of a neynar cast request
+    """
+    payload = {
+        "signer_uuid": os.getenv("NAYNAR_SIGNER_UUID"),
+        "idem": idem or cast_idempotency_key(content, parent, channel_id),
+        "text": content,
+        "parent_author_fid": int(os.getenv("FARCASTER_FID"))
+    }
+    if parent:
+        payload["parent"] = parent
+    if parent_fid:
+        payload["parent_fid"] = parent_fid
+    if channel_id:
+        payload["channel_id"] = channel_id
+    return payload
+
+
+def cast_result(cast_hash: Optional[str] = None, status_code: Optional[int] = None,
+                error: Optional[str] = None) -> Dict:
+    """
+    Args:
+        cast_hash (Optional[str]): The hash of the posted cast
+        status_code (Optional[int]): The http status of the response, None if the request failed
+        error (Optional[str]): The response body or exception of a failed post
+    Returns:
+        Dict: The outcome of a cast post, 'hash' is set when the cast was posted
+    """
+    return {"hash": cast_hash, "status_code": status_code, "error": error}
+
+
+def describe_cast_result(result: Dict) -> str:
+    """
+    Returns:
+        str: Status message of a cast_result for the llm
+    """
+    if result["hash"]:
+        return f"Successfully posted cast with ID: {result['hash']}"
+    if result["status_code"] is not None:
+        return f"Error posting cast: {result['status_code']} - {result['error']}"
+    return f"Error posting cast: {result['error']}"
+
+
+class NotificationTracker:
+    def __init__(self, path: Optional[str] = None):
+        """
+        Incremental notification state persisted to a json file
+        The page scan does no i/o itself, so the sync and async clients drive the same logic.
+        Agent processes sharing the file change it under a file lock, after reading the changes of the others.
+        Args:
+            path (Optional[str]): The state file, defaults to FARCASTER_STATE_FILE
+        """
+        self.path = path or FARCASTER_STATE_FILE
+        self.lock_path = f"{self.path}.lock"
+        self.lock = threading.Lock()
+        self.signature = None
+        self.state = self.load()
+
+    def load(self) -> Dict:
+        """
+        Load the state file
+
+        Returns:
+            Dict: newest seen timestamp and hashes, resume cursor of an unfinished burst and pending notifications
+        """
+        state = {"newest_seen": None, "newest_hashes": [], "cursor": None, "burst_newest": None,
+                 "burst_hashes": [], "pending": {}}
+        self.signature = file_signature(self.path)
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r") as state_file:
+                    state.update(json.load(state_file))
+        except Exception as e:
+            print(f"Error loading farcaster state: {str(e)}")
+        return state
+
+    def save(self):
+        """Persist the state (synced temp file, then rename), the caller holds the locks"""
+        try:
+            write_file_atomic(self.path, json.dumps(self.state))
+            self.signature = file_signature(self.path)
+        except Exception as e:
+            print(f"Error saving farcaster state: {str(e)}")
+
+    def _refresh(self):
+        """Reload the state if another process saved it, the caller holds the lock"""
+        if file_signature(self.path) != self.signature:
+            self.state = self.load()
+
+    def scan(self, max_pages: Optional[int] = None) -> Generator[Dict, Dict, List[Dict]]:
+        """
+        Walk notification pages (newest first) until the previously seen notifications or the
+        notification window is reached, so a burst is read completely.
+        If `max_pages` stops a burst early, the cursor is persisted and the next scan resumes it.
+        Only one scan may run at a time.
+
+        Args:
+            max_pages (Optional[int]): Max pages read by this scan, None reads the whole burst
+
+        Yields:
+            Dict: Query parameters of the next notifications page, send back the page json
+
+        Returns:
+            List[Dict]: The new notifications, also added to the pending notifications
+        """
+        with self.lock:
+            self._refresh()
+            state = self.state
+            boundary = state["newest_seen"]
+            boundary_hashes = set(state["newest_hashes"])
+            cursor = state["cursor"]
+            burst_newest = state["burst_newest"]
+            burst_hashes = set(state["burst_hashes"])
+        window_start = datetime.utcnow().timestamp() - NOTIFICATION_WINDOW_SEC
+
+        new_notifications = []
+        pages = 0
+        while True:
+            params = {"fid": os.getenv("FARCASTER_FID"), "type": "mentions,replies",
+                      "priority_mode": "false", "limit": 25}
+            if cursor:
+                params["cursor"] = cursor
+            response_data = yield params
+            pages += 1
+
+            reached_seen = False
+            for notification in response_data.get('notifications', []):
+                if notification.get('type') not in ['reply', 'mention'] or 'cast' not in notification:
+                    continue
+                parsed = parse_notification(notification)
+                created = parse_timestamp(parsed['timestamp']).timestamp()
+                if boundary is not None and (created < boundary or
+                                             (created == boundary and parsed['hash'] in boundary_hashes)):
+                    reached_seen = True
+                    break
+                if created < window_start:
+                    reached_seen = True
+                    break
+                if burst_newest is None or created > burst_newest:
+                    burst_newest, burst_hashes = created, set()
+                if created == burst_newest:
+                    burst_hashes.add(parsed['hash'])
+                new_notifications.append(parsed)
+
+            cursor = (response_data.get('next') or {}).get('cursor')
+            if reached_seen or not cursor or (max_pages is not None and pages >= max_pages):
+                break
+
+        with self.lock, file_lock(self.lock_path):
+            # another process may have scanned meanwhile, the boundary only moves up
+            self._refresh()
+            state = self.state
+            if reached_seen or not cursor:
+                # burst fully read, move the boundary up
+                newest = state["newest_seen"]
+                if burst_newest is not None and (newest is None or burst_newest >= newest):
+                    if burst_newest == newest:
+                        burst_hashes |= set(state["newest_hashes"])
+                    state["newest_seen"], state["newest_hashes"] = burst_newest, sorted(burst_hashes)
+                state["cursor"], state["burst_newest"], state["burst_hashes"] = None, None, []
+            else:
+                state["cursor"], state["burst_newest"], state["burst_hashes"] = cursor, burst_newest, sorted(burst_hashes)
+            for notification in new_notifications:
+                state["pending"][notification['hash']] = notification
+            self.save()
+        return new_notifications
+
+    def pending(self) -> List[Dict]:
+        """
+        Returns:
+            List[Dict]: Pending notifications with a fresh age_in_sec, expired ones are dropped
+        """
+        with self.lock:
+            self._refresh()
+            pending = self.state["pending"]
+            now = datetime.utcnow()
+            for notification_hash, notification in list(pending.items()):
+                notification['age_in_sec'] = (now - parse_timestamp(notification['timestamp'])).total_seconds()
+                if notification['age_in_sec'] > NOTIFICATION_WINDOW_SEC:
+                    del pending[notification_hash]
+            return list(pending.values())
+
+    def discard(self, notification_hash: str):
+        """Remove a pending notification"""
+        with self.lock, file_lock(self.lock_path):
+            self._refresh()
+            if self.state["pending"].pop(notification_hash, None) is not None:
+                self.save()
+
+    def add(self, notification: Dict):
+        """Add a pending notification"""
+        with self.lock, file_lock(self.lock_path):
+            self._refresh()
+            self.state["pending"][notification['hash']] = notification
+            self.save()
+
+
+class EndpointStats:
+    def __init__(self, window: int = 1000):
+        """
+        Latency counters for one endpoint
+        Args:
+            window (int): Number of recent samples kept for percentiles
+        """
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.coalesced = 0
+        self.limiter_waits = 0
+        self.limiter_wait_ms = 0.0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.samples = deque(maxlen=window)
+
+    def record(self, elapsed_ms: float, error: bool = False):
+        """Record one request"""
+        self.count += 1
+        self.errors += int(error)
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.samples.append(elapsed_ms)
+
+    def percentile(self, pct: float) -> float:
+        """Latency percentile in ms over the recent samples"""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+    def summary(self) -> Dict:
+        """Counters and latencies as a dict"""
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "retries": self.retries,
+            "coalesced": self.coalesced,
+            "limiter_waits": self.limiter_waits,
+            "limiter_wait_ms": round(self.limiter_wait_ms, 1),
+            "avg_ms": round(self.total_ms / self.count, 1) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50), 1),
+            "p99_ms": round(self.percentile(99), 1),
+            "max_ms": round(self.max_ms, 1),
+        }
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int, reserve: int = 0):
+        """
+        Token bucket with priority lanes
+        Reads can not take the last `reserve` tokens and yield while a write is waiting.
+        Args:
+            rate (float): Tokens added per second
+            capacity (int): Max tokens (burst size)
+            reserve (int): Tokens only writes may use
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.reserve = reserve
+        self.tokens = float(capacity)
+        self.updated = monotonic()
+        self.waiting_writes = 0
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, priority: int = PRIORITY_READ) -> float:
+        """
+        Take a token if one is available to this lane
+        Args:
+            priority (int): PRIORITY_WRITE or PRIORITY_READ
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one should be available
+        """
+        with self.lock:
+            self._refill()
+            if priority != PRIORITY_WRITE and self.waiting_writes:
+                return 1 / self.rate
+            floor = 0 if priority == PRIORITY_WRITE else self.reserve
+            if self.tokens - 1 >= floor:
+                self.tokens -= 1
+                return 0.0
+            return (floor + 1 - self.tokens) / self.rate
+
+    @contextmanager
+    def waiting(self, priority: int):
+        """Register a waiting write so reads yield to it"""
+        if priority != PRIORITY_WRITE:
+            yield
+            return
+        with self.lock:
+            self.waiting_writes += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.waiting_writes -= 1
+
+    def acquire(self, priority: int = PRIORITY_READ) -> float:
+        """
+        Block until a token is taken
+        Args:
+            priority (int): PRIORITY_WRITE or PRIORITY_READ
+        Returns:
+            float: Seconds waited
+        """
+        start = monotonic()
+        with self.waiting(priority):
+            while (delay := self.try_acquire(priority)) > 0:
+                sleep(delay)
+        return monotonic() - start
+
+    def is_low(self) -> bool:
+        """True when reads are about to be throttled"""
+        with self.lock:
+            self._refill()
+            return self.tokens < self.reserve + 2
+
+    def drain(self):
+        """Empty the bucket (ex: after a 429 from the api)"""
+        with self.lock:
+            self.tokens = 0.0
+            self.updated = monotonic()
 
-        self.v2_url = "https://api.neynar.com/v2/farcaster/"
+
+class FarcasterClientBase:
+    def __init__(self, base_url: Optional[str] = None, timeout: Tuple[float, float] = (3.05, 15),
+                 max_retries: int = 3, backoff: float = 0.5, max_backoff: float = 20,
+                 rate_limits: Optional[Dict[str, Tuple[float, int, int]]] = None):
+        """
+        State shared by the sync and async neynar clients: limiter, latency stats, read coalescing,
+        profile cache and notification tracker
+        Args:
+            base_url (Optional[str]): The neynar v2 api url, defaults to NAYNAR_API_URL
+            timeout (Tuple[float, float]): Connect and read timeouts in seconds
+            max_retries (int): Max retries of a GET request
+            backoff (float): Base backoff in seconds, doubled on every retry
+            max_backoff (float): Max seconds to wait between retries (also caps Retry-After)
+            rate_limits (Optional[Dict]): (rate, capacity, reserve) per class ("all", "read", "write"),
+                defaults to DEFAULT_RATE_LIMITS
+        """
+        self.v2_url = base_url or NAYNAR_API_URL
         self.headers = {
             "accept": "application/json",
             "content-type": "application/json",
             "x-api-key": os.getenv("NAYNAR_API_KEY")
         }
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
 
-        
-    def post_cast(self, content: str, channel_id: Optional[str] = None,parent: Optional[str] = None, parent_fid: Optional[str] = None) -> str:
+        self._stats: Dict[str, EndpointStats] = {}
+        self._stats_lock = threading.Lock()
+
+        self.buckets = {
+            name: TokenBucket(*limits)
+            for name, limits in {**DEFAULT_RATE_LIMITS, **(rate_limits or {})}.items()
+        }
+        # (endpoint, params) -> (time, response) of recent reads, used to coalesce reads when throttled
+        self._recent_reads: Dict[Tuple, Tuple[float, object]] = {}
+        self._recent_reads_lock = threading.Lock()
+
+        self.profiles = ProfileCache()
+        self.notifications = NotificationTracker()
+
+    def _endpoint_stats(self, endpoint: str) -> EndpointStats:
+        """Get or create the stats of an endpoint"""
+        with self._stats_lock:
+            if endpoint not in self._stats:
+                self._stats[endpoint] = EndpointStats()
+            return self._stats[endpoint]
+
+    def _retry_delay(self, attempt: int, response) -> float:
+        """
+        Seconds to wait before a retry, honours Retry-After and otherwise uses jittered exponential backoff
+        Args:
+            attempt (int): The retry number, starting at 0
+            response: The failed response, if any
+        Returns:
+            float: The delay
+        """
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        delay = self.backoff * (2 ** attempt)
+        return min(delay * random.uniform(0.5, 1.5), self.max_backoff)
+
+    def _endpoint_class(self, endpoint: str) -> Tuple[str, int]:
         """
-        Post a cast
-        
+        Args:
+            endpoint (str): The endpoint path
+        Returns:
+            Tuple[str, int]: The limiter class and priority lane of the endpoint
+        """
+        if endpoint in WRITE_ENDPOINTS:
+            return "write", PRIORITY_WRITE
+        return "read", PRIORITY_READ
+
+    def _record_response(self, stats: EndpointStats, endpoint_class: str, read_key: Optional[Tuple],
+                         response, elapsed_ms: float) -> bool:
+        """
+        Update stats, limiter and coalescing after a response
+        Returns:
+            bool: True if the response is worth retrying
+        """
+        stats.record(elapsed_ms, error=response.status_code >= 400)
+        if response.status_code == 429:
+            # the api says we are over the limit, make every caller back off
+            self.buckets["all"].drain()
+            self.buckets[endpoint_class].drain()
+        if read_key and response.status_code == 200:
+            self._remember_read(read_key, response)
+        return response.status_code in RETRY_STATUS_CODES
+
+    def _coalesced_read(self, read_key: Tuple, endpoint_class: str):
+        """
+        Return a recent identical read if the limiter is running low
+        Args:
+            read_key (Tuple): The endpoint and sorted query parameters
+            endpoint_class (str): The limiter class
+        Returns:
+            The recent response, or None if a request should be sent
+        """
+        if not (self.buckets["all"].is_low() or self.buckets[endpoint_class].is_low()):
+            return None
+        with self._recent_reads_lock:
+            recent = self._recent_reads.get(read_key)
+        if recent and monotonic() - recent[0] <= COALESCE_WINDOW_SEC:
+            return recent[1]
+        return None
+
+    def _remember_read(self, read_key: Tuple, response):
+        """Keep a successful read for coalescing"""
+        with self._recent_reads_lock:
+            now = monotonic()
+            self._recent_reads[read_key] = (now, response)
+            if len(self._recent_reads) > 256:
+                self._recent_reads = {
+                    key: value for key, value in self._recent_reads.items()
+                    if now - value[0] <= COALESCE_WINDOW_SEC
+                }
+
+    def get_latency_stats(self) -> Dict[str, Dict]:
+        """
+        Get per endpoint request counters and latencies
+
+        Returns:
+            Dict[str, Dict]: Stats keyed by endpoint
+        """
+        with self._stats_lock:
+            return {endpoint: stats.summary() for endpoint, stats in self._stats.items()}
+
+    def discard_notification(self, notification_hash: str):
+        """
+        Remove a notification from the pending notifications (ex: once acted on)
+
+        Args:
+            notification_hash (str): The cast hash of the notification
+        """
+        self.notifications.discard(notification_hash)
+
+    def add_pending_notification(self, notification: Dict):
+        """
+        Add a notification received outside of polling (ex: from the webhook receiver)
+
+        Args:
+            notification (Dict): A parsed notification
+        """
+        self.notifications.add(notification)
+
+
+class FarcasterBot(FarcasterClientBase):
+    def __init__(self, base_url: Optional[str] = None, timeout: Tuple[float, float] = (3.05, 15),
+                 max_retries: int = 3, backoff: float = 0.5, max_backoff: float = 20,
+                 rate_limits: Optional[Dict[str, Tuple[float, int, int]]] = None):
+        """
+        Initialize Warpcast bot with credentials
+        All requests share one keep-alive session, idempotent GETs are retried with jittered backoff.
+        Requests go through client side token buckets per endpoint class, writes have priority over reads.
+        See farcaster_async_utils.py for the asyncio variant.
+        Args:
+            base_url (Optional[str]): The neynar v2 api url, defaults to NAYNAR_API_URL
+            timeout (Tuple[float, float]): Connect and read timeouts in seconds
+            max_retries (int): Max retries of a GET request
+            backoff (float): Base backoff in seconds, doubled on every retry
+            max_backoff (float): Max seconds to wait between retries (also caps Retry-After)
+            rate_limits (Optional[Dict]): (rate, capacity, reserve) per class ("all", "read", "write"),
+                defaults to DEFAULT_RATE_LIMITS
+        """
+        print("initializing bot")
+        super().__init__(base_url, timeout, max_retries, backoff, max_backoff, rate_limits)
+
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._notification_lock = threading.Lock()
+
+    def _request(self, method: str, endpoint: str, params: Optional[Dict] = None,
+                 json: Optional[Dict] = None) -> requests.Response:
+        """
+        Send a request to the neynar api over the pooled session
+        GETs are retried on connection errors, timeouts and 429/5xx responses.
+        Args:
+            method (str): The http method
+            endpoint (str): The endpoint path relative to the v2 url (ex: notifications)
+            params (Optional[Dict]): The query parameters
+            json (Optional[Dict]): The json body
+        Returns:
+            requests.Response: The last response
+        """
+        stats = self._endpoint_stats(endpoint)
+        endpoint_class, priority = self._endpoint_class(endpoint)
+        read_key = (endpoint, tuple(sorted((params or {}).items()))) if method == "GET" else None
+        if read_key and (coalesced := self._coalesced_read(read_key, endpoint_class)) is not None:
+            stats.coalesced += 1
+            return coalesced
+
+        retries = self.max_retries if method == "GET" else 0
+        attempt = 0
+        while True:
+            waited = self._acquire(endpoint_class, priority)
+            if waited > 0.001:
+                stats.limiter_waits += 1
+                stats.limiter_wait_ms += waited * 1000
+            start = perf_counter()
+            response = None
+            try:
+                response = self.session.request(method, self.v2_url + endpoint, params=params, json=json,
+                                                timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                stats.record((perf_counter() - start) * 1000, error=True)
+                if attempt >= retries:
+                    raise
+            else:
+                failed = self._record_response(stats, endpoint_class, read_key, response,
+                                               (perf_counter() - start) * 1000)
+                if not failed or attempt >= retries:
+                    return response
+            stats.retries += 1
+            sleep(self._retry_delay(attempt, response))
+            attempt += 1
+
+    def _acquire(self, endpoint_class: str, priority: int) -> float:
+        """
+        Take a token from the shared bucket and the endpoint class bucket
+        Returns:
+            float: Seconds waited
+        """
+        return self.buckets["all"].acquire(priority) + self.buckets[endpoint_class].acquire(priority)
+
+
+    def send_cast(self, content: str, channel_id: Optional[str] = None, parent: Optional[str] = None,
+                  parent_fid: Optional[str] = None, idem: Optional[str] = None) -> Dict:
+        """
+        Post a cast and return the outcome as data (used by the cast queue)
+
         Args:
             content (str): The content of the cast
             channel_id (Optional[str]): The channel ID
             parent (Optional[str]): The parent cast hash (for reply)
-            
+            idem (Optional[str]): The idempotency key, defaults to one derived from the content
+
         Returns:
-            str: Status message about the cast
+            Dict: see cast_result
         """
         try:
             channel_id = channel_id or os.getenv("FARCASTER_CHANNEL_ID")
             url = self.v2_url + "cast"
             print("url", url)
-            unique_id = str(uuid.uuid4())[:16]
-            payload = { 
-                "signer_uuid": os.getenv("NAYNAR_SIGNER_UUID"),
-                "idem": unique_id,
-                "text": content,
-                "parent_author_fid": int(os.getenv("FARCASTER_FID"))
-            }
-            if parent:
-                payload["parent"] = parent
-            if parent_fid:
-                payload["parent_fid"] = parent_fid
-            if channel_id:
-                payload["channel_id"] = channel_id
+            payload = cast_payload(content, channel_id, parent, parent_fid, idem)
             print("payload", payload)
-            response = requests.post(url, json=payload, headers=self.headers)
+            response = self._request("POST", "cast", json=payload)
             print("response", response)
-            return f"Successfully posted cast with ID: {response.json()['cast']['hash']}"
+            if response.status_code != 200:
+                return cast_result(status_code=response.status_code, error=response.text)
+            return cast_result(cast_hash=response.json()['cast']['hash'], status_code=response.status_code)
         except Exception as e:
-            return f"Error posting cast: {str(e)}"
+            return cast_result(error=str(e))
+
+    def post_cast(self, content: str, channel_id: Optional[str] = None,parent: Optional[str] = None, parent_fid: Optional[str] = None,
+                  idem: Optional[str] = None) -> str:
+        """
+        Post a cast
+        
+        Args:
+            content (str): The content of the cast
+            channel_id (Optional[str]): The channel ID
+            parent (Optional[str]): The parent cast hash (for reply)
+            idem (Optional[str]): The idempotency key, defaults to one derived from the content
+            
+        Returns:
+            str: Status message about the cast
+        """
+        return describe_cast_result(self.send_cast(content, channel_id, parent, parent_fid, idem))
         
         
     def get_replies(self) -> Dict:
@@ -68,8 +881,8 @@ class FarcasterBot:
             Dict: Cast object containing relevant information
         """
         try:
-            url = self.v2_url + "feed/user/replies_and_recasts?fid=" + os.getenv("FARCASTER_FID") + "&filter=all&limit=25"
-            response = requests.get(url, headers=self.headers)
+            params = {"fid": os.getenv("FARCASTER_FID"), "filter": "all", "limit": 25}
+            response = self._request("GET", "feed/user/replies_and_recasts", params=params)
             
             if response.status_code != 200:
                 return f"Error getting relies: {response.status_code} - {response.text}"
@@ -81,18 +894,7 @@ class FarcasterBot:
             replies = response_data.get('casts', [])
 
             # Extracting details from each notification
-            result = [
-                {
-                    'timestamp': reply['timestamp'],
-                    'parent_hash': reply['parent_hash'],
-                    'hash': reply['hash'],
-                    'text': reply['text'],
-                    'author': reply['author']['username'],
-                    'author_fid':  reply['author']['fid'],
-                    
-                }
-                for reply in replies
-            ]
+            result = [parse_reply(reply) for reply in replies]
 
             return result
 
@@ -128,8 +930,8 @@ class FarcasterBot:
         """
         try:
             # Constructing the URL for fetching notifications
-            url = self.v2_url + "notifications?fid=" + os.getenv("FARCASTER_FID") + "&type=mentions,replies&priority_mode=false"
-            response = requests.get(url, headers=self.headers)
+            params = {"fid": os.getenv("FARCASTER_FID"), "type": "mentions,replies", "priority_mode": "false"}
+            response = self._request("GET", "notifications", params=params)
             # Ensure the response is successful
             if response.status_code != 200:
                 return f"Error getting notifications: {response.status_code} - {response.text}"
@@ -140,24 +942,8 @@ class FarcasterBot:
             # Extract the list of notifications from the response
             notifications = response_data.get('notifications', [])
 
-# notification['cast']['author']['verified_address']['eth_addresses'][0]
             result = [
-                {
-                    'timestamp': notification['cast']['timestamp'],
-                    'hash': notification['cast']['hash'],
-                    'text': notification['cast']['text'],
-                    'author': notification['cast']['author']['username'],
-                    'author_fid':  notification['cast']['author']['fid'],
-                    'author_verified_address': (
-                            notification['cast']['author']['verified_addresses']['eth_addresses'][0]
-                            if 'verified_addresses' in notification['cast']['author'] and
-                            'eth_addresses' in notification['cast']['author']['verified_addresses'] and
-                            len(notification['cast']['author']['verified_addresses']['eth_addresses']) > 0
-                            else None
-                        ),
-                    'type': notification['type'],
-                    'age_in_sec': (datetime.utcnow() - datetime.strptime(notification['cast']['timestamp'], "%Y-%m-%dT%H:%M:%S.%fZ")).total_seconds()
-                }
+                parse_notification(notification)
                 for notification in notifications
                 if notification.get('type') in ['reply', 'mention'] and 'cast' in notification
             ]
@@ -169,6 +955,48 @@ class FarcasterBot:
             return f"Error getting notifications: {str(e)}"
 
 
+    def fetch_new_notifications(self, max_pages: Optional[int] = None) -> List[Dict]:
+        """
+        Fetch only notifications newer than the newest one already seen
+        Pages (newest first) are followed with the neynar cursor until the previously seen
+        notifications or the notification window is reached, so a burst is read completely.
+        If `max_pages` stops a burst early, the cursor is persisted and the next call resumes it.
+
+        Args:
+            max_pages (Optional[int]): Max pages fetched by this call, None reads the whole burst
+
+        Returns:
+            List[Dict]: The new notifications, also added to the pending notifications
+        """
+        with self._notification_lock:
+            scan = self.notifications.scan(max_pages)
+            try:
+                params = next(scan)
+                while True:
+                    response = self._request("GET", "notifications", params=params)
+                    if response.status_code != 200:
+                        raise requests.HTTPError(f"{response.status_code} - {response.text}")
+                    params = scan.send(response.json())
+            except StopIteration as done:
+                return done.value
+
+    def get_pending_notifications(self, fetch: bool = True) -> List[Dict]:
+        """
+        Get notifications that are not discarded yet and not older than the notification window
+
+        Args:
+            fetch (bool): Fetch new notifications first
+
+        Returns:
+            List[Dict]: Pending notifications with a fresh age_in_sec
+        """
+        try:
+            if fetch:
+                self.fetch_new_notifications()
+            return self.notifications.pending()
+        except Exception as e:
+            return f"Error getting notifications: {str(e)}"
+
     def mark_notifications_as_seen(self) -> str:
         """
         Mark a notification as seen
@@ -179,9 +1007,8 @@ class FarcasterBot:
         """
 
         try:
-            url = self.v2_url + "notifications/seen"
-            payload = os.getenv("NAYNAR_SIGNER_UUID")
-            response = requests.post(url, json=payload, headers=self.headers)
+            payload = {"signer_uuid": os.getenv("NAYNAR_SIGNER_UUID")}
+            response = self._request("POST", "notifications/seen", json=payload)
             print(response.text)
             return f"Successfully marked notifications as seen {response}"
         except Exception as e:
@@ -203,9 +1030,9 @@ class FarcasterBot:
         viewer_fid = os.getenv("FARCASTER_FID")
         try:
             # Constructing the URL for fetching casts
-            url = self.v2_url + f"feed/user/casts?fid={fid}&viewer_fid={viewer_fid}&limit={limit}&include_replies={include_replies}"
+            params = {"fid": fid, "viewer_fid": viewer_fid, "limit": limit, "include_replies": str(include_replies).lower()}
 
-            response = requests.get(url, headers=self.headers)
+            response = self._request("GET", "feed/user/casts", params=params)
 
             # Ensure the response is successful
             if response.status_code != 200:
@@ -218,16 +1045,7 @@ class FarcasterBot:
             casts = response_data.get('casts', [])
 
             # Extracting details from each cast
-            result = [
-                {
-                    'timestamp': cast['timestamp'],
-                    'hash': cast['hash'],
-                    'text': cast['text'],
-                    'author': cast['author']['username'],
-                    'author_fid':  cast['author']['fid'],
-                }
-                for cast in casts
-            ]
+            result = [parse_cast(cast) for cast in casts]
 
             return result
 
@@ -235,6 +1053,83 @@ class FarcasterBot:
             return f"Error getting casts: {str(e)}"
 
 
+    def _iter_feed(self, endpoint: str, params: Dict, page_size: int, parse: Callable[[Dict], Dict],
+                   since: Optional[datetime], max_count: Optional[int]) -> Iterator[Dict]:
+        """
+        Follow the cursor of a newest first feed, one page is requested at a time
+        """
+        cursor, count = None, 0
+        while True:
+            page_params = {**params, "limit": page_size if max_count is None else min(page_size, max_count - count)}
+            if cursor:
+                page_params["cursor"] = cursor
+            response = self._request("GET", endpoint, params=page_params)
+            if response.status_code != 200:
+                raise requests.HTTPError(f"{response.status_code} - {response.text}")
+            records, cursor = feed_page(response.json(), parse, since,
+                                        None if max_count is None else max_count - count)
+            yield from records
+            count += len(records)
+            if not cursor:
+                return
+
+    def iter_casts(self, fid: Optional[str] = None, since: Optional[datetime] = None, max_count: Optional[int] = None,
+                   include_replies: bool = True) -> Iterator[Dict]:
+        """
+        Lazily walk the casts of a user, newest first, following the neynar cursor
+
+        Args:
+            fid (Optional[str]): The fid of the user, defaults to the agent
+            since (Optional[datetime]): Stop at casts older than this (naive utc)
+            max_count (Optional[int]): Stop after this many casts
+            include_replies (bool): Whether to include replies
+
+        Returns:
+            Iterator[Dict]: Casts containing timestamp, hash, text, and author
+        """
+        params = {"fid": fid or os.getenv("FARCASTER_FID"), "viewer_fid": os.getenv("FARCASTER_FID"),
+                  "include_replies": str(include_replies).lower()}
+        return self._iter_feed("feed/user/casts", params, CASTS_PAGE_SIZE, parse_cast, since, max_count)
+
+    def iter_replies(self, fid: Optional[str] = None, since: Optional[datetime] = None,
+                     max_count: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Lazily walk the replies of a user, newest first, following the neynar cursor
+
+        Args:
+            fid (Optional[str]): The fid of the user, defaults to the agent
+            since (Optional[datetime]): Stop at replies older than this (naive utc)
+            max_count (Optional[int]): Stop after this many replies
+
+        Returns:
+            Iterator[Dict]: Replies containing timestamp, hash, text, author and parent hash
+        """
+        params = {"fid": fid or os.getenv("FARCASTER_FID"), "filter": "replies"}
+        return self._iter_feed("feed/user/replies_and_recasts", params, REPLIES_PAGE_SIZE, parse_reply, since,
+                               max_count)
+
+    def get_conversation(self, cast_hash: str, reply_limit: int = 20) -> Dict:
+        """
+        Get the thread around a cast: its parent casts and direct replies
+
+        Args:
+            cast_hash (str): The cast hash
+            reply_limit (int): Max direct replies
+
+        Returns:
+            Dict: parents (oldest first), the cast and its direct replies
+        """
+        try:
+            params = {"identifier": cast_hash, "type": "hash", "reply_depth": 1,
+                      "include_chronological_parent_casts": "true", "limit": reply_limit,
+                      "viewer_fid": os.getenv("FARCASTER_FID")}
+            response = self._request("GET", "cast/conversation", params=params)
+            if response.status_code != 200:
+                return f"Error getting conversation: {response.status_code} - {response.text}"
+            return parse_conversation(response.json())
+        except Exception as e:
+            return f"Error getting conversation: {str(e)}"
+
     def get_user_by_username(self, username: str) -> Dict:
         """
         Get user information by username
@@ -243,12 +1138,85 @@ class FarcasterBot:
             username (str): The username of the user
             
         Returns:
-            Dict: User information
+            Dict: User profile (fid, username, display name, bio, follower counts, verified addresses)
         """
         try:
-            url = self.v2_url + f"user/by_username?username={username}&viewer_fid={os.getenv('FARCASTER_FID')}"
-            response = requests.get(url, headers=self.headers)
+            username = username.strip().lstrip("@")
+            cached = self.profiles.get(username=username)
+            if cached:
+                return cached
+            params = {"username": username, "viewer_fid": os.getenv("FARCASTER_FID")}
+            response = self._request("GET", "user/by_username", params=params)
+            if response.status_code != 200:
+                return f"Error getting user by username: {response.status_code} - {response.text}"
 
-            return response.json()
+            profile = project_user(response.json()['user'])
+            self.profiles.put(profile)
+            return profile
         except Exception as e:
             return f"Error getting user by username: {str(e)}"
+
+    def get_users_by_fids(self, fids: List[int]) -> List[Dict]:
+        """
+        Get user profiles by fid, cache misses are fetched in bulk (100 fids per request)
+
+        Args:
+            fids (List[int]): The fids
+
+        Returns:
+            List[Dict]: User profiles in the order of the fids, unknown fids are skipped
+        """
+        try:
+            fids = [int(fid) for fid in fids]
+            found = {}
+            missing = []
+            for fid in dict.fromkeys(fids):
+                cached = self.profiles.get(fid=fid)
+                if cached:
+                    found[fid] = cached
+                else:
+                    missing.append(fid)
+
+            for i in range(0, len(missing), BULK_USER_LIMIT):
+                chunk = missing[i:i + BULK_USER_LIMIT]
+                params = {"fids": ",".join(str(fid) for fid in chunk), "viewer_fid": os.getenv("FARCASTER_FID")}
+                response = self._request("GET", "user/bulk", params=params)
+                if response.status_code != 200:
+                    return f"Error getting users: {response.status_code} - {response.text}"
+                for user in response.json().get('users', []):
+                    profile = project_user(user)
+                    self.profiles.put(profile)
+                    found[profile['fid']] = profile
+
+            return [found[fid] for fid in dict.fromkeys(fids) if fid in found]
+        except Exception as e:
+            return f"Error getting users: {str(e)}"
+
+    def get_users(self, users: List[str]) -> List[Dict]:
+        """
+        Resolve many users at once, numbers are treated as fids and everything else as usernames
+        Fids are fetched in bulk. Neynar has no bulk lookup by username (user/bulk only takes fids), so every
+        username missing from the profile cache costs one user/by_username request, those run concurrently.
+
+        Args:
+            users (List[str]): fids or usernames
+
+        Returns:
+            List[Dict]: User profiles
+        """
+        fids = [int(user) for user in users if str(user).strip().isdigit()]
+        usernames = list(dict.fromkeys(str(user).strip().lstrip("@") for user in users
+                                       if not str(user).strip().isdigit()))
+        profiles = self.get_users_by_fids(fids) if fids else []
+        if isinstance(profiles, str):
+            return profiles
+        missing = [username for username in usernames if not self.profiles.get(username=username)]
+        resolved = {}
+        if len(missing) > 1:
+            with ThreadPoolExecutor(max_workers=min(len(missing), USERNAME_LOOKUP_CONCURRENCY)) as executor:
+                resolved = dict(zip(missing, executor.map(self.get_user_by_username, missing)))
+        for username in usernames:
+            profile = resolved[username] if username in resolved else self.get_user_by_username(username)
+            if isinstance(profile, dict):
+                profiles.append(profile)
+        return profiles
@@ -0,0 +1,177 @@
+import os
+import hmac
+import json
+import queue
+import hashlib
+import threading
+
+from typing import Dict, Optional, Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dotenv import load_dotenv
+
+from farcaster_utils import parse_notification
+
+load_dotenv()
+
+# neynar signs the raw request body with the webhook secret (hmac sha512, hex)
+SIGNATURE_HEADER = "X-Neynar-Signature"
+
+
+def sign_payload(body: bytes, secret: str) -> str:
+    """
+    Sign a webhook body the way neynar does
+    Args:
+        body (bytes): The raw request body
+        secret (str): The webhook secret
+    Returns:
+        str: The hex signature
+    """
+    return hmac.new(secret.encode(), body, hashlib.sha512).hexdigest()
+
+
+def verify_signature(body: bytes, signature: Optional[str], secret: str) -> bool:
+    """
+    Verify a webhook signature
+    Args:
+        body (bytes): The raw request body
+        signature (Optional[str]): The signature header
+        secret (str): The webhook secret
+    Returns:
+        bool: True if the signature matches
+    """
+    if not signature:
+        return False
+    return hmac.compare_digest(sign_payload(body, secret), signature)
+
+
+def notification_from_event(event: Dict, agent_fid: int) -> Optional[Dict]:
+    """
+    Convert a cast.created webhook event into a notification if it mentions or replies to the agent
+    Events that are not objects are ignored, a cast missing a field the notification needs (ex: timestamp) raises.
+    Args:
+        event (Dict): The webhook event
+        agent_fid (int): The fid of the agent
+    Returns:
+        Optional[Dict]: The notification in the same shape as FarcasterBot.get_notifications, or None
+    """
+    if not isinstance(event, dict) or event.get("type") != "cast.created":
+        return None
+    cast = event.get("data")
+    if not isinstance(cast, dict) or not cast.get("hash") or (cast.get("author") or {}).get("fid") == agent_fid:
+        return None
+    if (cast.get("parent_author") or {}).get("fid") == agent_fid:
+        kind = "reply"
+    elif any(profile.get("fid") == agent_fid for profile in cast.get("mentioned_profiles") or []):
+        kind = "mention"
+    else:
+        return None
+    return parse_notification({"type": kind, "cast": cast})
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, message: str):
+        data = json.dumps({"message": message}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        receiver = self.server.receiver
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        if not verify_signature(body, self.headers.get(SIGNATURE_HEADER), receiver.secret):
+            receiver.rejected += 1
+            return self._reply(401, "invalid signature")
+        try:
+            event = json.loads(body)
+        except ValueError:
+            return self._reply(400, "invalid json")
+        if not isinstance(event, dict):
+            return self._reply(400, "invalid event")
+        try:
+            receiver.handle_event(event)
+        except Exception as e:
+            print(f"Error handling webhook event: {str(e)}")
+            return self._reply(400, "invalid event")
+        return self._reply(200, "ok")
+
+
+class NotificationWebhook:
+    def __init__(self, secret: Optional[str] = None, host: Optional[str] = None, port: Optional[int] = None,
+                 agent_fid: Optional[int] = None, on_notification: Optional[Callable[[Dict], None]] = None):
+        """
+        Local http receiver for neynar cast webhooks
+        Verified mentions and replies are pushed into an in-process queue that wakes the agent loop.
+        Args:
+            secret (Optional[str]): The webhook secret, defaults to NAYNAR_WEBHOOK_SECRET
+            host (Optional[str]): The host to bind, defaults to WEBHOOK_HOST (127.0.0.1, 0.0.0.0 listens on all interfaces)
+            port (Optional[int]): The port to bind, defaults to WEBHOOK_PORT (8788)
+            agent_fid (Optional[int]): The fid of the agent, defaults to FARCASTER_FID
+            on_notification (Optional[Callable]): Called with every notification (ex: FarcasterBot.add_pending_notification)
+        """
+        print("initializing notification webhook")
+        self.secret = secret or os.getenv("NAYNAR_WEBHOOK_SECRET")
+        if not self.secret:
+            raise ValueError("NAYNAR_WEBHOOK_SECRET must be set in the .env file")
+        self.host = host or os.getenv("WEBHOOK_HOST", "127.0.0.1")
+        self.port = int(port if port is not None else os.getenv("WEBHOOK_PORT", "8788"))
+        self.agent_fid = int(agent_fid if agent_fid is not None else os.getenv("FARCASTER_FID"))
+        self.on_notification = on_notification
+        self.queue: "queue.Queue[Dict]" = queue.Queue()
+        self.received = 0
+        self.rejected = 0
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    def start(self) -> int:
+        """
+        Start receiving on a background thread
+        Returns:
+            int: The bound port
+        """
+        self.server = ThreadingHTTPServer((self.host, self.port), _WebhookHandler)
+        self.server.daemon_threads = True
+        self.server.receiver = self
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"listening for neynar webhooks on {self.host}:{self.port}")
+        return self.port
+
+    def stop(self):
+        """Stop the receiver"""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def handle_event(self, event: Dict):
+        """
+        Queue a verified webhook event if it is a mention or reply to the agent
+        Args:
+            event (Dict): The webhook event
+        """
+        self.received += 1
+        notification = notification_from_event(event, self.agent_fid)
+        if notification is None:
+            return
+        if self.on_notification:
+            self.on_notification(notification)
+        self.queue.put(notification)
+
+    def wait(self, timeout: float) -> Optional[Dict]:
+        """
+        Block until a notification arrives or the timeout passes
+        Args:
+            timeout (float): Max seconds to wait
+        Returns:
+            Optional[Dict]: The next queued notification, or None on timeout
+        """
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
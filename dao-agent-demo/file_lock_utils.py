@@ -0,0 +1,77 @@
+import os
+
+from contextlib import contextmanager
+from typing import IO, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # windows, locks only guard the threads of one process
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path: str, blocking: bool = True) -> Iterator[bool]:
+    """
+    Exclusive lock shared by all processes on `path` (created if missing), released when the block exits
+    Args:
+        path (str): The lock file
+        blocking (bool): Wait for the lock, otherwise yield False right away if another process holds it
+    Returns:
+        Iterator[bool]: True if the lock is held
+    """
+    with open(path, "a") as lock_file:
+        acquired = lock(lock_file, blocking)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                unlock(lock_file)
+
+
+def lock(lock_file: IO, blocking: bool = True) -> bool:
+    """
+    Take the exclusive lock of an open lock file, it is held until `unlock` or until the file is closed
+    Returns:
+        bool: True if the lock is held, False if not blocking and another process holds it
+    """
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def unlock(lock_file: IO):
+    if fcntl is not None:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def file_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    """
+    Returns:
+        Optional[Tuple[int, int, int]]: (inode, mtime ns, size) of a file, changes when another process replaces
+            or appends to it, None if it does not exist
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def write_file_atomic(path: str, content: str):
+    """Write a file through a synced temp file and a rename, readers see the old or the new content, never a mix"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as tmp_file:
+        tmp_file.write(content)
+        tmp_file.flush()
+        os.fsync(tmp_file.fileno())
+    os.replace(tmp_path, path)
+    if hasattr(os, "O_DIRECTORY"):
+        directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
@@ -0,0 +1,234 @@
+import os
+import json
+
+from typing import List, Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# output format for graph tool results: "json" (row oriented) or "table"
+GRAPH_TOOL_FORMAT = os.getenv("GRAPH_TOOL_FORMAT", "json")
+# approximate max tokens a single graph tool result may use in the llm context
+GRAPH_TOOL_TOKEN_BUDGET = int(os.getenv("GRAPH_TOOL_TOKEN_BUDGET", "1500"))
+# long text fields (ex: proposal descriptions) are cut to this many characters
+GRAPH_TOOL_MAX_TEXT = int(os.getenv("GRAPH_TOOL_MAX_TEXT", "280"))
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token estimate (~4 characters per token for english text and json)
+    Args:
+        text (str): The text
+    Returns:
+        int: Estimated token count
+    """
+    return (len(text) + 3) // 4
+
+
+def truncate_text(text: str, max_chars: int) -> str:
+    """
+    Collapse whitespace and truncate text
+    Args:
+        text (str): The text
+        max_chars (int): Max characters kept
+    Returns:
+        str: The truncated text
+    """
+    text = " ".join(str(text).split())
+    if len(text) > max_chars:
+        return text[:max_chars].rstrip() + "..."
+    return text
+
+
+def parse_details(details) -> Dict:
+    """
+    Parse a daohaus proposal `details` JSON blob into title and description fields
+    Args:
+        details: The details string
+    Returns:
+        Dict: title, description and link if present, or the raw text as description
+    """
+    if not details:
+        return {}
+    try:
+        parsed = json.loads(details)
+    except (TypeError, ValueError):
+        return {"description": details}
+    if not isinstance(parsed, dict):
+        return {"description": details}
+    fields = {}
+    for key, name in (("title", "title"), ("description", "description"), ("contentURI", "link")):
+        if parsed.get(key):
+            fields[name] = parsed[key]
+    return fields
+
+
+def strip_column_prefix(columns: List[str]) -> Dict[str, str]:
+    """
+    Map subgrounds column names (ex: proposals_proposalId) to short names (proposalId)
+    Args:
+        columns (List[str]): The dataframe columns
+    Returns:
+        Dict[str, str]: Column name to short name
+    """
+    prefixes = {column.split("_", 1)[0] for column in columns if "_" in column}
+    if len(prefixes) != 1:
+        return {column: column for column in columns}
+    prefix = prefixes.pop() + "_"
+    return {column: column[len(prefix):] if column.startswith(prefix) else column for column in columns}
+
+
+def _compact_value(value, max_text: int):
+    """
+    Args:
+        value: A field value
+        max_text (int): Max characters for text values
+    Returns:
+        The value rounded or truncated for the llm context
+    """
+    if isinstance(value, float):
+        if value.is_integer():
+            return int(value)
+        return round(value, 4)
+    if isinstance(value, str):
+        return truncate_text(value, max_text)
+    return value
+
+
+def compact_records(records: List[Dict], max_text: Optional[int] = None) -> List[Dict]:
+    """
+    Compact row records: expand `details`, drop empty fields, round numbers and truncate text
+    Args:
+        records (List[Dict]): Row oriented records
+        max_text (Optional[int]): Max characters for text values
+    Returns:
+        List[Dict]: The compacted records
+    """
+    max_text = max_text or GRAPH_TOOL_MAX_TEXT
+    result = []
+    for record in records:
+        row = {}
+        for key, value in record.items():
+            if key == "details":
+                for name, detail in parse_details(value).items():
+                    row[name] = _compact_value(detail, max_text)
+                continue
+            if value is None or value == "":
+                continue
+            row[key] = _compact_value(value, max_text)
+        result.append(row)
+    return result
+
+
+def dataframe_records(df) -> List[Dict]:
+    """
+    Convert a subgrounds dataframe into row records with short column names
+    Args:
+        df (DataFrame): The query result
+    Returns:
+        List[Dict]: Row oriented records
+    """
+    df = df.rename(columns=strip_column_prefix(list(df.columns)))
+    # round trip through json so numpy scalars become plain python values
+    return json.loads(df.to_json(orient="records"))
+
+
+def _render_rows(rows: List[Dict], fmt: str) -> List[str]:
+    """
+    Args:
+        rows (List[Dict]): The compacted records
+        fmt (str): "json" or "table"
+    Returns:
+        List[str]: The rendered lines, for tables the first line is the header
+    """
+    if fmt == "table":
+        columns = []
+        for row in rows:
+            columns.extend(key for key in row if key not in columns)
+        lines = ["|".join(columns)]
+        for row in rows:
+            lines.append("|".join(str(row.get(column, "")).replace("|", "/") for column in columns))
+        return lines
+    return [json.dumps(row, separators=(",", ":"), default=str) for row in rows]
+
+
+def format_records(records: List[Dict], fmt: Optional[str] = None, token_budget: Optional[int] = None,
+                   max_text: Optional[int] = None) -> str:
+    """
+    Format records for an llm tool result within a token budget
+    Rows that do not fit the budget are dropped and counted, in a trailing note for a table and as
+    {"rows": [...], "omitted": N} for json, so the json stays parseable.
+    Args:
+        records (List[Dict]): Row oriented records
+        fmt (Optional[str]): "json" (one compact object per row) or "table", defaults to GRAPH_TOOL_FORMAT
+        token_budget (Optional[int]): Approximate max tokens, defaults to GRAPH_TOOL_TOKEN_BUDGET
+        max_text (Optional[int]): Max characters for text values, defaults to GRAPH_TOOL_MAX_TEXT
+    Returns:
+        str: The formatted result
+    """
+    fmt = fmt or GRAPH_TOOL_FORMAT
+    token_budget = token_budget or GRAPH_TOOL_TOKEN_BUDGET
+    rows = compact_records(records, max_text)
+    if not rows:
+        return "[]" if fmt != "table" else "no results"
+
+    lines = _render_rows(rows, fmt)
+    header = lines[:1] if fmt == "table" else []
+    body = lines[1:] if fmt == "table" else lines
+
+    kept = list(header)
+    used = sum(estimate_tokens(line) for line in header)
+    for line in body:
+        cost = estimate_tokens(line) + 1
+        if used + cost > token_budget and len(kept) > len(header):
+            break
+        kept.append(line)
+        used += cost
+
+    dropped = len(body) - (len(kept) - len(header))
+    if fmt == "table":
+        output = "\n".join(kept)
+        if dropped:
+            output += f"\n... {dropped} more rows omitted"
+        return output
+    output = "[" + ",\n".join(kept) + "]"
+    if dropped:
+        output = f'{{"rows":{output},"omitted":{dropped}}}'
+    return output
+
+
+def format_dataframe(df, fmt: Optional[str] = None, token_budget: Optional[int] = None,
+                     max_text: Optional[int] = None) -> str:
+    """
+    Format a subgrounds dataframe for an llm tool result
+    Args:
+        df (DataFrame): The query result
+        fmt (Optional[str]): "json" or "table"
+        token_budget (Optional[int]): Approximate max tokens
+        max_text (Optional[int]): Max characters for text values
+    Returns:
+        str: The formatted result
+    """
+    return format_records(dataframe_records(df), fmt, token_budget, max_text)
+
+
+def format_partitions(partitions: Dict[str, List[Dict]], fmt: Optional[str] = None,
+                      token_budget: Optional[int] = None, max_text: Optional[int] = None) -> str:
+    """
+    Format records partitioned per key (ex: per DAO), the token budget is split evenly
+    Args:
+        partitions (Dict[str, List[Dict]]): Records keyed by partition
+        fmt (Optional[str]): "json" or "table"
+        token_budget (Optional[int]): Approximate max tokens for the whole result
+        max_text (Optional[int]): Max characters for text values
+    Returns:
+        str: The formatted result, one section per partition
+    """
+    token_budget = token_budget or GRAPH_TOOL_TOKEN_BUDGET
+    share = max(token_budget // max(len(partitions), 1), 50)
+    sections = [
+        f"{key}:\n{format_records(records, fmt, share, max_text)}"
+        for key, records in partitions.items()
+    ]
+    return "\n".join(sections)
@@ -1,10 +1,19 @@
 
 import os
+import json
+import shutil
+import tempfile
+import threading
 
-from time import sleep
+from pathlib import Path
+from time import sleep, time
 from datetime import datetime, timezone
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Callable, Tuple
 
+import pandas as pd
+import requests
+
+from requests.adapters import HTTPAdapter
 from subgrounds import Subgrounds
 
 from dotenv import load_dotenv
@@ -14,9 +23,227 @@ load_dotenv()
 from constants_utils import (
     DAOHAUS_GRAPH_URLS
     )
+from graph_format_utils import format_dataframe, format_partitions, dataframe_records
 
 TARGET_CHAIN = os.getenv("TARGET_CHAIN", "0x2105")
 GRAPH_URL = "https://gateway-arbitrum.network.thegraph.com/api/" + os.getenv("GRAPH_KEY", "nokey") + DAOHAUS_GRAPH_URLS[TARGET_CHAIN]
+# introspected schemas are cached here, one file per subgraph id
+GRAPH_SCHEMA_CACHE = os.getenv("GRAPH_SCHEMA_CACHE", "schemas/")
+
+# the graph returns at most this many entities per query field
+GRAPH_MAX_FIRST = 1000
+
+# (connect, read) timeouts of the compiled query plans
+GRAPH_TIMEOUT_SEC = (5, 30)
+
+# shared subgrounds client and loaded subgraph, so every graph data instance
+# reuses the same connection pool and schema
+_shared_subgraph: Optional[Tuple[Subgrounds, object]] = None
+# keep-alive session of the compiled query plans
+_graph_session: Optional[requests.Session] = None
+
+
+def graph_session() -> requests.Session:
+    """
+    Returns:
+        requests.Session: The pooled session shared by every query plan
+    """
+    global _graph_session
+    if _graph_session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=8)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _graph_session = session
+    return _graph_session
+
+
+def load_daohaus_subgraph() -> Tuple[Subgrounds, object]:
+    """
+    Load the daohaus subgraph once per process
+    Returns:
+        Tuple[Subgrounds, Subgraph]: the shared subgrounds client and the loaded subgraph
+    """
+    global _shared_subgraph
+    if _shared_subgraph is None:
+        sg = Subgrounds(schema_cache=Path(GRAPH_SCHEMA_CACHE))
+        cached = sg.fetch_schema(GRAPH_URL) is not None
+        # with save_schema the schema is read from disk when cached, otherwise introspected and stored
+        subgraph = sg.load_subgraph(GRAPH_URL, save_schema=True)
+        if cached:
+            print("loaded subgraph schema from cache, revalidating in background")
+            threading.Thread(target=revalidate_schema_cache, args=(GRAPH_URL,), daemon=True).start()
+        _shared_subgraph = (sg, subgraph)
+    return _shared_subgraph
+
+
+def revalidate_schema_cache(url: str = GRAPH_URL) -> bool:
+    """
+    Introspect the subgraph schema and replace the cached copy if it changed
+    The fresh schema is used on the next start, the running process keeps the cached one.
+    Args:
+        url (str): The subgraph url
+    Returns:
+        bool: True if the cached schema was updated
+    """
+    try:
+        schema_cache = Path(GRAPH_SCHEMA_CACHE)
+        with tempfile.TemporaryDirectory(dir=schema_cache) as tmp_dir:
+            sg = Subgrounds(schema_cache=Path(tmp_dir))
+            sg.load_subgraph(url, save_schema=True)
+            fresh = Path(tmp_dir) / f"{Subgrounds._subgraph_slug(url)}.json"
+            cached = schema_cache / fresh.name
+            if cached.exists() and json.loads(cached.read_text()) == json.loads(fresh.read_text()):
+                return False
+            # rename within the cache dir so readers never see a partial file
+            staged = schema_cache / (fresh.name + ".tmp")
+            shutil.copyfile(fresh, staged)
+            os.replace(staged, cached)
+            print("subgraph schema changed, cache updated")
+            return True
+    except Exception as e:
+        print(f"Error revalidating subgraph schema: {str(e)}")
+        return False
+
+
+def parse_dao_ids(value: str) -> List[str]:
+    """
+    Parse a comma separated list of DAO ids
+    Args:
+        value (str): comma separated DAO ids (ex: TARGET_DAOS env var)
+    Returns:
+        List[str]: lower cased, de-duplicated DAO ids
+    """
+    dao_ids = []
+    for dao_id in value.split(","):
+        dao_id = dao_id.strip().lower()
+        if dao_id and dao_id not in dao_ids:
+            dao_ids.append(dao_id)
+    return dao_ids
+
+# proposal fields selected by the compiled query plans
+PROPOSAL_SELECTION = """
+    proposalId
+    yesVotes
+    noVotes
+    yesBalance
+    noBalance
+    createdAt
+    details
+    graceEnds
+    passed
+    dao { id }
+"""
+
+
+class QueryPlan:
+    def __init__(self, url: str, root: str, document: str, session: Optional[requests.Session] = None):
+        """
+        A GraphQL document compiled once and executed with variables
+        Args:
+            url (str): The subgraph url
+            root (str): The root query field the rows are read from
+            document (str): The GraphQL document with variable definitions
+            session (Optional[requests.Session]): The http session, defaults to the shared pooled one
+        """
+        self.session = session or graph_session()
+        self.url = url
+        self.root = root
+        self.document = " ".join(document.split())
+
+    def run_all(self, **variables) -> Dict:
+        """
+        Execute the plan
+        Args:
+            **variables: The GraphQL variables
+        Returns:
+            Dict: The data of every root (or aliased) field
+        """
+        response = self.session.post(self.url, json={"query": self.document, "variables": variables},
+                                     timeout=GRAPH_TIMEOUT_SEC)
+        response.raise_for_status()
+        body = response.json()
+        if body.get("errors"):
+            raise ValueError("; ".join(error.get("message", str(error)) for error in body["errors"]))
+        return body.get("data") or {}
+
+    def run(self, **variables) -> List[Dict]:
+        """
+        Execute the plan
+        Args:
+            **variables: The GraphQL variables
+        Returns:
+            List[Dict]: The rows of the root field
+        """
+        return self.run_all(**variables).get(self.root) or []
+
+
+def compile_proposal_plan(where: str, variables: str, url: str = GRAPH_URL) -> QueryPlan:
+    """
+    Compile a proposals query plan
+    Args:
+        where (str): The GraphQL where filter
+        variables (str): The GraphQL variable definitions
+        url (str): The subgraph url
+    Returns:
+        QueryPlan: The compiled plan
+    """
+    return QueryPlan(url, "proposals", f"""
+        query ({variables}) {{
+            proposals(first: $first, orderBy: createdAt, orderDirection: desc, where: {where}) {{
+                {PROPOSAL_SELECTION}
+            }}
+        }}
+    """)
+
+
+def compile_dao_proposals_plan(dao_count: int, passed_only: bool = False, url: str = GRAPH_URL) -> QueryPlan:
+    """
+    Compile one document with an aliased proposals field per DAO (dao0, dao1, ...), so every DAO gets
+    its own `first` newest proposals in a single request
+    Args:
+        dao_count (int): Number of DAOs, the DAO ids are passed as $dao0, $dao1, ...
+        passed_only (bool): Only select passed proposals
+        url (str): The subgraph url
+    Returns:
+        QueryPlan: The compiled plan, its rows are read per alias with `run_all`
+    """
+    passed = ", passed: true" if passed_only else ""
+    variables = ", ".join(f"$dao{i}: String!" for i in range(dao_count))
+    fields = "\n".join(f"""
+            dao{i}: proposals(first: $first, orderBy: createdAt, orderDirection: desc, where: {{dao: $dao{i}{passed}}}) {{
+                {PROPOSAL_SELECTION}
+            }}""" for i in range(dao_count))
+    return QueryPlan(url, "dao0", f"""
+        query ($first: Int!, {variables}) {{
+            {fields}
+        }}
+    """)
+
+
+def decode_proposals(rows: List[Dict]) -> pd.DataFrame:
+    """
+    Decode proposal rows and compute derived fields in one vectorized pass
+    Age is computed against the current time at decode, balances are scaled from wei.
+    Args:
+        rows (List[Dict]): Proposal rows from a query plan
+    Returns:
+        DataFrame: The proposals with ageInSeconds, displayYesBalance and displayNoBalance
+    """
+    columns = ["proposalId", "ageInSeconds", "yesVotes", "noVotes", "createdAt", "details",
+               "graceEnds", "passed", "displayYesBalance", "displayNoBalance", "daoId"]
+    if not rows:
+        return pd.DataFrame(columns=columns)
+
+    df = pd.json_normalize(rows).rename(columns={"dao.id": "daoId"})
+    for column in ("createdAt", "graceEnds", "yesVotes", "noVotes"):
+        df[column] = pd.to_numeric(df[column])
+    now = datetime.now(timezone.utc).timestamp()
+    df["ageInSeconds"] = (now - df["createdAt"]).round().astype("int64")
+    # balances are BigInt strings in wei, float is precise enough for display
+    df["displayYesBalance"] = df["yesBalance"].astype(float) / 10**18
+    df["displayNoBalance"] = df["noBalance"].astype(float) / 10**18
+    return df[columns]
 
 
 class DaohausGraphData:
@@ -29,10 +256,8 @@ class DaohausGraphData:
         if not os.getenv("GRAPH_KEY") or not os.getenv("TARGET_DAO"):
             raise ValueError("GRAPH_KEY and TARGET_DAO must be set in the .env file")
 
-        self.sg = Subgrounds()
-
         # Load the subgraph
-        self.dh_v3 = self.sg.load_subgraph(GRAPH_URL)
+        self.sg, self.dh_v3 = load_daohaus_subgraph()
 
         self.dao_id = os.getenv("TARGET_DAO")
 
@@ -46,6 +271,13 @@ class DaohausGraphData:
                 where={ "table": "daoProfile" }
             )
 
+        # query plans are compiled once and reused with variables
+        self.proposals_plan = compile_proposal_plan("{dao: $dao}", "$dao: String!, $first: Int!")
+        self.passed_proposals_plan = compile_proposal_plan(
+            "{dao: $dao, passed: true}", "$dao: String!, $first: Int!")
+        self.proposal_plan = compile_proposal_plan(
+            "{dao: $dao, proposalId: $proposalId}", "$dao: String!, $proposalId: BigInt!, $first: Int!")
+
     def get_dao_data(self) -> str:
         """
         Get DAO data
@@ -64,7 +296,7 @@ class DaohausGraphData:
                 self.dao.content,
             ])
 
-            return result.to_json()
+            return format_dataframe(result)
         except Exception as e:
             return f"Error getting DAO data: {str(e)}"
         
@@ -77,36 +309,9 @@ class DaohausGraphData:
             str: Proposals data
         """
         try:
-            # Current time in UTC as a synthetic field
-            now = datetime.now(timezone.utc).timestamp()
-
-            # Define a synthetic field for ageInSeconds
-            proposal = self.dh_v3.Proposal  # Assuming Proposal is an entity in the schema
-            proposal.ageInSeconds = now - proposal.createdAt
-            proposal.displayYesBalance = proposal.yesBalance / 10**18
-            proposal.displayNoBalance = proposal.noBalance / 10**18
-            # Construct the query
-            proposals = self.dh_v3.Query.proposals(
-                first=20,
-                orderBy="createdAt",
-                orderDirection="desc",
-                where={"dao": self.dao_id, "passed": True},
-            )
-
-
-            result = self.sg.query_df([
-                proposals.proposalId,
-                proposals.ageInSeconds,  # Use synthetic field as a regular field
-                proposals.yesVotes,
-                proposals.noVotes,
-                proposals.createdAt,
-                proposals.details,
-                proposals.graceEnds,
-                proposals.passed,
-                proposals.displayYesBalance,
-                proposals.displayNoBalance,
-            ])
-            return result.to_json()
+            rows = self.passed_proposals_plan.run(dao=self.dao_id, first=20)
+            result = decode_proposals(rows).drop(columns=["daoId"])
+            return format_dataframe(result)
 
         except Exception as e:
             return f"Error getting proposals data: {str(e)}"
@@ -120,37 +325,9 @@ class DaohausGraphData:
             str: Proposals data frame
         """
         try:
-            # Current time in UTC as a synthetic field
-            now = datetime.now(timezone.utc).timestamp()
-
-            # Define a synthetic field for ageInSeconds
-            proposal = self.dh_v3.Proposal  # Assuming Proposal is an entity in the schema
-            proposal.ageInSeconds = now - proposal.createdAt
-            proposal.displayYesBalance = proposal.yesBalance / 10**18
-            proposal.displayNoBalance = proposal.noBalance / 10**18
-            # Construct the query
-            proposals = self.dh_v3.Query.proposals(
-                first=10,
-                orderBy="createdAt",
-                orderDirection="desc",
-                where={"dao": self.dao_id},
-            )
-
-
-            result = self.sg.query_df([
-                proposals.proposalId,
-                proposals.ageInSeconds,  # Use synthetic field as a regular field
-                proposals.yesVotes,
-                proposals.noVotes,
-                proposals.createdAt,
-                proposals.details,
-                proposals.graceEnds,
-                proposals.passed,
-                proposals.displayYesBalance,
-                proposals.displayNoBalance,
-            ])
-
-            return result.to_json()
+            rows = self.proposals_plan.run(dao=self.dao_id, first=10)
+            result = decode_proposals(rows).drop(columns=["daoId"])
+            return format_dataframe(result)
 
         except Exception as e:
             return f"Error getting proposals data: {str(e)}"
@@ -164,38 +341,13 @@ class DaohausGraphData:
             str: Proposal data
         """
         try:
-            # Current time in UTC as a synthetic field
-            now = datetime.now(timezone.utc).timestamp()
-
-            # Define a synthetic field for ageInSeconds
-            proposal = self.dh_v3.Proposal  # Assuming Proposal is an entity in the schema
-            proposal.ageInSeconds = now - proposal.createdAt
-            proposal.displayYesBalance = proposal.yesBalance / 10**18
-            proposal.displayNoBalance = proposal.noBalance / 10**18
-
-            # Construct the query
-            proposal = self.dh_v3.Query.proposals(
-                where={"proposalId": proposal_id, "dao": self.dao_id},
-            )
-
-            result = self.sg.query_df([
-                proposal.proposalId,
-                proposal.ageInSeconds,  # Use synthetic field as a regular field
-                proposal.yesVotes,
-                proposal.noVotes,
-                proposal.createdAt,
-                proposal.details,
-                # proposal.votes, # This is a list of votes, TODO: Figure out how to query this
-                proposal.graceEnds,
-                proposal.passed,
-                proposal.displayYesBalance,
-                proposal.displayNoBalance
-            ])
+            rows = self.proposal_plan.run(dao=self.dao_id, proposalId=str(proposal_id), first=1)
+            result = decode_proposals(rows).drop(columns=["daoId"])
 
             # Add a proposal URL
-            result["proposalUrl"] = self.create_dh_proposal_url(proposal.proposalId)
+            result["proposalUrl"] = self.create_dh_proposal_url(proposal_id)
 
-            return result.to_json()
+            return format_dataframe(result)
         except Exception as e:
             return f"Error getting proposal data: {str(e)}"
         
@@ -226,7 +378,7 @@ class DaohausGraphData:
                 votes.displayBalance,
             ])
 
-            return result.to_json()
+            return format_dataframe(result)
         except Exception as e:
             return f"Error getting proposal votes data: {str(e)}"
     
@@ -245,7 +397,7 @@ class DaohausGraphData:
                 self.dao.proposalCount,
             ])
 
-            return result.to_json()
+            return format_dataframe(result)
         except Exception as e:
             return f"Error getting proposal count: {str(e)}"
         
@@ -257,5 +409,213 @@ class DaohausGraphData:
         Returns:
             str: The URL
         """
-        return f"https://admin.daohaus.fun/#/molochV3/{TARGET_CHAIN}/{self.dao_id}/proposal/{proposal_id}"
-        
\ No newline at end of file
+        return create_dh_proposal_url(self.dao_id, proposal_id)
+
+
+class MultiDaohausGraphData:
+    def __init__(self, dao_ids: Optional[List[str]] = None, cache_ttl: int = 60):
+        """
+        Initialize daohaus graph data for a portfolio of DAOs
+        All DAOs are served from one subgrounds client, DAO lists are queried with `id_in` and
+        proposals with one aliased field per DAO in a single document, results are partitioned per DAO.
+        Args:
+            dao_ids (Optional[List[str]]): The DAO IDs, defaults to TARGET_DAOS (comma separated) or TARGET_DAO
+            cache_ttl (int): Seconds a batched result is reused before querying the graph again
+        """
+        print("initializing multi dao graph data")
+        if dao_ids is None:
+            dao_ids = parse_dao_ids(os.getenv("TARGET_DAOS") or os.getenv("TARGET_DAO", ""))
+        else:
+            dao_ids = parse_dao_ids(",".join(dao_ids))
+        if not os.getenv("GRAPH_KEY") or not dao_ids:
+            raise ValueError("GRAPH_KEY and TARGET_DAOS (or TARGET_DAO) must be set in the .env file")
+
+        self.sg, self.dh_v3 = load_daohaus_subgraph()
+
+        self.dao_ids = dao_ids
+        self.cache_ttl = cache_ttl
+        # cache key -> (fetched at, raw rows or dataframe), derived fields are computed when decoding
+        self._cache: Dict[str, Tuple[float, object]] = {}
+
+        # query plans are compiled once and reused with variables
+        self.proposals_plan = compile_dao_proposals_plan(len(self.dao_ids))
+        self.passed_proposals_plan = compile_dao_proposals_plan(len(self.dao_ids), passed_only=True)
+        self.proposal_plan = compile_proposal_plan(
+            "{dao: $dao, proposalId: $proposalId}", "$dao: String!, $proposalId: BigInt!, $first: Int!")
+
+    def _cached(self, key: str, fetch: Callable):
+        """
+        Return a cached batched result or fetch it
+        Args:
+            key (str): The cache key
+            fetch (Callable): Function that queries the graph for every watched DAO
+        Returns:
+            The batched result
+        """
+        cached = self._cache.get(key)
+        if cached and time() - cached[0] < self.cache_ttl:
+            return cached[1]
+        result = fetch()
+        self._cache[key] = (time(), result)
+        return result
+
+    def clear_cache(self):
+        """Drop all cached batched results"""
+        self._cache.clear()
+
+    def _select_daos(self, dao_id: Optional[str]) -> List[str]:
+        """
+        Args:
+            dao_id (Optional[str]): A single DAO ID or None for every watched DAO
+        Returns:
+            List[str]: The DAO IDs to return
+        """
+        if dao_id is None:
+            return self.dao_ids
+        dao_id = dao_id.lower()
+        if dao_id not in self.dao_ids:
+            raise ValueError(f"DAO {dao_id} is not in the watched DAOs")
+        return [dao_id]
+
+    def _partition(self, df, dao_column: str, dao_ids: List[str], per_dao: Optional[int] = None) -> str:
+        """
+        Partition a batched dataframe per DAO
+        Args:
+            df (DataFrame): The batched result
+            dao_column (str): The column holding the DAO ID
+            dao_ids (List[str]): The DAO IDs to include
+            per_dao (Optional[int]): Max rows kept per DAO
+        Returns:
+            str: Compact results with one section per DAO ID
+        """
+        partitions = {dao_id: [] for dao_id in dao_ids}
+        if len(df):
+            df = df[df[dao_column].isin(dao_ids)]
+            for dao_id, group in df.groupby(dao_column, sort=False):
+                if per_dao is not None:
+                    group = group.head(per_dao)
+                partitions[dao_id] = dataframe_records(group.drop(columns=[dao_column]))
+        return format_partitions(partitions)
+
+    def _fetch_proposals(self, per_dao: int, passed_only: bool) -> List[Dict]:
+        """
+        Fetch recent proposals of every watched DAO in one request, a busy DAO can not crowd out the others
+        Args:
+            per_dao (int): Number of proposals wanted per DAO (at most GRAPH_MAX_FIRST)
+            passed_only (bool): Only include passed proposals
+        Returns:
+            List[Dict]: The batched proposal rows
+        """
+        plan = self.passed_proposals_plan if passed_only else self.proposals_plan
+        data = plan.run_all(first=min(per_dao, GRAPH_MAX_FIRST),
+                            **{f"dao{i}": dao_id for i, dao_id in enumerate(self.dao_ids)})
+        return [row for i in range(len(self.dao_ids)) for row in data.get(f"dao{i}") or []]
+
+    def get_daos_data(self, dao_id: Optional[str] = None) -> str:
+        """
+        Get DAO profile data
+        Args:
+            dao_id (Optional[str]): A single DAO ID, defaults to every watched DAO
+        Returns:
+            str: DAO data keyed by DAO ID
+        """
+        try:
+            dao_ids = self._select_daos(dao_id)
+            daos = self.dh_v3.Query.daos(
+                first=min(len(self.dao_ids), GRAPH_MAX_FIRST),
+                where={"id_in": self.dao_ids},
+            )
+            result = self._cached("daos", lambda: self.sg.query_df([
+                daos.id,
+                daos.createdAt,
+                daos.name,
+                daos.proposalCount,
+                daos.activeMemberCount,
+            ]))
+            return self._partition(result, "daos_id", dao_ids)
+        except Exception as e:
+            return f"Error getting DAO data: {str(e)}"
+
+    def get_proposals_data(self, dao_id: Optional[str] = None, per_dao: int = 10) -> str:
+        """
+        Get the most recent proposals of the watched DAOs in a single query
+        Args:
+            dao_id (Optional[str]): A single DAO ID, defaults to every watched DAO
+            per_dao (int): Number of proposals kept per DAO
+        Returns:
+            str: Proposals data keyed by DAO ID
+        """
+        try:
+            dao_ids = self._select_daos(dao_id)
+            rows = self._cached(f"proposals:{per_dao}", lambda: self._fetch_proposals(per_dao, False))
+            return self._partition(decode_proposals(rows), "daoId", dao_ids, per_dao)
+        except Exception as e:
+            return f"Error getting proposals data: {str(e)}"
+
+    def get_passed_proposals_data(self, dao_id: Optional[str] = None, per_dao: int = 20) -> str:
+        """
+        Get the most recent passed proposals of the watched DAOs in a single query
+        Args:
+            dao_id (Optional[str]): A single DAO ID, defaults to every watched DAO
+            per_dao (int): Number of proposals kept per DAO
+        Returns:
+            str: Passed proposals data keyed by DAO ID
+        """
+        try:
+            dao_ids = self._select_daos(dao_id)
+            rows = self._cached(f"passed:{per_dao}", lambda: self._fetch_proposals(per_dao, True))
+            return self._partition(decode_proposals(rows), "daoId", dao_ids, per_dao)
+        except Exception as e:
+            return f"Error getting proposals data: {str(e)}"
+
+    def get_proposal_data(self, dao_id: str, proposal_id: str) -> str:
+        """
+        Get proposal data of a single DAO
+        Args:
+            dao_id (str): The DAO ID
+            proposal_id (str): The proposal ID
+        Returns:
+            str: Proposal data
+        """
+        try:
+            dao_id = self._select_daos(dao_id)[0]
+            rows = self.proposal_plan.run(dao=dao_id, proposalId=str(proposal_id), first=1)
+            result = decode_proposals(rows)
+            result["proposalUrl"] = create_dh_proposal_url(dao_id, proposal_id)
+            return self._partition(result, "daoId", [dao_id])
+        except Exception as e:
+            return f"Error getting proposal data: {str(e)}"
+
+    def get_proposal_counts(self, dao_id: Optional[str] = None) -> str:
+        """
+        Get proposal counts
+        Args:
+            dao_id (Optional[str]): A single DAO ID, defaults to every watched DAO
+        Returns:
+            str: Proposal count keyed by DAO ID
+        """
+        try:
+            dao_ids = self._select_daos(dao_id)
+            daos = self.dh_v3.Query.daos(
+                first=min(len(self.dao_ids), GRAPH_MAX_FIRST),
+                where={"id_in": self.dao_ids},
+            )
+            result = self._cached("counts", lambda: self.sg.query_df([
+                daos.id,
+                daos.proposalCount,
+            ]))
+            return self._partition(result, "daos_id", dao_ids)
+        except Exception as e:
+            return f"Error getting proposal count: {str(e)}"
+
+
+def create_dh_proposal_url(dao_id: str, proposal_id: str) -> str:
+    """
+    Create a proposal URL
+    Args:
+        dao_id (str): The DAO ID
+        proposal_id (str): The proposal ID
+    Returns:
+        str: The URL
+    """
+    return f"https://admin.daohaus.fun/#/molochV3/{TARGET_CHAIN}/{dao_id}/proposal/{proposal_id}"
@@ -1,6 +1,7 @@
 import os
 import argparse
-from tinydb import TinyDB, Query
+from memory_storage_utils import open_memory_storage, KNOWLEDGE_TABLE
+from knowledge_search_utils import KnowledgeSearch
 
 def extract_keywords(file_name):
     """
@@ -10,20 +11,20 @@ def extract_keywords(file_name):
     keywords = base_name.split('_')  # Split by underscores
     return keywords
 
-def import_markdown_files_to_db(directory, db_path):
+def import_markdown_files_to_db(directory, db_path=None, backend=None):
     """
-    Import all Markdown files from a directory into TinyDB with keywords based on filenames.
+    Import all Markdown files from a directory into the knowledge table with keywords based on filenames.
     Skip files that have already been imported.
     """
-    db = TinyDB(db_path)
-    File = Query()
+    storage = open_memory_storage(backend, db_path).table(KNOWLEDGE_TABLE)
+    imported = 0
 
     for file_name in os.listdir(directory):
         if file_name.endswith('.md'):  # Process only Markdown files
             file_path = os.path.join(directory, file_name)
             
             # Check if the file has already been imported
-            if db.contains(File.file_name == file_name):
+            if storage.contains('file_name', file_name):
                 print(f"Skipping already imported file: {file_name}")
                 continue
             
@@ -41,15 +42,20 @@ def import_markdown_files_to_db(directory, db_path):
                 'keywords': keywords
             }
             
-            # Insert into the database
-            db.insert(record)
+            # Insert into the database (keywords are indexed by the storage)
+            storage.insert(record)
+            imported += 1
             print(f"Imported: {file_name}")
     
-    print(f"Import completed. All records are stored in {db_path}.")
+    # refresh the ranked search index of the knowledge content
+    if imported:
+        KnowledgeSearch(storage).rebuild()
+    storage.close()
+    print(f"Import completed. All records are stored in {db_path or 'the memory storage'}.")
 
 if __name__ == "__main__":
     # Set up argument parser
-    parser = argparse.ArgumentParser(description="Import Markdown files into TinyDB.")
+    parser = argparse.ArgumentParser(description="Import Markdown files into the memory storage.")
     parser.add_argument(
         '--directory', 
         type=str, 
@@ -59,13 +65,19 @@ if __name__ == "__main__":
     parser.add_argument(
         '--db_path', 
         type=str, 
-        default='db.json', 
-        help="Path to the TinyDB database file (default: 'db.json')"
+        default=None, 
+        help="Path to the database file (default: MEMORY_DB_PATH, 'db.json' or 'memory.db')"
+    )
+    parser.add_argument(
+        '--backend', 
+        type=str, 
+        default=None, 
+        help="Storage backend, tinydb or sqlite (default: MEMORY_BACKEND)"
     )
     
     # Parse arguments
     args = parser.parse_args()
     
     # Run the import function
-    import_markdown_files_to_db(args.directory, args.db_path)
+    import_markdown_files_to_db(args.directory, args.db_path, args.backend)
 
@@ -0,0 +1,175 @@
+from typing import List, Dict, Set, Tuple, Iterable, Optional
+
+import inflect
+from tinydb import TinyDB
+from tinydb.table import Document
+
+_inflector = inflect.engine()
+
+# one row per keyword ({"keyword", "ids"}) and a marker row, a change only rewrites the rows of its keywords
+INDEX_FORMAT = 2
+
+
+def normalize_keyword(keyword: str) -> str:
+    """
+    Normalize a keyword for indexing and lookup: lower case and singular (ex: Proposals -> proposal)
+    Args:
+        keyword (str): The keyword
+    Returns:
+        str: The normalized keyword
+    """
+    word = keyword.strip().lower()
+    if not word:
+        return word
+    return _inflector.singular_noun(word) or word
+
+
+def normalize_keywords(keywords: Iterable[str]) -> Set[str]:
+    """
+    Args:
+        keywords (Iterable[str]): The keywords
+    Returns:
+        Set[str]: The distinct normalized keywords
+    """
+    return {normalized for normalized in (normalize_keyword(str(keyword)) for keyword in keywords or []) if normalized}
+
+
+class KeywordIndex:
+    def __init__(self, db: TinyDB, table_name: str = "keyword_index"):
+        """
+        Persistent inverted index from normalized keyword to record ids
+        Kept in memory for lookups and stored in its own table, one row per keyword, so indexing a record
+        only writes the rows of its keywords. An index stored as one document (older databases) is converted.
+        Args:
+            db (TinyDB): The database holding the indexed records
+            table_name (str): The table the index is stored in
+        """
+        self.table = db.table(table_name)
+        self.index: Dict[str, Set[int]] = {}
+        # keyword -> doc id of its row
+        self.rows: Dict[str, int] = {}
+        self.loaded = False
+        self.legacy = False
+        self.reload()
+        if self.legacy:
+            self._rewrite()
+
+    def reload(self):
+        """Read the stored index again (ex: another process changed it)"""
+        self.index, self.rows = {}, {}
+        self.loaded = self.legacy = False
+        for row in self.table.all():
+            if "keyword" in row:
+                self.index[row["keyword"]] = set(row["ids"])
+                self.rows[row["keyword"]] = row.doc_id
+            elif "index" in row:
+                # the whole index in one document, rewritten as rows on the next change
+                self.index = {keyword: set(ids) for keyword, ids in row["index"].items()}
+                self.loaded = self.legacy = True
+                return
+            elif row.get("format") == INDEX_FORMAT:
+                self.loaded = True
+
+    def _rewrite(self):
+        """Store the whole index, one row per keyword"""
+        self.table.truncate()
+        self.table.insert({"format": INDEX_FORMAT})
+        keywords = sorted(self.index)
+        doc_ids = self.table.insert_multiple({"keyword": keyword, "ids": sorted(self.index[keyword])}
+                                             for keyword in keywords)
+        self.rows = dict(zip(keywords, doc_ids))
+        self.loaded = True
+        self.legacy = False
+
+    def _save(self, keywords: Set[str]):
+        """Write the rows of the changed keywords, at most one removal, one update and one insert"""
+        if self.legacy or not self.loaded:
+            self._rewrite()
+            return
+        removed = [self.rows.pop(keyword) for keyword in keywords if keyword not in self.index and keyword in self.rows]
+        changed = [self.rows[keyword] for keyword in keywords if keyword in self.index and keyword in self.rows]
+        added = sorted(keyword for keyword in keywords if keyword in self.index and keyword not in self.rows)
+
+        def set_ids(row):
+            row["ids"] = sorted(self.index[row["keyword"]])
+
+        if removed:
+            self.table.remove(doc_ids=removed)
+        if changed:
+            self.table.update(set_ids, doc_ids=changed)
+        if added:
+            doc_ids = self.table.insert_multiple({"keyword": keyword, "ids": sorted(self.index[keyword])}
+                                                 for keyword in added)
+            self.rows.update(zip(added, doc_ids))
+
+    def _add(self, doc_id: int, keywords: Iterable[str]) -> Set[str]:
+        normalized = normalize_keywords(keywords)
+        for keyword in normalized:
+            self.index.setdefault(keyword, set()).add(doc_id)
+        return normalized
+
+    def _remove(self, doc_id: int, keywords: Iterable[str]) -> Set[str]:
+        normalized = normalize_keywords(keywords)
+        for keyword in normalized:
+            ids = self.index.get(keyword)
+            if ids is None:
+                continue
+            ids.discard(doc_id)
+            if not ids:
+                del self.index[keyword]
+        return normalized
+
+    def add(self, doc_id: int, keywords: Iterable[str]):
+        """Index a record under its keywords"""
+        self._save(self._add(doc_id, keywords))
+
+    def add_many(self, entries: Iterable[Tuple[int, Iterable[str]]]):
+        """Index (record id, keywords) pairs, the changed rows are written together"""
+        changed: Set[str] = set()
+        for doc_id, keywords in entries:
+            changed |= self._add(doc_id, keywords)
+        self._save(changed)
+
+    def remove(self, documents: Iterable[Document]):
+        """Drop records (with their current keywords) from the index"""
+        changed: Set[str] = set()
+        for document in documents:
+            changed |= self._remove(document.doc_id, document.get("keywords") or [])
+        self._save(changed)
+
+    def replace(self, old_documents: Iterable[Document], new_documents: Iterable[Document]):
+        """Re-index updated records"""
+        changed: Set[str] = set()
+        for document in old_documents:
+            changed |= self._remove(document.doc_id, document.get("keywords") or [])
+        for document in new_documents:
+            changed |= self._add(document.doc_id, document.get("keywords") or [])
+        self._save(changed)
+
+    def rebuild(self, documents: Iterable[Document]):
+        """Index all records from scratch"""
+        self.index = {}
+        for document in documents:
+            self._add(document.doc_id, document.get("keywords") or [])
+        self._rewrite()
+
+    def clear(self):
+        """Empty the index"""
+        self.index = {}
+        self._rewrite()
+
+    def lookup(self, keywords: Iterable[str], limit: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        Find records by keywords, cost is proportional to the matches, not the database size
+        Args:
+            keywords (Iterable[str]): The keywords, normalized like the index
+            limit (Optional[int]): Max records returned
+        Returns:
+            List[Tuple[int, int]]: (record id, matched keywords), most matches first
+        """
+        matches: Dict[int, int] = {}
+        for keyword in normalize_keywords(keywords):
+            for doc_id in self.index.get(keyword, ()):
+                matches[doc_id] = matches.get(doc_id, 0) + 1
+        ranked = sorted(matches.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit] if limit else ranked
@@ -0,0 +1,298 @@
+import os
+import re
+import threading
+
+from functools import lru_cache
+from collections import Counter
+from typing import List, Dict, Tuple, Iterable, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# compressed numpy archive with the postings of the knowledge base
+KNOWLEDGE_INDEX_FILE = os.getenv("KNOWLEDGE_INDEX_FILE", "knowledge_index.npz")
+# knowledge content is indexed and returned in passages of about this many words
+PASSAGE_WORDS = 120
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_PARAGRAPH = re.compile(r"\n\s*\n")
+_WORD = re.compile(r"\S+")
+
+STOPWORDS = frozenset("""
+    a an and are as at be been but by can do does for from has have how i if in into is it its of on or our
+    so than that the their them then there these they this to was we were what when where which who why will
+    with you your
+""".split())
+
+# (suffix, replacement) tried in order, the first one that leaves a stem of 3+ characters wins
+_SUFFIXES = (
+    ("ational", "ate"), ("ization", "ize"), ("fulness", "ful"), ("ousness", "ous"), ("iveness", "ive"),
+    ("ations", "ate"), ("ation", "ate"), ("ements", ""), ("ement", ""), ("ments", ""), ("ment", ""),
+    ("ingly", ""), ("edly", ""), ("ness", ""), ("sses", "ss"), ("ies", "y"), ("ied", "y"),
+    ("ings", ""), ("ing", ""), ("ers", ""), ("er", ""), ("ed", ""), ("ly", ""), ("es", ""), ("s", ""),
+)
+
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """
+    Light suffix stripping stemmer (ex: votes, voted, voting -> vot)
+    Args:
+        word (str): A lower case word
+    Returns:
+        str: The stem
+    """
+    if len(word) <= 3 or word.isdigit() or word.endswith(("ss", "us", "is")):
+        return word
+    for suffix, replacement in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) + len(replacement) >= 3:
+            word = word[:-len(suffix)] + replacement
+            # running -> run, stopped -> stop
+            if not replacement and len(word) > 3 and word[-1] == word[-2] and word[-1] not in "lsz":
+                word = word[:-1]
+            # vote and votes share a stem
+            if word.endswith("e") and len(word) > 3:
+                word = word[:-1]
+            return word
+    return word[:-1] if word.endswith("e") and len(word) > 3 else word
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Args:
+        text (str): Any text
+    Returns:
+        List[str]: Stemmed lower case terms without stopwords
+    """
+    return [stem(token) for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def split_passages(text: str, max_words: int = PASSAGE_WORDS) -> List[Tuple[int, int]]:
+    """
+    Split a text into passages, short paragraphs are merged and long ones cut by words
+    Args:
+        text (str): The text
+        max_words (int): Max words per passage
+    Returns:
+        List[Tuple[int, int]]: (start, end) character offsets of the passages
+    """
+    passages: List[Tuple[int, int]] = []
+    start, words = None, 0
+    position = 0
+    for paragraph in _PARAGRAPH.split(text):
+        offset = text.index(paragraph, position) if paragraph else position
+        position = offset + len(paragraph)
+        spans = [match.span() for match in _WORD.finditer(paragraph)]
+        if not spans:
+            continue
+        if start is not None and words + len(spans) > max_words:
+            passages.append((start, end))
+            start, words = None, 0
+        for i in range(0, len(spans), max_words):
+            chunk = spans[i:i + max_words]
+            if start is None:
+                start = offset + chunk[0][0]
+            end = offset + chunk[-1][1]
+            words += len(chunk)
+            if words >= max_words:
+                passages.append((start, end))
+                start, words = None, 0
+    if start is not None:
+        passages.append((start, end))
+    return passages
+
+
+class BM25Index:
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        """
+        Okapi BM25 over passages, postings are flat numpy arrays sliced per term
+        Use `build` or `load` to create one.
+        Args:
+            arrays (Dict[str, np.ndarray]): The index arrays (terms, offsets, doc_ids, tfs, doc_len, passages)
+        """
+        self.arrays = arrays
+        self.terms = {term: i for i, term in enumerate(arrays["terms"].tolist())}
+        self.offsets = arrays["offsets"]
+        self.doc_ids = arrays["doc_ids"]
+        self.tfs = arrays["tfs"].astype(np.float32)
+        self.doc_len = arrays["doc_len"].astype(np.float32)
+        # (record id, start, end) per passage
+        self.passages = arrays["passages"]
+        self.record_ids = arrays["record_ids"]
+        n = len(self.doc_len)
+        df = np.diff(self.offsets).astype(np.float32)
+        self.idf = np.log(1 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avgdl = float(self.doc_len.mean()) if n else 1.0
+        # the length normalisation of every passage, computed once
+        self.norm = (BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len / max(avgdl, 1e-9))).astype(np.float32)
+
+    @classmethod
+    def build(cls, records: Iterable[Tuple[int, str, str]], max_words: int = PASSAGE_WORDS) -> "BM25Index":
+        """
+        Args:
+            records (Iterable[Tuple[int, str, str]]): (record id, title, content), the title terms are added to every passage
+            max_words (int): Max words per passage
+        Returns:
+            BM25Index: The index
+        """
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        passages, doc_len, record_ids = [], [], []
+        for record_id, title, content in records:
+            record_ids.append(record_id)
+            title_terms = tokenize(title or "")
+            for start, end in split_passages(content or "", max_words):
+                terms = Counter(tokenize(content[start:end]) + title_terms)
+                if not terms:
+                    continue
+                doc = len(passages)
+                passages.append((record_id, start, end))
+                doc_len.append(sum(terms.values()))
+                for term, tf in terms.items():
+                    postings.setdefault(term, []).append((doc, tf))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+        doc_ids = np.fromiter((doc for term in terms for doc, _ in postings[term]), dtype=np.uint32, count=offsets[-1])
+        tfs = np.fromiter((min(tf, 65535) for term in terms for _, tf in postings[term]), dtype=np.uint16,
+                          count=offsets[-1])
+        return cls({
+            "terms": np.array(terms, dtype=str),
+            "offsets": offsets,
+            "doc_ids": doc_ids,
+            "tfs": tfs,
+            "doc_len": np.array(doc_len, dtype=np.uint32),
+            "passages": np.array(passages, dtype=np.int64).reshape(-1, 3),
+            "record_ids": np.array(sorted(record_ids), dtype=np.int64),
+        })
+
+    def save(self, path: str):
+        """Write the index as a compressed archive (temp file, then rename), doc ids are delta encoded per term"""
+        deltas = self.doc_ids.astype(np.int64)
+        deltas[1:] -= self.doc_ids[:-1]
+        # the first posting of every term keeps its absolute id
+        starts = self.offsets[:-1]
+        deltas[starts] = self.doc_ids[starts]
+        arrays = {**self.arrays, "doc_ids": deltas.astype(np.uint32)}
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path, allow_pickle=False) as archive:
+            arrays = {name: archive[name] for name in archive.files}
+        deltas = arrays["doc_ids"].astype(np.int64)
+        if len(deltas):
+            totals = np.cumsum(deltas)
+            starts = arrays["offsets"][:-1]
+            before = totals[starts] - deltas[starts]
+            arrays["doc_ids"] = (totals - np.repeat(before, np.diff(arrays["offsets"]))).astype(np.uint32)
+        return cls(arrays)
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """
+        Args:
+            query (str): Free text query
+            k (int): Max passages returned
+        Returns:
+            List[Tuple[int, float]]: (passage, score), best first
+        """
+        scores = np.zeros(len(self.doc_len), dtype=np.float32)
+        for term in set(tokenize(query)):
+            t = self.terms.get(term)
+            if t is None:
+                continue
+            lo, hi = self.offsets[t], self.offsets[t + 1]
+            docs = self.doc_ids[lo:hi]
+            tf = self.tfs[lo:hi]
+            scores[docs] += self.idf[t] * tf * (BM25_K1 + 1) / (tf + self.norm[docs])
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(doc), float(scores[doc])) for doc in matched]
+
+
+class KnowledgeSearch:
+    def __init__(self, knowledge, path: Optional[str] = None):
+        """
+        BM25 ranked passage search over the knowledge table, the index is kept on disk and rebuilt
+        when the knowledge records change
+        Records imported by other processes (import_knowledge.py) are picked up when the knowledge count or
+        the last knowledge id (the watermark) changed since the index was loaded.
+        Args:
+            knowledge (MemoryStorage): The knowledge table
+            path (Optional[str]): The index file, defaults to KNOWLEDGE_INDEX_FILE
+        """
+        self.knowledge = knowledge
+        self.path = path or KNOWLEDGE_INDEX_FILE
+        self.lock = threading.Lock()
+        self.index: Optional[BM25Index] = None
+        # (knowledge count, last knowledge id) the index covers
+        self.watermark = (0, 0)
+
+    def _load(self) -> BM25Index:
+        """Load the stored index, or rebuild it if it is missing or does not cover the current records"""
+        records = self.knowledge.all()
+        ids = np.array(sorted(self.knowledge.record_id(record) for record in records), dtype=np.int64)
+        self.watermark = (len(ids), int(ids[-1]) if len(ids) else 0)
+        try:
+            if os.path.exists(self.path):
+                index = BM25Index.load(self.path)
+                if np.array_equal(index.record_ids, ids):
+                    return index
+        except Exception as e:
+            print(f"Error loading knowledge index: {str(e)}")
+        return self._build(records)
+
+    def _build(self, records: List[Dict]) -> BM25Index:
+        index = BM25Index.build((self.knowledge.record_id(record), os.path.splitext(record.get('file_name') or "")[0],
+                                 record.get('content') or "") for record in records)
+        index.save(self.path)
+        print(f"indexed {len(index.doc_len)} passages of {len(records)} knowledge records")
+        return index
+
+    def rebuild(self):
+        """Index all knowledge records from scratch"""
+        with self.lock:
+            records = self.knowledge.all()
+            self.index = self._build(records)
+            self.watermark = (len(records), max(self.knowledge.record_id(record) for record in records) if records else 0)
+
+    def search(self, query: str, k: int = 5) -> List[Dict]:
+        """
+        Find the passages that best match a query
+
+        Args:
+            query (str): Free text query
+            k (int): Max passages returned
+
+        Returns:
+            List[Dict]: file_name, score and passage text, best first
+        """
+        with self.lock:
+            if self.index is None or (self.knowledge.count(), self.knowledge.last_id()) != self.watermark:
+                self.index = self._load()
+            index = self.index
+        hits = index.search(query, k)
+        if not hits:
+            return []
+        records = {self.knowledge.record_id(record): record
+                   for record in self.knowledge.get(list({int(index.passages[doc][0]) for doc, _ in hits}))}
+        results = []
+        for doc, score in hits:
+            record_id, start, end = (int(value) for value in index.passages[doc])
+            record = records.get(record_id)
+            if record is None:
+                continue
+            results.append({
+                "file_name": record.get('file_name'),
+                "score": round(score, 3),
+                "passage": (record.get('content') or "")[start:end],
+            })
+        return results
@@ -0,0 +1,363 @@
+import os
+import re
+import threading
+
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from memory_vector_utils import embed, memory_text
+from file_lock_utils import file_lock
+
+load_dotenv()
+
+# memories older than this are consolidated
+MEMORY_CONSOLIDATE_AFTER_SEC = int(os.getenv("MEMORY_CONSOLIDATE_AFTER_SEC", 7 * 86400))
+# seconds between consolidation runs, 0 disables the background job
+MEMORY_CONSOLIDATE_INTERVAL_SEC = int(os.getenv("MEMORY_CONSOLIDATE_INTERVAL_SEC", 3600))
+# day summaries are rolled up by week, then summaries by month, once the whole week or month is older than this
+MEMORY_ROLLUP_WEEK_AFTER_SEC = int(os.getenv("MEMORY_ROLLUP_WEEK_AFTER_SEC", 30 * 86400))
+MEMORY_ROLLUP_MONTH_AFTER_SEC = int(os.getenv("MEMORY_ROLLUP_MONTH_AFTER_SEC", 90 * 86400))
+# summarize with the openai api instead of picking sentences
+MEMORY_SUMMARY_LLM = os.getenv("MEMORY_SUMMARY_LLM", "false").lower() == "true"
+MEMORY_SUMMARY_MODEL = os.getenv("MEMORY_SUMMARY_MODEL", "gpt-4o-mini")
+
+# memories are grouped by day (utc), then by topic within the day
+# min cosine similarity of a memory to a topic to join it
+TOPIC_THRESHOLD = 0.3
+# min memories replaced by one summary
+MIN_CLUSTER = 3
+SUMMARY_SENTENCES = 3
+
+SUMMARY_TYPE = "summary"
+# summary windows, finest first: 2025-01-06 (day), 2025-W02 (iso week), 2025-01 (month)
+SUMMARY_LEVELS = ("day", "week", "month")
+
+# "5 memories (2025-01-06): " in front of every summary
+_SUMMARY_PREFIX = re.compile(r"^(\d+) memories \([^)]*\): ")
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+|\n+")
+# numbers and hashes, sentences that only differ in them are merged instead of dropped as duplicates
+_FACT = re.compile(r"0x[0-9a-fA-F]+|\d+(?:\.\d+)?")
+
+
+def _timestamp(memory: Dict) -> Optional[datetime]:
+    """The naive utc creation time of a memory, None if it has none"""
+    try:
+        created = datetime.fromisoformat(memory['timestamp'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return created.astimezone(timezone.utc).replace(tzinfo=None) if created.tzinfo else created
+
+
+def window_level(window: str) -> str:
+    """The level of a summary window (day, week or month)"""
+    return "week" if "-W" in window else "month" if len(window) == 7 else "day"
+
+
+def window_start(window: Optional[str]) -> Optional[date]:
+    """The first day of a summary window, None if it is not one"""
+    try:
+        level = window_level(window)
+        if level == "week":
+            year, week = window.split("-W")
+            return date.fromisocalendar(int(year), int(week), 1)
+        return date.fromisoformat(f"{window}-01" if level == "month" else window)
+    except (TypeError, ValueError):
+        return None
+
+
+def rollup_window(day: date, level: str) -> Tuple[str, date]:
+    """
+    Args:
+        day (date): The first day of a finer window
+        level (str): week or month
+    Returns:
+        Tuple[str, date]: The week or month window the day is in and the day after it ends
+    """
+    if level == "week":
+        year, week, weekday = day.isocalendar()
+        return f"{year}-W{week:02d}", day + timedelta(days=8 - weekday)
+    return day.strftime("%Y-%m"), date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def summarized_count(memory: Dict) -> int:
+    """Number of original memories behind a memory, 1 unless it is a summary"""
+    if memory.get('type') != SUMMARY_TYPE:
+        return 1
+    if memory.get('count'):
+        return int(memory['count'])
+    match = _SUMMARY_PREFIX.match(memory.get('content') or "")
+    return int(match.group(1)) if match else 1
+
+
+def summarized_text(memory: Dict) -> str:
+    """The text of a memory to summarize, without the prefix of a summary"""
+    return _SUMMARY_PREFIX.sub("", memory_text(memory), count=1)
+
+
+def cluster_by_topic(memories: List[Dict], threshold: float = TOPIC_THRESHOLD) -> List[List[Dict]]:
+    """
+    Greedy clustering, every memory joins the closest topic centroid or starts a new topic
+    Args:
+        memories (List[Dict]): Memories in time order
+        threshold (float): Min cosine similarity to join a topic
+    Returns:
+        List[List[Dict]]: The topics, small ones are merged into one so they are summarized too
+    """
+    centroids: List[np.ndarray] = []
+    topics: List[List[Dict]] = []
+    for memory in memories:
+        vector = embed(memory_text(memory))
+        scores = [float(centroid @ vector) / (np.linalg.norm(centroid) or 1) for centroid in centroids]
+        best = int(np.argmax(scores)) if scores else -1
+        if best >= 0 and scores[best] >= threshold:
+            centroids[best] = centroids[best] + vector
+            topics[best].append(memory)
+        else:
+            centroids.append(vector.copy())
+            topics.append([memory])
+    large = [topic for topic in topics if len(topic) >= MIN_CLUSTER]
+    rest = [memory for topic in topics if len(topic) < MIN_CLUSTER for memory in topic]
+    return large + ([rest] if rest else [])
+
+
+def merge_sentences(sentences: List[str]) -> str:
+    """
+    Merge sentences that only differ in their numbers and hashes
+    ex: "Voted yes on proposal 0." and "Voted yes on proposal 1." -> "Voted yes on proposal 0, 1."
+    Args:
+        sentences (List[str]): Sentences of the same template
+    Returns:
+        str: One sentence listing the values, or the sentences if more than one value differs
+    """
+    facts = [_FACT.findall(sentence) for sentence in sentences]
+    varying = [i for i in range(len(facts[0])) if len({fact[i] for fact in facts}) > 1]
+    if len(varying) != 1 or any(len(fact) != len(facts[0]) for fact in facts):
+        return " ".join(sentences)
+    parts = _FACT.split(sentences[0])
+    values = list(dict.fromkeys(fact[varying[0]] for fact in facts))
+    merged = parts[0]
+    for i, fact in enumerate(facts[0]):
+        merged += (", ".join(values) if i == varying[0] else fact) + parts[i + 1]
+    return merged
+
+
+def extractive_summary(texts: List[str], sentences: int = SUMMARY_SENTENCES) -> str:
+    """
+    Pick the sentences closest to the centroid of all texts, skipping near duplicates, in their original order
+    Sentences that differ in numbers or hashes are never dropped as duplicates, those that only differ in
+    them are merged into one sentence.
+    Args:
+        texts (List[str]): The memory texts
+        sentences (int): Max sentences
+    Returns:
+        str: The summary
+    """
+    # template (numbers and hashes masked) -> its sentences, in order of appearance
+    templates: Dict[str, List[str]] = {}
+    for text in texts:
+        for sentence in _SENTENCE.split(text):
+            sentence = sentence.strip()
+            key = re.sub(r"\W+", " ", sentence.lower()).strip()
+            if len(key) <= 3:
+                continue
+            group = templates.setdefault(_FACT.sub("#", key), [])
+            if sentence not in group:
+                group.append(sentence)
+    if not templates:
+        return ""
+    candidates = [group[0] if len(group) == 1 else merge_sentences(group) for group in templates.values()]
+    facts = [set(_FACT.findall(candidate)) for candidate in candidates]
+    vectors = np.stack([embed(candidate) for candidate in candidates])
+    centroid = vectors.sum(axis=0)
+    scores = vectors @ centroid
+    chosen: List[int] = []
+    for i in np.argsort(-scores, kind="stable"):
+        if len(chosen) >= sentences:
+            break
+        if all(float(vectors[i] @ vectors[j]) < 0.8 or not facts[i] <= facts[j] for j in chosen):
+            chosen.append(int(i))
+    return " ".join(candidates[i] for i in sorted(chosen))
+
+
+def llm_summary(texts: List[str], model: str = MEMORY_SUMMARY_MODEL) -> str:
+    """
+    Summarize with the openai api
+    Returns:
+        str: The summary
+    """
+    from openai import OpenAI
+
+    client = OpenAI()
+    response = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": f"Summarize these memories of an agent in at most {SUMMARY_SENTENCES} "
+                                          "sentences. Keep names, numbers, hashes and decisions."},
+            {"role": "user", "content": "\n".join(f"- {text}" for text in texts)},
+        ],
+    )
+    return response.choices[0].message.content.strip()
+
+
+class MemoryConsolidator:
+    def __init__(self, retention, after: float = MEMORY_CONSOLIDATE_AFTER_SEC,
+                 interval: float = MEMORY_CONSOLIDATE_INTERVAL_SEC, use_llm: bool = MEMORY_SUMMARY_LLM,
+                 week_after: float = MEMORY_ROLLUP_WEEK_AFTER_SEC, month_after: float = MEMORY_ROLLUP_MONTH_AFTER_SEC,
+                 start: bool = True):
+        """
+        Background job that replaces old memories with summaries
+        Old memories are grouped by day and topic, every group becomes one summary memory that lists the
+        archived originals in `sources`. Memories without a timestamp (stored before memories had one) are
+        left alone, their age is unknown. Day summaries of a week that ended `week_after` ago are rolled up the
+        same way into week summaries, and day or week summaries of a month that ended `month_after` ago into
+        month summaries, their `sources` are the archived finer summaries.
+        Only one process sharing the memories consolidates at a time.
+        Args:
+            retention (MemoryRetention): The memory retention
+            after (float): Age in seconds after which memories are consolidated
+            interval (float): Seconds between runs, 0 never runs in the background
+            use_llm (bool): Summarize with the openai api (falls back to extractive on errors)
+            week_after (float): Age in seconds of the end of a week after which its day summaries are rolled up
+            month_after (float): Age in seconds of the end of a month after which its summaries are rolled up
+            start (bool): Start the background job right away
+        """
+        print("initializing memory consolidation")
+        self.retention = retention
+        self.after = after
+        self.interval = interval
+        self.use_llm = use_llm
+        self.rollup_after = {"week": week_after, "month": month_after}
+        self.lock = threading.Lock()
+        self.lock_path = f"{retention.storage.path}.consolidate.lock"
+        self.stopped = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        if start and interval:
+            self.start()
+
+    def start(self):
+        """Start the background job"""
+        if self._worker and self._worker.is_alive():
+            return
+        self.stopped.clear()
+        self._worker = threading.Thread(target=self._run, name="memory-consolidation", daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self._worker:
+            self._worker.join(timeout=5)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            result = self.run_once()
+            if result["summaries"] or result.get("rollups"):
+                print(f"memory consolidation: {result}")
+
+    def _summarize(self, memories: List[Dict]) -> str:
+        texts = [summarized_text(memory) for memory in memories]
+        if self.use_llm:
+            try:
+                return llm_summary(texts)
+            except Exception as e:
+                print(f"Error summarizing memories with the llm: {str(e)}")
+        return extractive_summary(texts)
+
+    def run_once(self, now: Optional[datetime] = None) -> Dict:
+        """
+        Consolidate the memories older than `after`, then roll up the summaries of the old enough weeks and months
+
+        Args:
+            now (Optional[datetime]): The current time (utc)
+
+        Returns:
+            Dict: Number of memories consolidated and summaries written, of summaries rolled up and week or month
+                summaries written, or the error
+        """
+        with self.lock, file_lock(self.lock_path, blocking=False) as acquired:
+            if not acquired:
+                return {"memories": 0, "summaries": 0, "skipped": "another process is consolidating"}
+            try:
+                now = now or datetime.utcnow()
+                result = self._consolidate(now)
+                result["rolled_up"] = result["rollups"] = 0
+                for level in SUMMARY_LEVELS[1:]:
+                    rolled_up, rollups = self._rollup(now, level)
+                    result["rolled_up"] += rolled_up
+                    result["rollups"] += rollups
+                return result
+            except Exception as e:
+                print(f"Error consolidating memories: {str(e)}")
+                return {"memories": 0, "summaries": 0, "error": str(e)}
+
+    def _consolidate(self, now: datetime) -> Dict:
+        cutoff = now - timedelta(seconds=self.after)
+        memories = self.retention.memories
+        windows: Dict[str, List[Dict]] = {}
+        for memory in memories.page(field='type', value='memory'):
+            created = _timestamp(memory)
+            if created is None or created > cutoff:
+                continue
+            windows.setdefault(created.date().isoformat(), []).append(memory)
+
+        consolidated, summaries = self._summarize_windows(windows)
+        return {"memories": consolidated, "summaries": summaries}
+
+    def _rollup(self, now: datetime, level: str) -> Tuple[int, int]:
+        """Replace the finer summaries of the weeks or months that ended `rollup_after` ago by `level` summaries"""
+        cutoff = (now - timedelta(seconds=self.rollup_after[level])).date()
+        windows: Dict[str, List[Dict]] = {}
+        for summary in self.retention.memories.page(field='type', value=SUMMARY_TYPE):
+            start = window_start(summary.get('window'))
+            if start is None or SUMMARY_LEVELS.index(window_level(summary['window'])) >= SUMMARY_LEVELS.index(level):
+                continue
+            window, end = rollup_window(start, level)
+            if end <= cutoff:
+                windows.setdefault(window, []).append(summary)
+        return self._summarize_windows(windows)
+
+    def _summarize_windows(self, windows: Dict[str, List[Dict]]) -> Tuple[int, int]:
+        """Replace every topic of 3 or more memories of a window by a summary, returns the replaced and written"""
+        vectors = self.retention.memory_vectors
+        replaced = summaries = 0
+        for window, window_memories in sorted(windows.items()):
+            if len(window_memories) < MIN_CLUSTER:
+                continue
+            for topic in cluster_by_topic(window_memories):
+                if len(topic) < MIN_CLUSTER:
+                    continue
+                summary_id, summary = self._replace(window, topic)
+                vectors.remove([memory["id"] for memory in topic])
+                vectors.add(summary_id, summary)
+                replaced += len(topic)
+                summaries += 1
+        return replaced, summaries
+
+    def _replace(self, window: str, topic: List[Dict]):
+        """
+        Archive the memories of a topic, store their summary and drop them from the memories, in one transaction
+        so a crash or an error never leaves them both archived and live, or summarized without sources.
+        Returns the summary id and record
+        """
+        summary = self._summarize(topic)
+        count = sum(summarized_count(memory) for memory in topic)
+        timestamps = [memory.get('timestamp') for memory in topic if memory.get('timestamp')]
+        memories, archive = self.retention.memories, self.retention.archive
+        with memories.transaction():
+            archive_ids = [archive.insert({**{key: value for key, value in memory.items() if key != "id"},
+                                           "original_id": memory["id"]}) for memory in topic]
+            record = {
+                "type": SUMMARY_TYPE,
+                "content": f"{count} memories ({window}): {summary}",
+                "timestamp": max(timestamps) if timestamps else datetime.utcnow().isoformat(),
+                "window": window,
+                "level": window_level(window),
+                "count": count,
+                "sources": archive_ids,
+            }
+            summary_id = memories.insert(record)
+            memories.delete([memory["id"] for memory in topic])
+        return summary_id, record
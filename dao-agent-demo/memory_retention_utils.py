@@ -4,8 +4,12 @@ from time import sleep
 from typing import List, Dict, Optional
 import requests
 import uuid
-import inflect
-from tinydb import TinyDB, Query
+from memory_storage_utils import (MemoryStorage, open_memory_storage, record_kind, project, MEMORIES_TABLE,
+                                  KNOWLEDGE_TABLE, ARCHIVE_TABLE, ACTED_KIND)
+from file_lock_utils import file_lock
+from acted_notifications_utils import ActedNotifications
+from knowledge_search_utils import KnowledgeSearch
+from memory_vector_utils import MemoryVectors
 
 from dotenv import load_dotenv
 from datetime import datetime
@@ -13,12 +17,117 @@ from datetime import datetime
 load_dotenv()
 
 class MemoryRetention:
-    def __init__(self):
-        """Initialize local json store"""
+    def __init__(self, storage: Optional[MemoryStorage] = None, acted: Optional[ActedNotifications] = None):
+        """
+        Initialize local store
+        Memories, knowledge and acted notifications are kept apart so listing memories never returns
+        the knowledge base and acted hashes can expire on their own.
+        Args:
+            storage (Optional[MemoryStorage]): The storage, defaults to MEMORY_BACKEND (tinydb db.json or sqlite)
+            acted (Optional[ActedNotifications]): The acted notifications, defaults to ACTED_NOTIFICATIONS_FILE
+        """
         print("initializing memory retention")
         # init local db
         print("Initializing local database...")
-        self.db = TinyDB('db.json')
+        self.storage = storage or open_memory_storage()
+        self.memories = self.storage.table(MEMORIES_TABLE)
+        self.knowledge = self.storage.table(KNOWLEDGE_TABLE)
+        # memories replaced by consolidation summaries
+        self.archive = self.storage.table(ARCHIVE_TABLE)
+        # bm25 passage index over the knowledge content, loaded on the first search
+        self.knowledge_search = KnowledgeSearch(self.knowledge)
+        # hashed n-gram vectors of the memories for similarity recall, loaded on the first recall
+        self.memory_vectors = MemoryVectors(self.memories)
+        # acted hashes stored in the db before the log existed are imported on first start
+        if acted is None:
+            acted = ActedNotifications(legacy=lambda: self.storage.find_existing('hash'))
+        self.acted = acted
+        self._split_shared_table()
+
+    def _split_shared_table(self):
+        """Move the records of the table shared by all kinds (older databases) into the per kind tables"""
+        # agent processes starting together on one sqlite file move the records once
+        with file_lock(f"{self.storage.path}.split.lock"):
+            self._move_shared_records()
+
+    def _move_shared_records(self):
+        shared = self.storage.all()
+        if not shared:
+            return
+        tables = {MEMORIES_TABLE: [], KNOWLEDGE_TABLE: []}
+        for record in shared:
+            kind = record_kind(record)
+            # acted hashes were imported into the acted notifications log, files may have been imported again
+            if kind == KNOWLEDGE_TABLE and self.knowledge.contains('file_name', record['file_name']):
+                continue
+            if kind != ACTED_KIND:
+                tables[kind].append({key: value for key, value in record.items() if key != "_id"})
+        self.memories.insert_many(tables[MEMORIES_TABLE])
+        self.knowledge.insert_many(tables[KNOWLEDGE_TABLE])
+        self.storage.truncate()
+        print(f"moved {len(tables[MEMORIES_TABLE])} memories and {len(tables[KNOWLEDGE_TABLE])} knowledge records "
+              f"into their own tables")
+
+    def claim_notification(self, notification_hash: str) -> bool:
+        """
+        Claim a notification before acting on it, agent processes sharing the memories never claim the same one
+        The claim is a lease: mark_notification_as_acted makes it final, release_notification gives it up and
+        it expires after ACTED_CLAIM_TTL_SEC, so a notification whose reply failed is picked up again.
+
+        Args:
+            notification_hash (str): The hash of the notification to claim.
+
+        Returns:
+            bool: True if this process may act on it, False if it was already claimed or acted upon.
+        """
+        try:
+            return self.acted.claim(notification_hash)
+        except Exception as e:
+            print(f"Error claiming notification: {str(e)}")
+            return False
+
+    def release_notification(self, notification_hash: str) -> bool:
+        """
+        Release the claim of a notification that was not acted on (ex: the cast failed), so it is retried.
+
+        Args:
+            notification_hash (str): The hash of the notification to release.
+
+        Returns:
+            bool: True if this process held the claim.
+        """
+        try:
+            return self.acted.release(notification_hash)
+        except Exception as e:
+            print(f"Error releasing notification: {str(e)}")
+            return False
+
+    def holds_notification_claim(self, notification_hash: str) -> bool:
+        """
+        Args:
+            notification_hash (str): The hash of the notification.
+        Returns:
+            bool: True if this process claimed the notification and has not acted on or released it yet.
+        """
+        return self.acted.holds(notification_hash)
+
+    def settle_notification(self, notification_hash: str, sent: Optional[bool]) -> bool:
+        """
+        Follow the queued reply to a claimed notification: it is acted once the reply is sent, released if the
+        reply failed, and its claim is renewed while the reply is still pending.
+
+        Args:
+            notification_hash (str): The hash of the notification.
+            sent (Optional[bool]): True if the reply was posted, False if it failed, None if it is still pending.
+
+        Returns:
+            bool: True if the notification was marked, released or renewed.
+        """
+        if sent:
+            return self.mark_notification_as_acted(notification_hash)
+        if sent is False:
+            return self.release_notification(notification_hash)
+        return self.claim_notification(notification_hash)
 
     def mark_notification_as_acted(self, notification_hash: str) -> bool:
         """
@@ -31,13 +140,10 @@ class MemoryRetention:
             bool: True if successfully marked, False otherwise.
         """
         try:
-            # Check if the notification is already marked
-            if self.db.search(Query().hash == notification_hash):
+            # Check and add in one step, the lookup is a set membership
+            if not self.acted.add(notification_hash):
                 print("already marked as acted")
                 return False
-
-            # Add the hash to the database
-            self.db.insert({'hash': notification_hash, 'timestamp': datetime.utcnow().isoformat()})
             return True
         except Exception as e:
             print(f"Error marking notification as acted: {str(e)}")
@@ -54,43 +160,89 @@ class MemoryRetention:
             str: Status message about the memory
         """
         try:
-            self.db.insert(memory)
+            memory.setdefault('timestamp', datetime.utcnow().isoformat())
+            memory_id = self.memories.insert(memory)
+            self.memory_vectors.add(memory_id, memory)
             return "Successfully stored memory"
         except Exception as e:
             return f"Error storing memory: {str(e)}"
     
-    def query_by_keywords(self, keywords: list[str]) -> str:
+    def recall_memories(self, query: str, k: int = 5) -> List:
         """
-        Query the TinyDB database for records containing a specific keyword.
+        Recall the memories most similar to a text
+
+        Args:
+            query (str): The text to compare with (ex: a notification)
+            k (int): Max memories returned
+
+        Returns:
+            List: The memories with their `id` and a `score` (cosine similarity), most similar first
         """
-        db = self.db
-        File = Query()
-        inflector = inflect.engine()
+        try:
+            ranked = self.memory_vectors.recall(query, k)
+            scores = dict(ranked)
+            memories = self.memories.get([memory_id for memory_id, _ in ranked])
+            return [{**project(memory, self.memories.record_id(memory)),
+                     "score": round(scores[self.memories.record_id(memory)], 3)} for memory in memories]
+        except Exception as e:
+            return f"Error recalling memories: {str(e)}"
 
-        # Search for records where the 'keywords' field contains the specified keyword
-        # Aggregate results for all keywords
-        results = []
-        for keyword in keywords:
-            plural = inflector.plural(keyword)
-            singular_matches = db.search(File.keywords.any(keyword.lower()))
-            plural_matches = db.search(File.keywords.any(plural.lower()))
-            results.extend(singular_matches + plural_matches)
+    def query_by_keywords(self, keywords: list[str]) -> str:
+        """
+        Query the knowledge records matching any of the keywords (singular and plural forms match),
+        records matching more keywords come first
+        """
+        ranked = self.knowledge.lookup_keywords(keywords)
+        records = self.knowledge.get([record_id for record_id, _ in ranked])
 
-        # Remove duplicates (optional, in case multiple keywords match the same record)
-        unique_results = {record['file_name']: record for record in results}.values()
+        # Remove duplicates (optional, in case multiple records share a file name)
+        unique_results = {}
+        for record in records:
+            if record.get('file_name') not in unique_results:
+                unique_results[record.get('file_name')] = record
+        unique_results = unique_results.values()
         response = ""
         if unique_results:
             print(f"Found {len(unique_results)} record(s) with keyword '{keywords}':")
             
             for record in unique_results:
-                res_file_name = f"File Name: {record['file_name']}"
-                res_keywords = f"Keywords: {record['keywords']}"
-                res_content = f"Content Preview: {record['content']}\n"
+                res_file_name = f"File Name: {record.get('file_name')}"
+                res_keywords = f"Keywords: {record.get('keywords')}"
+                res_content = f"Content Preview: {record.get('content')}\n"
                 response += res_file_name + res_keywords + res_content + "\n"
         else:
-            response = f"No records found with keyword '{keyword}'."
+            response = f"No records found with keyword '{keywords}'."
         return response
 
+    def is_notification_acted(self, notification_hash: str) -> bool:
+        """
+        Check if a notification was acted upon.
+
+        Args:
+            notification_hash (str): The hash of the notification.
+
+        Returns:
+            bool: True if the notification was acted upon or another process claimed it, notifications this
+                process claimed and has not acted on yet are not.
+        """
+        return self.acted.is_acted(notification_hash) or self.acted.is_claimed(notification_hash)
+
+    def search_knowledge(self, query: str, k: int = 5) -> List:
+        """
+        Search the knowledge base, passages are ranked with BM25
+
+        Args:
+            query (str): Free text query
+            k (int): Max passages returned
+
+        Returns:
+            List: file_name, score and passage of the best passages
+        """
+        try:
+            return self.knowledge_search.search(query, k)
+        except Exception as e:
+            return f"Error searching knowledge: {str(e)}"
+
     def get_acted_notifications(self) -> List:
         """
         Get all acted notifications
@@ -99,42 +251,77 @@ class MemoryRetention:
             List: List of acted notifications
         """
         try:
-            query = Query()
-            acted_notifications = self.db.search(query.hash.exists())
+            acted_notifications = self.acted.all()
             return acted_notifications
         except Exception as e:
             return f"Error getting memories: {str(e)}"
     
-    def get_all_memories(self) -> List:
+    def get_all_memories(self, limit: Optional[int] = None, offset: int = 0, cursor: Optional[int] = None,
+                         newest_first: bool = False, fields: Optional[List[str]] = None) -> List:
         """
-        Get all memories
+        Get all memories (knowledge and acted notifications are not included)
+
+        Args:
+            limit (Optional[int]): Max memories returned, all when None
+            offset (int): Memories skipped
+            cursor (Optional[int]): Continue after this memory id (the last id of the previous page)
+            newest_first (bool): Most recent memories first
+            fields (Optional[List[str]]): Fields returned besides the id, all when empty
 
         Returns:
             List: List of memories
         """
         try:
-            memories = self.db.all()
-            return memories
+            if limit is None and not (offset or cursor or newest_first or fields):
+                return self.memories.all()
+            return self.memories.page(limit, offset, cursor, newest_first, fields)
         except Exception as e:
             return f"Error getting memories: {str(e)}"
 
-    def get_memories(self, query: Dict) -> List:
+    def get_memories(self, query: Dict, limit: Optional[int] = None, offset: int = 0, cursor: Optional[int] = None,
+                     newest_first: bool = False, fields: Optional[List[str]] = None) -> List:
         """
         Get memories
 
         Args:
             query (Dict): The query to filter memories
+            limit (Optional[int]): Max memories returned, all when None
+            offset (int): Memories skipped
+            cursor (Optional[int]): Continue after this memory id (the last id of the previous page)
+            newest_first (bool): Most recent memories first
+            fields (Optional[List[str]]): Fields returned besides the id, all when empty
 
         Returns:
             List: List of memories
         """
         try:
-            Memory = Query()
-            memories = self.db.search(Memory.type == query["type"])
-            return memories
+            if limit is None and not (offset or cursor or newest_first or fields):
+                return self.memories.find('type', query["type"])
+            return self.memories.page(limit, offset, cursor, newest_first, fields, 'type', query["type"])
         except Exception as e:
             return f"Error getting memories: {str(e)}"
         
+    def get_memory_sources(self, summary_id: int, archived: bool = False) -> List:
+        """
+        Get the original memories a summary was made from
+        The sources of a week or month summary are the archived summaries it rolled up, their ids are archive ids.
+
+        Args:
+            summary_id (int): The id of the summary memory, or of an archived summary with `archived`
+            archived (bool): Look the summary up in the archive
+
+        Returns:
+            List: The archived memories
+        """
+        try:
+            summary = (self.archive if archived else self.memories).get([summary_id])
+            if not summary or not summary[0].get('sources'):
+                return f"Memory {summary_id} is not a summary"
+            return [{"id": self.archive.record_id(memory), **{key: value for key, value in memory.items() if key != "_id"}}
+                    for memory in self.archive.get(summary[0]['sources'])]
+        except Exception as e:
+            return f"Error getting memory sources: {str(e)}"
+
     def delete_memory(self, query: Dict) -> str:
         """
         Delete a memory
@@ -146,8 +333,10 @@ class MemoryRetention:
             str: Status message about the memory
         """
         try:
-            Memory = Query()
-            self.db.remove(Memory.type == query["type"])
+            with self.memories.transaction():
+                ids = [self.memories.record_id(record) for record in self.memories.find('type', query["type"])]
+                self.memories.delete(ids)
+            self.memory_vectors.remove(ids)
             return "Successfully deleted memory"
         except Exception as e:
             return f"Error deleting memory: {str(e)}"
@@ -164,34 +353,43 @@ class MemoryRetention:
             str: Status message about the memory
         """
         try:
-            Memory = Query()
-            self.db.update(memory, Memory.type == query["type"])
+            with self.memories.transaction():
+                ids = [self.memories.record_id(record) for record in self.memories.find('type', query["type"])]
+                self.memories.update(memory, 'type', query["type"])
+                updated = self.memories.get(ids)
+            self.memory_vectors.update(updated)
             return "Successfully updated memory"
         except Exception as e:
             return f"Error updating memory: {str(e)}"
         
     def clear_memories(self) -> str:
         """
-        Clear all memories
+        Clear all memories (the knowledge base is kept)
 
         Returns:
             str: Status message about the action
         """
         try:
-            self.db.truncate()
+            with self.memories.transaction():
+                ids = [record["id"] for record in self.memories.page(fields=["id"])]
+                self.memories.truncate()
+            self.memory_vectors.remove(ids)
             return "Successfully cleared memories"
         except Exception as e:
             return f"Error clearing memories: {str(e)}"
     
-    def get_memory_count(self) -> str:
+    def get_memory_count(self, query: Optional[Dict] = None) -> str:
         """
-        Get the count of memories
+        Get the count of memories, the memories are counted by the storage and not loaded
+
+        Args:
+            query (Optional[Dict]): Only count memories of this type ({"type": ...})
 
         Returns:
             str: The count of memories
         """
         try:
-            count = len(self.get_all_memories())
+            count = self.memories.count('type', query["type"]) if query and query.get("type") else self.memories.count()
             return count
         except Exception as e:
             return f"Error getting memory count: {str(e)}"
@@ -0,0 +1,794 @@
+import os
+import re
+import json
+import atexit
+import sqlite3
+import threading
+
+from abc import ABC, abstractmethod
+from itertools import islice
+from contextlib import contextmanager
+from typing import List, Dict, Tuple, Iterable, Callable, Optional
+
+from tinydb import TinyDB, Query, where
+from tinydb.storages import Storage
+from tinydb.table import Table
+from dotenv import load_dotenv
+
+from keyword_index_utils import KeywordIndex, normalize_keywords
+from file_lock_utils import lock, unlock, file_signature, write_file_atomic
+
+load_dotenv()
+
+# "tinydb" (json file) or "sqlite" (WAL mode)
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "tinydb")
+# database file, defaults to db.json for tinydb and memory.db for sqlite
+MEMORY_DB_PATH = os.getenv("MEMORY_DB_PATH")
+
+DEFAULT_PATHS = {"tinydb": "db.json", "sqlite": "memory.db"}
+
+# the tinydb backend serves reads from memory and writes db.json in batches ("false" writes on every change)
+MEMORY_TINYDB_CACHE = os.getenv("MEMORY_TINYDB_CACHE", "true").lower() == "true"
+# a batch is written after this many changes or this many seconds after its first change
+MEMORY_FLUSH_WRITES = int(os.getenv("MEMORY_FLUSH_WRITES", 100))
+MEMORY_FLUSH_INTERVAL_SEC = float(os.getenv("MEMORY_FLUSH_INTERVAL_SEC", 2))
+# seconds a sqlite write waits for another process to commit before failing with "database is locked"
+MEMORY_BUSY_TIMEOUT_SEC = float(os.getenv("MEMORY_BUSY_TIMEOUT_SEC", 30))
+
+# fields stored in their own indexed columns by the sqlite backend
+INDEXED_FIELDS = ("type", "hash", "file_name")
+
+# record kinds kept in their own tables, acted notification hashes live in ActedNotifications
+MEMORIES_TABLE = "memories"
+KNOWLEDGE_TABLE = "knowledge"
+# memories replaced by a summary, kept so the summary can link back to them
+ARCHIVE_TABLE = "memory_archive"
+ACTED_KIND = "acted"
+
+_TABLE_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def project(record: Dict, record_id: int, fields: Optional[Iterable[str]] = None) -> Dict:
+    """
+    Args:
+        record (Dict): A record
+        record_id (int): Its id
+        fields (Optional[Iterable[str]]): Fields kept, all when empty
+    Returns:
+        Dict: The record with its `id` and only the requested fields
+    """
+    fields = list(fields or [])
+    items = record.items() if not fields else ((field, record[field]) for field in fields if field in record)
+    return {"id": record_id, **{key: value for key, value in items if key != "_id"}}
+
+
+def record_kind(record: Dict) -> str:
+    """
+    Args:
+        record (Dict): A record of the shared table used before per kind tables
+    Returns:
+        str: ACTED_KIND for acted notification hashes, KNOWLEDGE_TABLE for imported files, MEMORIES_TABLE otherwise
+    """
+    if record.get('hash') and 'content' not in record:
+        return ACTED_KIND
+    if record.get('file_name'):
+        return KNOWLEDGE_TABLE
+    return MEMORIES_TABLE
+
+
+class MemoryStorage(ABC):
+    """
+    Record store behind MemoryRetention
+    Records are dicts, every record gets an integer id. Fields are matched by equality.
+    A storage is one table, `table(name)` opens another table of the same database.
+    """
+
+    @abstractmethod
+    def table(self, name: str) -> "MemoryStorage":
+        """Another table of the same database"""
+
+    @abstractmethod
+    def insert(self, record: Dict) -> int:
+        """Insert a record and return its id"""
+
+    def insert_many(self, records: Iterable[Dict]) -> int:
+        """Insert records, returns the number inserted"""
+        count = 0
+        for record in records:
+            self.insert(record)
+            count += 1
+        return count
+
+    @abstractmethod
+    def all(self) -> List[Dict]:
+        """All records"""
+
+    @abstractmethod
+    def find(self, field: str, value) -> List[Dict]:
+        """Records where `field` equals `value`"""
+
+    @abstractmethod
+    def find_existing(self, field: str) -> List[Dict]:
+        """Records that have `field`"""
+
+    def contains(self, field: str, value) -> bool:
+        """True if a record has `field` equal to `value`"""
+        return bool(self.find(field, value))
+
+    @abstractmethod
+    def get(self, ids: List[int]) -> List[Dict]:
+        """Records by id, in the order of the ids, unknown ids are skipped"""
+
+    @abstractmethod
+    def update(self, fields: Dict, field: str, value) -> int:
+        """Merge `fields` into the records where `field` equals `value`, returns the number updated"""
+
+    @abstractmethod
+    def remove(self, field: str, value) -> int:
+        """Remove the records where `field` equals `value`, returns the number removed"""
+
+    @abstractmethod
+    def delete(self, ids: List[int]) -> int:
+        """Remove records by id, returns the number removed"""
+
+    @abstractmethod
+    def truncate(self):
+        """Remove all records"""
+
+    @abstractmethod
+    def count(self, field: Optional[str] = None, value=None) -> int:
+        """Number of records (where `field` equals `value`), without loading them"""
+
+    def last_id(self) -> int:
+        """The highest record id, 0 if empty, with `count` it tells whether records were added or removed"""
+        last = self.page(limit=1, newest_first=True, fields=["id"])
+        return last[0]["id"] if last else 0
+
+    @abstractmethod
+    def page(self, limit: Optional[int] = None, offset: int = 0, cursor: Optional[int] = None,
+             newest_first: bool = False, fields: Optional[Iterable[str]] = None,
+             field: Optional[str] = None, value=None) -> List[Dict]:
+        """
+        A page of records in id (insertion) order, projected with `project`
+        Args:
+            limit (Optional[int]): Max records, all when None
+            offset (int): Records skipped
+            cursor (Optional[int]): Only records after this id in the page order (the last id of the previous page)
+            newest_first (bool): Highest ids first
+            fields (Optional[Iterable[str]]): Fields returned besides the id, all when empty
+            field (Optional[str]): Only records where this field equals `value`
+        """
+
+    @abstractmethod
+    def lookup_keywords(self, keywords: Iterable[str], limit: Optional[int] = None) -> List[Tuple[int, int]]:
+        """(record id, matched keywords) of the records matching any keyword, most matches first"""
+
+    @abstractmethod
+    def record_id(self, record: Dict) -> int:
+        """The id of a record returned by this storage"""
+
+    @contextmanager
+    def transaction(self):
+        """Apply the changes made in the block to every table of the database at once, or none if it raises"""
+        yield
+
+    def close(self):
+        """Release the database"""
+
+
+class SharedTable(Table):
+    def reset(self):
+        """Forget the query cache and the next id, another process changed the table"""
+        self.clear_cache()
+        # tinydb keeps the next id after the first insert, it is recomputed from the stored ids when unset
+        self._next_id = None
+
+
+class SharedTinyDB(TinyDB):
+    table_class = SharedTable
+
+
+class CachedJSONStorage(Storage):
+    def __init__(self, path: str, flush_writes: int = MEMORY_FLUSH_WRITES,
+                 flush_interval: float = MEMORY_FLUSH_INTERVAL_SEC, **kwargs):
+        """
+        TinyDB storage that keeps the database in memory
+        Reads never touch the file. Changes are written in batches, after `flush_writes` changes or
+        `flush_interval` seconds, and at exit, each batch through a temp file and a rename.
+        Processes sharing the file take a file lock from the first change of a batch until it is written,
+        and reload the file when another process wrote it, so no process overwrites the changes of another.
+        Args:
+            path (str): The json file
+            flush_writes (int): Changes per batch, 1 writes every change
+            flush_interval (float): Max seconds a change stays unwritten (and other writers wait)
+        """
+        super().__init__()
+        self.path = path
+        self.flush_writes = flush_writes
+        self.flush_interval = flush_interval
+        # TinyDBStorage takes this lock around every operation, so a flush never sees a half applied change
+        self.lock = threading.RLock()
+        self.lock_file = open(f"{path}.lock", "a")
+        # this process holds the file lock, from the first change of a batch until the batch is written
+        self.held = False
+        # nested operations (ex: an update that finds first), the lock is released by the outermost one
+        self.depth = 0
+        self.data: Optional[Dict] = None
+        self.signature = None
+        # called after the file was reloaded, so tables and keyword indexes drop what they cached
+        self.reload_hooks: Dict[str, Callable[[], None]] = {}
+        self.pending = 0
+        # open transactions, their changes are written together when the outermost one ends
+        self.batches = 0
+        self.timer: Optional[threading.Timer] = None
+        self.flushes = 0
+        self.reloads = 0
+        self._load()
+        atexit.register(self.close)
+
+    def _load(self):
+        signature = file_signature(self.path)
+        data = None
+        if signature and signature[2]:
+            with open(self.path, "r") as db_file:
+                data = json.load(db_file)
+        self.data, self.signature = data, signature
+
+    def begin(self, write: bool = False):
+        """
+        Start an operation, the caller holds the storage lock
+        A change waits for the file lock, then the file is reloaded if another process wrote it.
+        Args:
+            write (bool): The operation changes the database
+        """
+        self.depth += 1
+        if self.held:
+            return
+        if write:
+            lock(self.lock_file)
+            self.held = True
+        if file_signature(self.path) != self.signature:
+            self._load()
+            self.reloads += 1
+            for hook in list(self.reload_hooks.values()):
+                hook()
+
+    def end(self):
+        """Finish an operation, the file lock is released if nothing is left to write"""
+        self.depth -= 1
+        if not self.depth and not self.pending:
+            self._release()
+
+    def _release(self):
+        if self.held:
+            self.held = False
+            unlock(self.lock_file)
+
+    def read(self) -> Optional[Dict]:
+        return self.data
+
+    def write(self, data: Dict):
+        with self.lock:
+            self.data = data
+            self.pending += 1
+            if not self.batches:
+                self._schedule()
+
+    def _schedule(self):
+        if self.pending >= self.flush_writes:
+            self._write_pending()
+        elif self.pending and self.timer is None:
+            self.timer = threading.Timer(self.flush_interval, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    @contextmanager
+    def batch(self):
+        """
+        Write the changes of the block in one batch, the caller holds the storage lock and the file lock
+        The changes are dropped (the file is reloaded) if the block raises.
+        """
+        if not self.batches:
+            self._write_pending()
+        clean = not self.pending
+        self.batches += 1
+        try:
+            yield
+        except BaseException:
+            self.batches -= 1
+            if not self.batches and clean:
+                self._load()
+                self.pending = 0
+                for hook in list(self.reload_hooks.values()):
+                    hook()
+            raise
+        self.batches -= 1
+        if not self.batches:
+            self._schedule()
+
+    def _write_pending(self):
+        if not self.pending:
+            return
+        try:
+            write_file_atomic(self.path, json.dumps(self.data))
+            self.signature = file_signature(self.path)
+            self.pending = 0
+            self.flushes += 1
+        except Exception as e:
+            print(f"Error writing {self.path}: {str(e)}")
+
+    def flush(self):
+        """Write the pending changes"""
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            # an open transaction writes its changes when it ends
+            if not self.batches:
+                self._write_pending()
+            if not self.depth and not self.pending:
+                self._release()
+
+    def close(self):
+        self.flush()
+
+
+class TinyDBStorage(MemoryStorage):
+    def __init__(self, path: str = "db.json", table: Optional[str] = None, db: Optional[TinyDB] = None,
+                 cached: bool = MEMORY_TINYDB_CACHE):
+        """
+        Json file storage, the whole file is rewritten on every change (in batches when cached)
+        Several processes may open the file: a change waits until the other processes wrote their pending
+        batch (at most MEMORY_FLUSH_INTERVAL_SEC), use the sqlite backend when they write a lot.
+        Args:
+            path (str): The json file
+            table (Optional[str]): The table, defaults to the TinyDB default table
+            db (Optional[TinyDB]): An open database of the file, shared by its tables
+            cached (bool): Write in batches, otherwise every change is written right away
+        """
+        self.path = path
+        # an empty TinyDB is falsy, compare with None
+        if db is None:
+            db = SharedTinyDB(path, storage=CachedJSONStorage, **({} if cached else {"flush_writes": 1}))
+        self.db = db
+        self.storage: CachedJSONStorage = self.db.storage
+        self.lock = self.storage.lock
+        self.name = table or self.db.default_table_name
+        self.records = self.db.table(self.name)
+        self.storage.reload_hooks.setdefault("tables", self._reset_tables)
+        # keyword -> record ids, rebuilt once for databases created before the index existed
+        index_table = "keyword_index" if table is None else f"{self.name}_keyword_index"
+        with self._access(write=True):
+            self.keyword_index = KeywordIndex(self.db, index_table)
+            self.storage.reload_hooks[index_table] = self.keyword_index.reload
+            if not self.keyword_index.loaded:
+                self.keyword_index.rebuild(self.records.all())
+
+    def _reset_tables(self):
+        for name in self.db.tables():
+            table = self.db.table(name)
+            if isinstance(table, SharedTable):
+                table.reset()
+
+    @contextmanager
+    def _access(self, write: bool = False):
+        """Run an operation under the storage lock, with the file lock if it changes the database"""
+        with self.lock:
+            self.storage.begin(write)
+            try:
+                yield
+            finally:
+                self.storage.end()
+
+    def table(self, name: str) -> "TinyDBStorage":
+        with self.lock:
+            return TinyDBStorage(self.path, name, self.db)
+
+    def flush(self):
+        """Write pending changes of a cached database"""
+        self.storage.flush()
+
+    @contextmanager
+    def transaction(self):
+        with self._access(write=True), self.storage.batch():
+            yield
+
+    def insert(self, record: Dict) -> int:
+        with self._access(write=True):
+            doc_id = self.records.insert(record)
+            if record.get('keywords'):
+                self.keyword_index.add(doc_id, record['keywords'])
+            return doc_id
+
+    def insert_many(self, records: Iterable[Dict]) -> int:
+        with self._access(write=True):
+            records = list(records)
+            doc_ids = self.records.insert_multiple(records)
+            self.keyword_index.add_many((doc_id, record.get('keywords') or [])
+                                        for doc_id, record in zip(doc_ids, records))
+            return len(doc_ids)
+
+    def all(self) -> List[Dict]:
+        with self._access():
+            return self.records.all()
+
+    def find(self, field: str, value) -> List[Dict]:
+        with self._access():
+            return self.records.search(where(field) == value)
+
+    def find_existing(self, field: str) -> List[Dict]:
+        with self._access():
+            return self.records.search(Query()[field].exists())
+
+    def contains(self, field: str, value) -> bool:
+        with self._access():
+            return self.records.contains(where(field) == value)
+
+    def get(self, ids: List[int]) -> List[Dict]:
+        with self._access():
+            by_id = {record.doc_id: record for record in self.records.get(doc_ids=list(ids))} if ids else {}
+            return [by_id[doc_id] for doc_id in ids if doc_id in by_id]
+
+    def update(self, fields: Dict, field: str, value) -> int:
+        with self._access(write=True):
+            previous = self.find(field, value)
+            updated = self.records.update(fields, doc_ids=[record.doc_id for record in previous])
+            if 'keywords' in fields:
+                self.keyword_index.replace(previous, self.records.get(doc_ids=updated))
+            return len(updated)
+
+    def remove(self, field: str, value) -> int:
+        with self._access(write=True):
+            removed = self.find(field, value)
+            self.records.remove(doc_ids=[record.doc_id for record in removed])
+            self.keyword_index.remove(removed)
+            return len(removed)
+
+    def delete(self, ids: List[int]) -> int:
+        with self._access(write=True):
+            removed = self.get(ids)
+            self.records.remove(doc_ids=[record.doc_id for record in removed])
+            self.keyword_index.remove(removed)
+            return len(removed)
+
+    def truncate(self):
+        with self._access(write=True):
+            self.records.truncate()
+            self.keyword_index.clear()
+
+    def _raw(self) -> Dict[str, Dict]:
+        """The stored documents by id string, without copying them"""
+        return (self.db.storage.read() or {}).get(self.name, {})
+
+    def count(self, field: Optional[str] = None, value=None) -> int:
+        with self._access():
+            if field is None:
+                return len(self.records)
+            return sum(1 for document in self._raw().values() if document.get(field) == value)
+
+    def last_id(self) -> int:
+        with self._access():
+            return max(map(int, self._raw()), default=0)
+
+    def page(self, limit: Optional[int] = None, offset: int = 0, cursor: Optional[int] = None,
+             newest_first: bool = False, fields: Optional[Iterable[str]] = None,
+             field: Optional[str] = None, value=None) -> List[Dict]:
+        with self._access():
+            raw = self._raw()
+            ids = sorted((int(doc_id) for doc_id in raw), reverse=newest_first)
+            if cursor is not None:
+                ids = [doc_id for doc_id in ids if (doc_id < cursor if newest_first else doc_id > cursor)]
+            if field is not None:
+                ids = (doc_id for doc_id in ids if raw[str(doc_id)].get(field) == value)
+            selected = islice(ids, offset, None if limit is None else offset + limit)
+            return [project(raw[str(doc_id)], doc_id, fields) for doc_id in selected]
+
+    def lookup_keywords(self, keywords: Iterable[str], limit: Optional[int] = None) -> List[Tuple[int, int]]:
+        with self._access():
+            return self.keyword_index.lookup(keywords, limit)
+
+    def record_id(self, record: Dict) -> int:
+        return record.doc_id
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+class SQLiteStorage(MemoryStorage):
+    def __init__(self, path: str = "memory.db", table: Optional[str] = None,
+                 conn: Optional[sqlite3.Connection] = None, lock: Optional[threading.RLock] = None):
+        """
+        SQLite storage in WAL mode, type/hash/file_name are indexed columns and keywords have their own table
+        Several processes can read and write the file at once, a writer waits up to MEMORY_BUSY_TIMEOUT_SEC
+        for the others to commit.
+        Args:
+            path (str): The database file
+            table (Optional[str]): The table, defaults to records
+            conn (Optional[sqlite3.Connection]): An open connection to the file, shared by its tables
+            lock (Optional[threading.RLock]): The lock guarding the shared connection
+        """
+        self.path = path
+        self.name = table or "records"
+        if not _TABLE_NAME.match(self.name):
+            raise ValueError(f"Invalid table name {self.name}")
+        self.keywords_table = "record_keywords" if self.name == "records" else f"{self.name}_keywords"
+        self.lock = lock or threading.RLock()
+        if conn is None:
+            conn = sqlite3.connect(path, timeout=MEMORY_BUSY_TIMEOUT_SEC, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute(f"PRAGMA busy_timeout={int(MEMORY_BUSY_TIMEOUT_SEC * 1000)}")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+        self.conn = conn
+        with self.lock:
+            self._upgrade_autoincrement()
+            self.conn.executescript(f"""
+                {self._create_table(self.name)};
+                CREATE INDEX IF NOT EXISTS idx_{self.name}_type ON {self.name}(type);
+                CREATE INDEX IF NOT EXISTS idx_{self.name}_hash ON {self.name}(hash);
+                CREATE INDEX IF NOT EXISTS idx_{self.name}_file_name ON {self.name}(file_name);
+                CREATE TABLE IF NOT EXISTS {self.keywords_table} (
+                    keyword TEXT NOT NULL,
+                    record_id INTEGER NOT NULL REFERENCES {self.name}(id) ON DELETE CASCADE,
+                    PRIMARY KEY (keyword, record_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_{self.keywords_table}_record ON {self.keywords_table}(record_id);
+            """)
+
+    @staticmethod
+    def _create_table(name: str) -> str:
+        # AUTOINCREMENT never reuses the id of a removed record, other processes tell changes apart by the last id
+        return f"""CREATE TABLE IF NOT EXISTS {name} (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    type TEXT,
+                    hash TEXT,
+                    file_name TEXT,
+                    data TEXT NOT NULL
+                )"""
+
+    def _upgrade_autoincrement(self):
+        """Copy a table created before ids were AUTOINCREMENT into one that is, the caller holds the lock"""
+        if self.conn.in_transaction:
+            return
+        # dropping the old table must not cascade to the keywords, foreign keys are only toggled outside a transaction
+        self.conn.execute("PRAGMA foreign_keys=OFF")
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                        (self.name,)).fetchone()
+                if row is not None and "AUTOINCREMENT" not in row[0].upper():
+                    upgraded = f"{self.name}_autoincrement"
+                    self.conn.execute(self._create_table(upgraded))
+                    self.conn.execute(f"INSERT INTO {upgraded} (id, type, hash, file_name, data) "
+                                      f"SELECT id, type, hash, file_name, data FROM {self.name}")
+                    self.conn.execute(f"DROP TABLE {self.name}")
+                    self.conn.execute(f"ALTER TABLE {upgraded} RENAME TO {self.name}")
+                    print(f"upgraded {self.name} ids to AUTOINCREMENT")
+            except BaseException:
+                self.conn.rollback()
+                raise
+            self.conn.commit()
+        finally:
+            self.conn.execute("PRAGMA foreign_keys=ON")
+
+    def table(self, name: str) -> "SQLiteStorage":
+        return SQLiteStorage(self.path, name, self.conn, self.lock)
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            # the tables share the connection, a transaction open on it is joined and committed by its owner
+            if self.conn.in_transaction:
+                yield
+                return
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self.conn.rollback()
+                raise
+            self.conn.commit()
+
+    @staticmethod
+    def _record(row: sqlite3.Row) -> Dict:
+        record = json.loads(row["data"])
+        record["_id"] = row["id"]
+        return record
+
+    @staticmethod
+    def _where(field: str) -> str:
+        if field in INDEXED_FIELDS:
+            return f"{field} = ?"
+        return "json_extract(data, ?) = ?"
+
+    @staticmethod
+    def _params(field: str, value) -> Tuple:
+        if field in INDEXED_FIELDS:
+            return (value,)
+        return (f"$.{field}", value)
+
+    def _select(self, sql: str, params: Tuple = ()) -> List[Dict]:
+        with self.lock:
+            return [self._record(row) for row in self.conn.execute(sql, params)]
+
+    def _write(self, record_id: Optional[int], record: Dict) -> int:
+        """Insert or replace one record and its keywords, the caller holds the lock and a transaction"""
+        record = {key: value for key, value in record.items() if key != "_id"}
+        columns = tuple(record.get(field) if isinstance(record.get(field), (str, int, float)) else None
+                        for field in INDEXED_FIELDS)
+        cursor = self.conn.execute(
+            f"INSERT OR REPLACE INTO {self.name} (id, type, hash, file_name, data) VALUES (?, ?, ?, ?, ?)",
+            (record_id, *columns, json.dumps(record)),
+        )
+        record_id = cursor.lastrowid if record_id is None else record_id
+        self.conn.execute(f"DELETE FROM {self.keywords_table} WHERE record_id = ?", (record_id,))
+        self.conn.executemany(
+            f"INSERT OR IGNORE INTO {self.keywords_table} (keyword, record_id) VALUES (?, ?)",
+            [(keyword, record_id) for keyword in normalize_keywords(record.get("keywords") or [])],
+        )
+        return record_id
+
+    def insert(self, record: Dict, record_id: Optional[int] = None) -> int:
+        with self.transaction():
+            return self._write(record_id, record)
+
+    def insert_many(self, records: Iterable[Dict]) -> int:
+        return self.insert_with_ids((None, record) for record in records)
+
+    def insert_with_ids(self, records: Iterable[Tuple[Optional[int], Dict]]) -> int:
+        """
+        Insert (id, record) pairs in one transaction
+        Returns:
+            int: Number of records inserted
+        """
+        count = 0
+        with self.transaction():
+            for record_id, record in records:
+                self._write(record_id, record)
+                count += 1
+        return count
+
+    def all(self) -> List[Dict]:
+        return self._select(f"SELECT id, data FROM {self.name} ORDER BY id")
+
+    def find(self, field: str, value) -> List[Dict]:
+        return self._select(f"SELECT id, data FROM {self.name} WHERE {self._where(field)} ORDER BY id",
+                            self._params(field, value))
+
+    def find_existing(self, field: str) -> List[Dict]:
+        if field in INDEXED_FIELDS:
+            return self._select(f"SELECT id, data FROM {self.name} WHERE {field} IS NOT NULL ORDER BY id")
+        return self._select(f"SELECT id, data FROM {self.name} WHERE json_type(data, ?) IS NOT NULL ORDER BY id",
+                            (f"$.{field}",))
+
+    def contains(self, field: str, value) -> bool:
+        with self.lock:
+            row = self.conn.execute(f"SELECT 1 FROM {self.name} WHERE {self._where(field)} LIMIT 1",
+                                    self._params(field, value)).fetchone()
+        return row is not None
+
+    def get(self, ids: List[int]) -> List[Dict]:
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(ids))
+        by_id = {record["_id"]: record
+                 for record in self._select(f"SELECT id, data FROM {self.name} WHERE id IN ({placeholders})", tuple(ids))}
+        return [by_id[record_id] for record_id in ids if record_id in by_id]
+
+    def update(self, fields: Dict, field: str, value) -> int:
+        with self.transaction():
+            records = self.find(field, value)
+            for record in records:
+                self._write(record["_id"], {**record, **fields})
+        return len(records)
+
+    def remove(self, field: str, value) -> int:
+        with self.transaction():
+            cursor = self.conn.execute(f"DELETE FROM {self.name} WHERE {self._where(field)}", self._params(field, value))
+        return cursor.rowcount
+
+    def delete(self, ids: List[int]) -> int:
+        if not ids:
+            return 0
+        placeholders = ",".join("?" * len(ids))
+        with self.transaction():
+            cursor = self.conn.execute(f"DELETE FROM {self.name} WHERE id IN ({placeholders})", tuple(ids))
+        return cursor.rowcount
+
+    def truncate(self):
+        with self.transaction():
+            self.conn.execute(f"DELETE FROM {self.name}")
+
+    def count(self, field: Optional[str] = None, value=None) -> int:
+        with self.lock:
+            if field is None:
+                return self.conn.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()[0]
+            return self.conn.execute(f"SELECT COUNT(*) FROM {self.name} WHERE {self._where(field)}",
+                                     self._params(field, value)).fetchone()[0]
+
+    def page(self, limit: Optional[int] = None, offset: int = 0, cursor: Optional[int] = None,
+             newest_first: bool = False, fields: Optional[Iterable[str]] = None,
+             field: Optional[str] = None, value=None) -> List[Dict]:
+        conditions, params = [], ()
+        if field is not None:
+            conditions.append(self._where(field))
+            params += self._params(field, value)
+        if cursor is not None:
+            conditions.append("id < ?" if newest_first else "id > ?")
+            params += (cursor,)
+        sql = f"SELECT id, data FROM {self.name}"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY id {'DESC' if newest_first else 'ASC'} LIMIT ? OFFSET ?"
+        params += (-1 if limit is None else limit, offset)
+        return [project(record, record["_id"], fields) for record in self._select(sql, params)]
+
+    def lookup_keywords(self, keywords: Iterable[str], limit: Optional[int] = None) -> List[Tuple[int, int]]:
+        normalized = sorted(normalize_keywords(keywords))
+        if not normalized:
+            return []
+        placeholders = ",".join("?" * len(normalized))
+        sql = (f"SELECT record_id, COUNT(*) AS matches FROM {self.keywords_table} WHERE keyword IN ({placeholders}) "
+               "GROUP BY record_id ORDER BY matches DESC, record_id")
+        params: Tuple = tuple(normalized)
+        if limit:
+            sql += " LIMIT ?"
+            params += (limit,)
+        with self.lock:
+            return [(row["record_id"], row["matches"]) for row in self.conn.execute(sql, params)]
+
+    def record_id(self, record: Dict) -> int:
+        return record["_id"]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def migrate_tinydb_to_sqlite(json_path: str, sqlite_path: str) -> int:
+    """
+    Copy the tables of a TinyDB json file into a SQLite storage, record ids are kept
+    Args:
+        json_path (str): The db.json file
+        sqlite_path (str): The sqlite database file
+    Returns:
+        int: Number of records migrated
+    """
+    source = TinyDB(json_path)
+    try:
+        tables = {name: [(document.doc_id, dict(document)) for document in source.table(name).all()]
+                  for name in source.tables() if not name.endswith("keyword_index")}
+        default_table = source.default_table_name
+    finally:
+        source.close()
+    target = SQLiteStorage(sqlite_path)
+    try:
+        return sum(target.table("records" if name == default_table else name).insert_with_ids(records)
+                   for name, records in tables.items())
+    finally:
+        target.close()
+
+
+def open_memory_storage(backend: Optional[str] = None, path: Optional[str] = None) -> MemoryStorage:
+    """
+    Open the configured memory storage
+    A new sqlite database is filled from db.json once, if that file exists.
+    Args:
+        backend (Optional[str]): "tinydb" or "sqlite", defaults to MEMORY_BACKEND
+        path (Optional[str]): The database file, defaults to MEMORY_DB_PATH or the backend default
+    Returns:
+        MemoryStorage: The storage
+    """
+    backend = (backend or MEMORY_BACKEND).lower()
+    if backend not in DEFAULT_PATHS:
+        raise ValueError(f"Unknown MEMORY_BACKEND {backend}, use one of {', '.join(DEFAULT_PATHS)}")
+    path = path or MEMORY_DB_PATH or DEFAULT_PATHS[backend]
+    if backend == "tinydb":
+        return TinyDBStorage(path)
+    if not os.path.exists(path) and os.path.exists(DEFAULT_PATHS["tinydb"]):
+        migrated = migrate_tinydb_to_sqlite(DEFAULT_PATHS["tinydb"], path)
+        print(f"migrated {migrated} records from {DEFAULT_PATHS['tinydb']} to {path}")
+    return SQLiteStorage(path)
@@ -0,0 +1,350 @@
+import os
+import re
+import zlib
+import atexit
+import threading
+
+from typing import List, Dict, Tuple, Iterable, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from knowledge_search_utils import tokenize
+
+load_dotenv()
+
+# memory vectors are derived from the memory table, this file only saves re-embedding at start
+MEMORY_VECTOR_FILE = os.getenv("MEMORY_VECTOR_FILE", "memory_vectors.npz")
+# inverted file lists for large stores, 0 searches all vectors (exact)
+MEMORY_VECTOR_IVF_LISTS = int(os.getenv("MEMORY_VECTOR_IVF_LISTS", 0))
+# lists scanned per query when the ivf is on
+MEMORY_VECTOR_NPROBE = 8
+VECTOR_DIM = 256
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _features(text: str) -> List[str]:
+    """Stemmed words, word bigrams and character trigrams of the words"""
+    stems = tokenize(text)
+    features = stems + [f"{a} {b}" for a, b in zip(stems, stems[1:])]
+    for word in _WORD.findall(text.lower()):
+        padded = f"#{word}#"
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return features
+
+
+def embed(text: str, dim: int = VECTOR_DIM) -> np.ndarray:
+    """
+    Hashed n-gram embedding, similar wording gives close vectors without a model or network call
+    Args:
+        text (str): The text
+        dim (int): Vector size
+    Returns:
+        np.ndarray: L2 normalized float32 vector (zeros for empty text)
+    """
+    hashes = np.fromiter((zlib.crc32(feature.encode()) for feature in _features(text or "")), dtype=np.uint32)
+    vector = np.zeros(dim, dtype=np.float32)
+    if len(hashes):
+        # the top bit picks the sign so colliding features cancel out instead of piling up
+        signs = np.where(hashes >> 31, 1.0, -1.0).astype(np.float32)
+        np.add.at(vector, hashes % dim, signs)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+    return vector
+
+
+def memory_text(record: Dict) -> str:
+    """
+    Returns:
+        str: The text of a memory that is embedded
+    """
+    content = record.get('content')
+    return content if isinstance(content, str) else " ".join(f"{key} {value}" for key, value in record.items()
+                                                            if key not in ("_id", "type"))
+
+
+class VectorIndex:
+    def __init__(self, dim: int = VECTOR_DIM, ivf_lists: int = MEMORY_VECTOR_IVF_LISTS,
+                 nprobe: int = MEMORY_VECTOR_NPROBE):
+        """
+        Cosine similarity over a numpy matrix, brute force matmul or an inverted file (IVF) of k-means lists
+        Args:
+            dim (int): Vector size
+            ivf_lists (int): Number of k-means lists, 0 keeps the search exact
+            nprobe (int): Lists scanned per query
+        """
+        self.dim = dim
+        self.ivf_lists = ivf_lists
+        self.nprobe = nprobe
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.size = 0
+        # record id -> row, removed rows keep id -1 until compaction
+        self.rows: Dict[int, int] = {}
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.trained_size = 0
+        self._lists: Optional[List[np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _grow(self, extra: int):
+        needed = self.size + extra
+        if needed <= len(self.vectors):
+            return
+        capacity = max(needed, 2 * len(self.vectors), 1024)
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[:self.size] = self.vectors[:self.size]
+        ids = np.full(capacity, -1, dtype=np.int64)
+        ids[:self.size] = self.ids[:self.size]
+        assignments = np.zeros(capacity, dtype=np.int32)
+        assignments[:self.size] = self.assignments[:self.size]
+        self.vectors, self.ids, self.assignments = vectors, ids, assignments
+
+    def add_vectors(self, ids: Iterable[int], vectors: np.ndarray):
+        """Add (or replace) vectors by record id"""
+        ids = list(ids)
+        self.remove([record_id for record_id in ids if record_id in self.rows])
+        self._grow(len(ids))
+        rows = np.arange(self.size, self.size + len(ids))
+        self.vectors[rows] = vectors
+        self.ids[rows] = ids
+        self.rows.update(zip(ids, rows.tolist()))
+        self.size += len(ids)
+        if self.centroids is not None:
+            self.assignments[rows] = np.argmax(vectors @ self.centroids.T, axis=1) if len(ids) else []
+            self._lists = None
+        self._maybe_train()
+
+    def add(self, records: Iterable[Tuple[int, str]]):
+        """
+        Embed and add (record id, text) pairs
+        """
+        records = list(records)
+        if records:
+            self.add_vectors([record_id for record_id, _ in records],
+                             np.stack([embed(text, self.dim) for _, text in records]))
+
+    def remove(self, ids: Iterable[int]):
+        """Drop vectors by record id"""
+        for record_id in ids:
+            row = self.rows.pop(record_id, None)
+            if row is not None:
+                self.ids[row] = -1
+                self.vectors[row] = 0
+        if self.size > 1024 and len(self.rows) < self.size * 0.75:
+            self._compact()
+
+    def _compact(self):
+        live = np.flatnonzero(self.ids[:self.size] >= 0)
+        self.vectors = self.vectors[live].copy()
+        self.ids = self.ids[live].copy()
+        self.assignments = self.assignments[live].copy()
+        self.size = len(live)
+        self.rows = {int(record_id): row for row, record_id in enumerate(self.ids.tolist())}
+        self._lists = None
+
+    def _maybe_train(self):
+        """(Re)train the k-means lists when the ivf is on and the index doubled since the last training"""
+        if self.ivf_lists and len(self.rows) >= self.ivf_lists * 39 and len(self.rows) >= 2 * self.trained_size:
+            self.train()
+
+    def train(self, iterations: int = 8, sample: int = 50000):
+        """
+        Spherical k-means over a sample of the vectors, every vector is then assigned to its closest list
+        Args:
+            iterations (int): K-means iterations
+            sample (int): Max vectors used to fit the centroids
+        """
+        live = np.flatnonzero(self.ids[:self.size] >= 0)
+        lists = min(self.ivf_lists, len(live))
+        if not lists:
+            return
+        rng = np.random.default_rng(0)
+        fit = self.vectors[rng.choice(live, min(sample, len(live)), replace=False)]
+        centroids = fit[rng.choice(len(fit), lists, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(fit @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, fit)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # an empty list keeps its previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-9), centroids)
+        self.centroids = centroids.astype(np.float32)
+        for start in range(0, self.size, 65536):
+            block = self.vectors[start:start + 65536]
+            self.assignments[start:start + len(block)] = np.argmax(block @ self.centroids.T, axis=1)
+        self.trained_size = len(live)
+        self._lists = None
+
+    def _candidates(self, query: np.ndarray) -> np.ndarray:
+        """Rows to score: all of them, or the members of the nprobe closest lists"""
+        if self.centroids is None:
+            return None
+        if self._lists is None:
+            order = np.argsort(self.assignments[:self.size], kind="stable")
+            bounds = np.searchsorted(self.assignments[:self.size][order], np.arange(len(self.centroids) + 1))
+            self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self._lists[probe] for probe in probes])
+
+    def search_vector(self, query: np.ndarray, k: int = 5) -> List[Tuple[int, float]]:
+        """
+        Args:
+            query (np.ndarray): A normalized query vector
+            k (int): Max results
+        Returns:
+            List[Tuple[int, float]]: (record id, cosine similarity), best first
+        """
+        if not self.rows:
+            return []
+        rows = self._candidates(query)
+        scores = self.vectors[:self.size] @ query if rows is None else self.vectors[rows] @ query
+        if rows is None:
+            rows = np.arange(self.size)
+        valid = (self.ids[rows] >= 0) & (scores > 0)
+        rows, scores = rows[valid], scores[valid]
+        if len(rows) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return [(int(self.ids[rows[i]]), float(scores[i])) for i in order]
+
+    def search(self, text: str, k: int = 5) -> List[Tuple[int, float]]:
+        """
+        Args:
+            text (str): The query text
+            k (int): Max results
+        Returns:
+            List[Tuple[int, float]]: (record id, cosine similarity), best first
+        """
+        return self.search_vector(embed(text, self.dim), k)
+
+    def save(self, path: str):
+        """Write the live vectors (temp file, then rename)"""
+        live = np.flatnonzero(self.ids[:self.size] >= 0)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, ids=self.ids[live], vectors=self.vectors[live])
+        os.replace(tmp_path, path)
+
+    def load(self, path: str):
+        """Replace the vectors with the saved ones"""
+        with np.load(path, allow_pickle=False) as archive:
+            ids, vectors = archive["ids"], archive["vectors"]
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"saved vectors have another dimension than {self.dim}")
+        self.__init__(self.dim, self.ivf_lists, self.nprobe)
+        self.add_vectors(ids.tolist(), vectors)
+
+
+class MemoryVectors:
+    def __init__(self, memories, path: Optional[str] = None, dim: int = VECTOR_DIM,
+                 ivf_lists: int = MEMORY_VECTOR_IVF_LISTS):
+        """
+        Vector index of the memory table, kept in sync by MemoryRetention
+        Saved vectors are loaded at start, only memories added since are embedded. The vectors are saved at exit.
+        Memories written or removed by other processes are synced when the memory count or the last memory id
+        (the watermark, ids are never reused) changed since the last sync.
+        Args:
+            memories (MemoryStorage): The memories table
+            path (Optional[str]): The vector file, defaults to MEMORY_VECTOR_FILE
+            dim (int): Vector size
+            ivf_lists (int): Number of IVF lists, 0 keeps the search exact
+        """
+        self.memories = memories
+        self.path = path or MEMORY_VECTOR_FILE
+        self.index = VectorIndex(dim, ivf_lists)
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.dirty = False
+        # (memory count, last memory id) at the last sync
+        self.watermark = (0, 0)
+        atexit.register(self.save)
+
+    def _ensure(self):
+        """Load the saved vectors and embed the memories they do not cover, the caller holds the lock"""
+        if self.loaded:
+            return
+        try:
+            if os.path.exists(self.path):
+                self.index.load(self.path)
+        except Exception as e:
+            print(f"Error loading memory vectors: {str(e)}")
+        self._sync(self.memories.all())
+        self.loaded = True
+
+    def _mark(self) -> Tuple[int, int]:
+        return self.memories.count(), self.memories.last_id()
+
+    def _sync(self, records: List[Dict]):
+        current = {self.memories.record_id(record): record for record in records}
+        self.watermark = (len(current), max(current, default=0))
+        stale = [record_id for record_id in self.index.rows if record_id not in current]
+        missing = [(record_id, memory_text(record)) for record_id, record in current.items()
+                   if record_id not in self.index.rows]
+        self.index.remove(stale)
+        self.index.add(missing)
+        if stale or missing:
+            print(f"memory vectors: embedded {len(missing)}, dropped {len(stale)}")
+            self.dirty = True
+
+    def add(self, record_id: int, record: Dict):
+        """Embed a new memory"""
+        with self.lock:
+            if self.loaded:
+                self.index.add([(record_id, memory_text(record))])
+                self.watermark = (self.watermark[0] + 1, max(self.watermark[1], record_id))
+                self.dirty = True
+
+    def update(self, records: List[Dict]):
+        """Re-embed memories that were updated, the count and the last id are unchanged"""
+        with self.lock:
+            if self.loaded and records:
+                ids = [self.memories.record_id(record) for record in records]
+                self.index.remove(ids)
+                self.index.add([(record_id, memory_text(record)) for record_id, record in zip(ids, records)])
+                self.dirty = True
+
+    def remove(self, ids: List[int]):
+        """Drop memories that were removed"""
+        with self.lock:
+            if not self.loaded:
+                return
+            removed = [record_id for record_id in set(ids) if record_id in self.index.rows]
+            if not removed:
+                return
+            self.index.remove(removed)
+            count, last_id = self.watermark
+            if last_id in removed:
+                last_id = max(self.index.rows, default=0)
+            self.watermark = (count - len(removed), last_id)
+            self.dirty = True
+
+    def recall(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """
+        Args:
+            query (str): The query text
+            k (int): Max memories
+        Returns:
+            List[Tuple[int, float]]: (memory id, similarity), most similar first
+        """
+        with self.lock:
+            self._ensure()
+            if self._mark() != self.watermark:
+                self._sync(self.memories.all())
+            return self.index.search(query, k)
+
+    def save(self):
+        """Save the vectors if they changed"""
+        with self.lock:
+            if not self.dirty:
+                return
+            try:
+                self.index.save(self.path)
+                self.dirty = False
+            except Exception as e:
+                print(f"Error saving memory vectors: {str(e)}")
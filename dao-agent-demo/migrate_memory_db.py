@@ -0,0 +1,30 @@
+import os
+import argparse
+
+from memory_storage_utils import migrate_tinydb_to_sqlite
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy the TinyDB memory store (db.json) into a SQLite database.")
+    parser.add_argument(
+        '--db_path',
+        type=str,
+        default='db.json',
+        help="Path to the TinyDB database file (default: 'db.json')"
+    )
+    parser.add_argument(
+        '--sqlite_path',
+        type=str,
+        default='memory.db',
+        help="Path to the SQLite database file (default: 'memory.db')"
+    )
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db_path):
+        print(f"Error: {args.db_path} does not exist.")
+    elif os.path.exists(args.sqlite_path):
+        print(f"Error: {args.sqlite_path} already exists, remove it to migrate again.")
+    else:
+        migrated = migrate_tinydb_to_sqlite(args.db_path, args.sqlite_path)
+        print(f"Migrated {migrated} records from {args.db_path} to {args.sqlite_path}.")
+        print("Set MEMORY_BACKEND=sqlite to use it.")
@@ -0,0 +1,78 @@
+import os
+import json
+import time
+import argparse
+import hashlib
+
+from datetime import datetime
+
+import requests
+from dotenv import load_dotenv
+
+from farcaster_webhook_utils import sign_payload, SIGNATURE_HEADER
+
+load_dotenv()
+
+
+def synthetic_events(count: int, agent_fid: int) -> list:
+    """
+    Build cast.created events that alternately mention and reply to the agent
+    """
+    events = []
+    for i in range(count):
+        fid = agent_fid + 1 + i % 5
+        cast = {
+            "object": "cast",
+            "hash": "0x" + hashlib.sha1(f"replay {i} {time.time()}".encode()).hexdigest()[:40],
+            "parent_hash": None,
+            "parent_author": {"fid": agent_fid if i % 2 else None},
+            "author": {"fid": fid, "username": f"user{fid}", "verified_addresses": {"eth_addresses": []}},
+            "text": f"replayed event {i} for the agent",
+            "timestamp": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z",
+            "mentioned_profiles": [] if i % 2 else [{"fid": agent_fid}],
+        }
+        events.append({"created_at": int(time.time()), "type": "cast.created", "data": cast})
+    return events
+
+
+def replay_events(url: str, secret: str, events: list, interval: float = 0, bad_signature: bool = False):
+    """
+    Sign and post webhook events to a local receiver
+    """
+    session = requests.Session()
+    for event in events:
+        body = json.dumps(event).encode()
+        signature = "0" * 128 if bad_signature else sign_payload(body, secret)
+        start = time.perf_counter()
+        response = session.post(url, data=body, headers={SIGNATURE_HEADER: signature,
+                                                         "Content-Type": "application/json"}, timeout=5)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"{event['data'].get('hash')}: {response.status_code} in {elapsed_ms:.1f} ms")
+        if interval:
+            time.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay neynar webhook events against the local receiver.")
+    parser.add_argument('--url', type=str, default=f"http://127.0.0.1:{os.getenv('WEBHOOK_PORT', '8788')}/",
+                        help="Webhook receiver url (default: http://127.0.0.1:$WEBHOOK_PORT/)")
+    parser.add_argument('--events', type=str, default=None,
+                        help="JSON file with a list of recorded webhook events (default: synthetic events)")
+    parser.add_argument('--count', type=int, default=5, help="Number of synthetic events (default: 5)")
+    parser.add_argument('--agent_fid', type=int, default=int(os.getenv("FARCASTER_FID") or 1),
+                        help="Fid mentioned by synthetic events (default: FARCASTER_FID)")
+    parser.add_argument('--interval', type=float, default=0, help="Seconds between events (default: 0)")
+    parser.add_argument('--bad_signature', action='store_true', help="Send invalid signatures")
+    args = parser.parse_args()
+
+    secret = os.getenv("NAYNAR_WEBHOOK_SECRET")
+    if not secret:
+        raise ValueError("NAYNAR_WEBHOOK_SECRET must be set in the .env file")
+
+    if args.events:
+        with open(args.events, "r") as events_file:
+            events = json.load(events_file)
+    else:
+        events = synthetic_events(args.count, args.agent_fid)
+
+    replay_events(args.url, secret, events, args.interval, args.bad_signature)
@@ -1,3 +1,4 @@
+import os
 import time
 import json
 import random
@@ -6,7 +7,8 @@ import logging
 
 from swarm import Swarm
 from swarm.repl import run_demo_loop
-from agents import dao_agent, check_recent_cast_notifications
+from agents import dao_agent, has_recent_cast_notifications, farcaster_bot, thread_context
+from farcaster_webhook_utils import NotificationWebhook
 from openai import OpenAI
 
 from prompt_helpers import set_character_file, get_character_json, get_instructions
@@ -16,6 +18,10 @@ from interval_utils import get_interval, set_random_interval
 lower_interval = 60
 upper_interval = 120
 
+# with the webhook receiver running, polling is only a fallback
+webhook_lower_interval = 600
+webhook_upper_interval = 900
+
 # Configure logging
 logging.basicConfig(
     filename="streaming_response.log",
@@ -23,6 +29,20 @@ logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(message)s",
 )
 
+def start_notification_webhook():
+    """Start the neynar webhook receiver if NAYNAR_WEBHOOK_SECRET is set"""
+    if not os.getenv("NAYNAR_WEBHOOK_SECRET"):
+        return None
+    def on_notification(notification):
+        farcaster_bot.add_pending_notification(notification)
+        # start fetching the thread while the agent loop wakes up
+        thread_context.prefetch(notification)
+
+    webhook = NotificationWebhook(on_notification=on_notification)
+    webhook.start()
+    return webhook
+
+
 # this is the main loop that runs the agent in autonomous mode
 # you can modify this to change the behavior of the agent
 def run_autonomous_loop(agent):
@@ -31,6 +51,8 @@ def run_autonomous_loop(agent):
 
     print("Starting autonomous DAO Agent loop...")
     character_json = get_character_json()
+    webhook = start_notification_webhook()
+    woken_by_webhook = False
 
     while True:
         # Generate a thought
@@ -41,7 +63,8 @@ def run_autonomous_loop(agent):
         )[0]
         thought = f"{character_json['pre_autonomous_thought']} {thought} {character_json['post_autonomous_thought']}"
 
-        if check_recent_cast_notifications():
+        # a webhook wake already put the notification in the pending list, no need to poll
+        if has_recent_cast_notifications(fetch=not woken_by_webhook):
             messages.append({"role": "user", "content": thought})
 
             print(f"\n\033[90mAgent's Thought:\033[0m {thought}")
@@ -58,6 +81,13 @@ def run_autonomous_loop(agent):
         else:
             print("\n\033[90mNo new cast notifications found...\033[0m")
 
+        if webhook:
+            # wait for a webhook notification, poll as a fallback when none arrives
+            set_random_interval(webhook_lower_interval, webhook_upper_interval)
+            print(f"\n\033[90mWaiting for notifications, polling in {get_interval()} seconds...\033[0m")
+            woken_by_webhook = webhook.wait(get_interval()) is not None
+            continue
+
         # Set a random interval between 600 and 3600 seconds
         set_random_interval(lower_interval, upper_interval)
 
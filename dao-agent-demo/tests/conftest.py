@@ -0,0 +1,77 @@
+import os
+import sys
+import json
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# the agent modules import each other by their flat names, as when run from dao-agent-demo
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_neynar_server import start_fake_neynar_server  # noqa: E402
+
+AGENT_FID = 1
+
+
+@pytest.fixture
+def agent_env(tmp_path, monkeypatch):
+    """Run in a temp directory (state, queue and log files land there) with the agent's farcaster settings"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("FARCASTER_FID", str(AGENT_FID))
+    monkeypatch.setenv("NAYNAR_SIGNER_UUID", "test-signer")
+    monkeypatch.setenv("NAYNAR_API_KEY", "test-key")
+    monkeypatch.delenv("FARCASTER_CHANNEL_ID", raising=False)
+    return tmp_path
+
+
+@pytest.fixture
+def fake_neynar(agent_env):
+    """Start fake neynar servers, `fake_neynar(**knobs)` returns (server, v2 api url)"""
+    servers = []
+
+    def start(**knobs):
+        server, url = start_fake_neynar_server(**knobs)
+        servers.append(server)
+        return server, url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class _GraphHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+        self.server.requests.append(request)
+        data = json.dumps(self.server.resolve(request["query"], request.get("variables") or {})).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def fake_graph():
+    """Start fake subgraph endpoints, `fake_graph(resolve)` answers every query with resolve(query, variables)"""
+    servers = []
+
+    def start(resolve):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _GraphHandler)
+        server.daemon_threads = True
+        server.resolve = resolve
+        server.requests = []
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
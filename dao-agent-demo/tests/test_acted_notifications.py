@@ -0,0 +1,49 @@
+from acted_notifications_utils import ActedNotifications
+
+
+def open_log(tmp_path) -> ActedNotifications:
+    return ActedNotifications(str(tmp_path / "acted.log"))
+
+
+def test_add_is_test_and_set_across_instances(tmp_path):
+    first, second = open_log(tmp_path), open_log(tmp_path)
+    assert first.add("0xa")
+    assert not first.add("0xa")
+    # the second instance reads the line the first appended before its own change
+    assert not second.add("0xa")
+    assert second.is_acted("0xa")
+
+
+def test_add_survives_reopen(tmp_path):
+    open_log(tmp_path).add("0xa")
+    assert "0xa" in open_log(tmp_path)
+
+
+def test_claim_blocks_other_owners_until_released(tmp_path):
+    first, second = open_log(tmp_path), open_log(tmp_path)
+    assert first.claim("0xa")
+    assert not second.claim("0xa")
+    assert not second.add("0xa")
+    assert second.is_claimed("0xa")
+    assert first.release("0xa")
+    assert second.claim("0xa")
+    assert second.add("0xa")
+    assert not first.claim("0xa")
+
+
+def test_expired_claim_can_be_taken_over(tmp_path):
+    first, second = open_log(tmp_path), open_log(tmp_path)
+    assert first.claim("0xa", lease=-1)
+    assert second.claim("0xa")
+
+
+def test_compaction_keeps_reading_the_lines_appended_after_it(tmp_path):
+    first, second = open_log(tmp_path), open_log(tmp_path)
+    first.add("0xa")
+    assert first.claim("0xb")
+    first.compact()
+    second.add("0xc")
+    # the compacting instance resumes after the rewritten log instead of rereading or skipping lines
+    assert not first.add("0xc")
+    assert first.holds("0xb")
+    assert [record["hash"] for record in open_log(tmp_path).all()] == ["0xa", "0xc"]
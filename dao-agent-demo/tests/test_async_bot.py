@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+from conftest import AGENT_FID
+from farcaster_async_utils import AsyncFarcasterBot, SyncFarcasterBot
+
+
+def run(url, scenario, **kwargs):
+    """Run `scenario(bot)` on a fresh async bot and close it"""
+    async def main():
+        bot = AsyncFarcasterBot(base_url=url, backoff=0.01, **kwargs)
+        try:
+            return await scenario(bot)
+        finally:
+            await bot.aclose()
+    return asyncio.run(main())
+
+
+def test_gathered_reads_run_concurrently(fake_neynar):
+    server, url = fake_neynar(latency_ms=100)
+
+    async def scenario(bot):
+        start = time.monotonic()
+        results = await bot.gather(*[bot.get_casts(str(fid), 5) for fid in range(2, 8)])
+        return results, time.monotonic() - start
+
+    results, elapsed = run(url, scenario)
+    assert [{cast["author"] for cast in casts} for casts in results] == [{f"user{fid}"} for fid in range(2, 8)]
+    # six requests of 100 ms each
+    assert elapsed < 0.4
+
+
+def test_async_gets_are_retried(fake_neynar):
+    server, url = fake_neynar(fail_every=2)
+
+    async def scenario(bot):
+        casts = [await bot.get_casts(limit=5) for _ in range(2)]
+        return casts, bot.get_latency_stats()["feed/user/casts"]
+
+    casts, stats = run(url, scenario)
+    assert [len(page) for page in casts] == [5, 5]
+    assert stats["retries"] == 1
+
+
+def test_mention_context_in_one_round_trip(fake_neynar):
+    server, url = fake_neynar()
+    context = run(url, lambda bot: bot.get_mention_context(AGENT_FID + 2, casts_limit=3))
+    assert len(context["notifications"]) == 40
+    assert len(context["author_casts"]) == 3
+    assert context["author"]["fid"] == AGENT_FID + 2
+    assert isinstance(context["replies"], list)
+
+
+def test_async_feed_iterators(fake_neynar):
+    server, url = fake_neynar()
+
+    async def scenario(bot):
+        return [cast async for cast in bot.iter_casts(str(AGENT_FID + 1), max_count=70)]
+
+    casts = run(url, scenario)
+    assert len(casts) == 60
+    assert len({cast["hash"] for cast in casts}) == 60
+
+
+def test_sync_wrapper_blocks_on_the_async_bot(fake_neynar):
+    server, url = fake_neynar()
+    bot = SyncFarcasterBot(base_url=url, backoff=0.01)
+    try:
+        assert len(bot.get_casts(limit=5)) == 5
+        assert bot.send_cast("from the sync wrapper")["hash"] == server.state.posted[0]["hash"]
+        assert len(list(bot.iter_casts(str(AGENT_FID + 1), max_count=10))) == 10
+        assert "feed/user/casts" in bot.get_latency_stats()
+    finally:
+        bot.close()
@@ -0,0 +1,88 @@
+from time import sleep, time
+
+from acted_notifications_utils import ActedNotifications
+from cast_queue_utils import CastQueue, CAST_SENT, CAST_FAILED
+from farcaster_utils import FarcasterBot
+from memory_retention_utils import MemoryRetention
+from memory_storage_utils import TinyDBStorage
+
+
+def wait_for(condition, timeout: float = 10) -> bool:
+    deadline = time() + timeout
+    while not condition():
+        if time() > deadline:
+            return False
+        sleep(0.02)
+    return True
+
+
+def open_queue(url, path="cast_queue.json", **kwargs) -> CastQueue:
+    return CastQueue(FarcasterBot(base_url=url, backoff=0.01), path=path, backoff=0.01, max_backoff=0.05, **kwargs)
+
+
+def open_retention(agent_env) -> MemoryRetention:
+    return MemoryRetention(TinyDBStorage(str(agent_env / "db.json")), ActedNotifications(str(agent_env / "acted.log")))
+
+
+def test_repeated_intent_is_posted_once(fake_neynar):
+    server, url = fake_neynar()
+    queue = open_queue(url)
+    first = queue.enqueue("gm", parent="0xparent")
+    again = queue.enqueue("gm", parent="0xparent")
+    assert queue.flush(10)
+    assert "already queued" in again and first.split("key ")[1] == again.split("key ")[1]
+    assert len(server.state.posted) == 1
+    assert "already queued and posted" in queue.enqueue("gm", parent="0xparent")
+    queue.stop()
+
+
+def test_replies_to_a_parent_keep_their_order(fake_neynar):
+    server, url = fake_neynar(fail_every=3)
+    queue = open_queue(url)
+    for i in range(5):
+        queue.enqueue(f"part {i}", parent="0xthread")
+    assert queue.flush(10)
+    assert [cast["text"] for cast in reversed(server.state.posted)] == [f"part {i}" for i in range(5)]
+    queue.stop()
+
+
+def test_queues_sharing_the_file_post_every_cast_once(fake_neynar):
+    server, url = fake_neynar(latency_ms=5)
+    queues = [open_queue(url) for _ in range(3)]
+    # within the write burst of every bot, so the test does not wait on the rate limiter
+    for i in range(12):
+        queues[i % 3].enqueue(f"shared {i}")
+    assert all(queue.flush(20) for queue in queues)
+    assert sorted(cast["text"] for cast in server.state.posted) == sorted(f"shared {i}" for i in range(12))
+    for queue in queues:
+        queue.stop()
+
+
+def test_failed_reply_releases_its_notification(fake_neynar, agent_env):
+    server, url = fake_neynar(fail_every=1)
+    retention = open_retention(agent_env)
+    assert retention.claim_notification("0xmention")
+    queue = open_queue(url, max_attempts=2, on_settle=retention.settle_notification)
+    queue.enqueue("reply", parent="0xmention", notification="0xmention")
+    assert queue.is_pending_reply("0xmention")
+    assert wait_for(lambda: not retention.holds_notification_claim("0xmention"))
+    assert queue.get_status()[0]["status"] == CAST_FAILED
+    assert not queue.is_answering("0xmention")
+    assert not retention.is_notification_acted("0xmention")
+    # another process may answer it now
+    assert ActedNotifications(str(agent_env / "acted.log")).claim("0xmention")
+    queue.stop()
+
+
+def test_sent_reply_marks_its_notification_acted(fake_neynar, agent_env):
+    server, url = fake_neynar(fail_every=2)
+    retention = open_retention(agent_env)
+    assert retention.claim_notification("0xmention")
+    queue = open_queue(url, on_settle=retention.settle_notification)
+    queue.enqueue("warm up")
+    assert queue.flush(10)
+    queue.enqueue("reply", parent="0xmention", notification="0xmention")
+    assert wait_for(lambda: retention.acted.is_acted("0xmention"))
+    assert queue.get_status()[0]["status"] == CAST_SENT
+    assert queue.is_answering("0xmention") and not queue.is_pending_reply("0xmention")
+    queue.stop()
@@ -0,0 +1,10 @@
+import signal
+
+import pytest
+
+from benchmark_memory_store import crash_check
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGKILL"), reason="kills the writer with SIGKILL")
+def test_killed_writer_leaves_consistent_db():
+    assert crash_check(rounds=2)
@@ -0,0 +1,112 @@
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+import dao_analytics_utils
+from dao_analytics_utils import DaoAnalytics
+
+
+def ts(month: int, day: int, hour: int = 0) -> int:
+    return int(datetime(2025, month, day, hour, tzinfo=timezone.utc).timestamp())
+
+
+PROPOSALS = [
+    # id, created, processed at, processed, passed, cancelled
+    ("p1", ts(1, 5), ts(1, 6), True, True, False),
+    ("p2", ts(1, 20), ts(1, 22), True, True, False),
+    ("p3", ts(2, 1), ts(2, 3), True, False, False),
+    ("p4", ts(2, 2), ts(2, 3), True, False, True),
+    ("p5", ts(2, 3), None, False, False, False),
+]
+
+VOTES = [
+    # id, created, voter, proposal, approved, shares
+    ("v1", ts(1, 10), "0xa", "p1", True, 1),
+    ("v2", ts(1, 10), "0xb", "p1", True, 2),
+    ("v3", ts(2, 5), "0xa", "p2", False, 1),
+    ("v4", ts(2, 6), "0xc", "p3", True, 3),
+    ("v5", ts(2, 6), "0xa", "p3", True, 1),
+]
+
+
+class FakeHistory:
+    def __init__(self):
+        self.proposals = [{"id": id, "proposalId": id[1:], "createdAt": str(created),
+                           "processTxAt": str(processed) if processed else None, "processed": is_processed,
+                           "passed": passed, "cancelled": cancelled, "yesVotes": "1", "noVotes": "0"}
+                          for id, created, processed, is_processed, passed, cancelled in PROPOSALS]
+        self.votes = [self.vote(*vote) for vote in VOTES]
+
+    @staticmethod
+    def vote(id, created, voter, proposal, approved, shares):
+        return {"id": id, "createdAt": str(created), "approved": approved, "balance": str(shares * 10**18),
+                "member": {"memberAddress": voter}, "proposal": {"proposalId": proposal[1:]}}
+
+    def resolve(self, query, variables):
+        first = variables["first"]
+        if "votes(" in query:
+            votes = [vote for vote in self.votes if int(vote["createdAt"]) >= int(variables["since"])]
+            votes.sort(key=lambda vote: int(vote["createdAt"]))
+            return {"data": {"votes": votes[variables["skip"]:variables["skip"] + first]}}
+        proposals = [proposal for proposal in self.proposals if proposal["id"] > variables["lastId"]]
+        return {"data": {"proposals": proposals[:first]}}
+
+
+@pytest.fixture
+def analytics(fake_graph, monkeypatch):
+    history = FakeHistory()
+    server, url = fake_graph(history.resolve)
+    monkeypatch.setattr(dao_analytics_utils, "GRAPH_URL", url)
+    # small pages so paging by id, by creation time and through one timestamp is exercised
+    monkeypatch.setattr(dao_analytics_utils, "PAGE_SIZE", 2)
+    analytics = DaoAnalytics(SimpleNamespace(dao_id="0xDAO"))
+    analytics.history, analytics.server = history, server
+    return analytics
+
+
+def test_pass_rate_and_time_to_pass(analytics):
+    analytics.refresh()
+    assert analytics.pass_rate() == {"proposals": 5, "processed": 3, "passed": 2, "cancelled": 1, "pass_rate": 0.667}
+    assert analytics.time_to_pass() == {"median_hours": 36.0, "mean_hours": 36.0, "p90_hours": 45.6}
+
+
+def test_votes_are_paged_without_duplicates(analytics):
+    analytics.refresh()
+    assert sorted(analytics.votes["id"]) == ["v1", "v2", "v3", "v4", "v5"]
+    assert analytics.participation() == {"votes": 5, "unique_voters": 3, "avg_votes_per_proposal": 1.0}
+    assert analytics.top_voters(3) == [
+        {"voter": "0xa", "votes": 3, "yes_share": 0.67, "total_weight": 3.0},
+        {"voter": "0xc", "votes": 1, "yes_share": 1.0, "total_weight": 3.0},
+        {"voter": "0xb", "votes": 1, "yes_share": 1.0, "total_weight": 2.0},
+    ]
+
+
+def test_turnout_trend_per_month(analytics):
+    analytics.refresh()
+    assert analytics.turnout_trend() == [
+        {"month": "2025-01", "proposals": 2, "votes": 2, "voters": 2, "votes_per_proposal": 1.0},
+        {"month": "2025-02", "proposals": 3, "votes": 3, "voters": 2, "votes_per_proposal": 1.0},
+    ]
+    assert [row["month"] for row in analytics.turnout_trend(months=1)] == ["2025-02"]
+
+
+def test_refresh_only_fetches_new_votes(analytics):
+    analytics.refresh()
+    analytics.history.votes.append(FakeHistory.vote("v6", ts(3, 1), "0xd", "p5", True, 1))
+    analytics.refresh()
+    assert len(analytics.votes) == 5
+    requests = len(analytics.server.requests)
+    analytics.refresh(force=True)
+    since = {request["variables"]["since"] for request in analytics.server.requests[requests:]
+             if "since" in request["variables"]}
+    assert min(int(value) for value in since) == ts(2, 6)
+    assert sorted(analytics.votes["id"]) == ["v1", "v2", "v3", "v4", "v5", "v6"]
+
+
+def test_summary_is_compact_json(analytics):
+    summary = json.loads(analytics.get_summary(top=1))
+    assert summary["dao"] == "0xdao"
+    assert summary["pass_rate"] == 0.667
+    assert summary["top_voters"][0]["voter"] == "0xa"
@@ -0,0 +1,57 @@
+import time
+
+from farcaster_utils import FarcasterBot
+
+
+def casts_stats(bot):
+    return bot.get_latency_stats()["feed/user/casts"]
+
+
+def test_gets_are_retried_on_server_errors(fake_neynar):
+    server, url = fake_neynar(fail_every=2)
+    bot = FarcasterBot(base_url=url, backoff=0.01)
+    for _ in range(3):
+        assert len(bot.get_casts(limit=5)) == 5
+    # requests 2 and 4 failed, each was retried once
+    assert server.failed == 2
+    assert casts_stats(bot)["retries"] == 2
+    assert casts_stats(bot)["errors"] == 2
+
+
+def test_gets_give_up_after_max_retries(fake_neynar):
+    server, url = fake_neynar(fail_every=1)
+    bot = FarcasterBot(base_url=url, backoff=0.01, max_retries=2)
+    assert bot.get_casts(limit=5).startswith("Error getting casts: 503")
+    assert server.requests == 3
+
+
+def test_retry_after_is_honoured_and_capped(fake_neynar):
+    server, url = fake_neynar(fail_every=2, retry_after=0.3)
+    bot = FarcasterBot(base_url=url, backoff=0.01)
+    bot.get_casts(limit=5)
+    start = time.monotonic()
+    assert len(bot.get_casts(limit=5)) == 5
+    assert time.monotonic() - start >= 0.3
+
+    capped = FarcasterBot(base_url=url, backoff=0.01, max_backoff=0.05)
+    capped.get_casts(limit=5)
+    start = time.monotonic()
+    assert len(capped.get_casts(limit=5)) == 5
+    assert time.monotonic() - start < 0.3
+
+
+def test_backoff_doubles_with_jitter(agent_env):
+    bot = FarcasterBot(base_url="http://127.0.0.1:9/", backoff=0.1, max_backoff=0.5)
+    for attempt, base in enumerate([0.1, 0.2, 0.4]):
+        delays = [bot._retry_delay(attempt, None) for _ in range(50)]
+        assert all(min(base * 0.5, 0.5) <= delay <= min(base * 1.5, 0.5) for delay in delays)
+    assert bot._retry_delay(10, None) == 0.5
+
+
+def test_posts_are_not_retried(fake_neynar):
+    server, url = fake_neynar(fail_every=1)
+    bot = FarcasterBot(base_url=url, backoff=0.01)
+    result = bot.send_cast("not retried")
+    assert result["status_code"] == 503 and result["hash"] is None
+    assert server.requests == 1
+    assert server.state.posted == []
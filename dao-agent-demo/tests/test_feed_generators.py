@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+from itertools import islice
+
+import farcaster_utils
+from conftest import AGENT_FID
+from farcaster_utils import FarcasterBot, feed_page, parse_cast
+
+USER_FID = str(AGENT_FID + 1)
+
+
+def feed_requests(bot, endpoint="feed/user/casts"):
+    return bot.get_latency_stats().get(endpoint, {}).get("count", 0)
+
+
+def test_feed_page_stops_at_since_and_remaining():
+    now = datetime.utcnow()
+    casts = [{"hash": f"0x{i}", "text": f"cast {i}", "author": {"username": "user2", "fid": 2},
+              "timestamp": (now - timedelta(minutes=i)).strftime(farcaster_utils.TIMESTAMP_FORMAT)}
+             for i in range(5)]
+    page = {"casts": casts, "next": {"cursor": "5"}}
+    assert feed_page(page, parse_cast, None, None)[1] == "5"
+    records, cursor = feed_page(page, parse_cast, now - timedelta(minutes=2, seconds=30), None)
+    assert [record["hash"] for record in records] == ["0x0", "0x1", "0x2"] and cursor is None
+    records, cursor = feed_page(page, parse_cast, None, 5)
+    assert len(records) == 5 and cursor is None
+
+
+def test_iter_casts_follows_the_cursor_lazily(fake_neynar, monkeypatch):
+    monkeypatch.setattr(farcaster_utils, "CASTS_PAGE_SIZE", 20)
+    server, url = fake_neynar()
+    bot = FarcasterBot(base_url=url, backoff=0.01)
+    casts = bot.iter_casts(USER_FID)
+    assert len(list(islice(casts, 5))) == 5
+    assert feed_requests(bot) == 1
+    rest = list(casts)
+    assert len(rest) == 55
+    assert feed_requests(bot) == 3
+    assert all(cast["author_fid"] == int(USER_FID) for cast in rest)
+
+
+def test_iter_casts_stops_at_since_and_max_count(fake_neynar, monkeypatch):
+    monkeypatch.setattr(farcaster_utils, "CASTS_PAGE_SIZE", 20)
+    server, url = fake_neynar()
+    bot = FarcasterBot(base_url=url, backoff=0.01)
+    # every user casts every 20 minutes
+    recent = list(bot.iter_casts(USER_FID, since=datetime.utcnow() - timedelta(minutes=110)))
+    assert len(recent) == 6
+    assert feed_requests(bot) == 1
+    assert len(list(bot.iter_casts(USER_FID, max_count=25))) == 25
+    # the second page only asks for the 5 casts still wanted
+    assert feed_requests(bot) == 3
+
+
+def test_iter_replies_only_yields_replies(fake_neynar):
+    server, url = fake_neynar()
+    bot = FarcasterBot(base_url=url, backoff=0.01)
+    # every 4th fake cast is a reply, all of those of this user
+    fid = AGENT_FID + 3
+    replies = list(bot.iter_replies(str(fid)))
+    assert len(replies) == 60
+    assert all(reply["parent_hash"] and reply["author_fid"] == fid for reply in replies)
+    assert list(bot.iter_replies(USER_FID)) == []
@@ -0,0 +1,62 @@
+import json
+
+import pandas as pd
+
+from graph_format_utils import (
+    compact_records,
+    dataframe_records,
+    estimate_tokens,
+    format_partitions,
+    format_records,
+    truncate_text,
+)
+
+PROPOSALS = [
+    {"proposalId": i, "yesBalance": 1.5e18 * i, "noBalance": 0.0, "processed": i % 2 == 0, "sponsor": "",
+     "details": json.dumps({"title": f"Proposal {i}", "description": "fund the grants round " * 20,
+                            "contentURI": f"https://example.org/{i}"})}
+    for i in range(40)
+]
+
+
+def test_records_are_compacted():
+    row = compact_records(PROPOSALS[1:2], max_text=30)[0]
+    assert row == {"proposalId": 1, "yesBalance": 1500000000000000000, "noBalance": 0, "processed": False,
+                   "title": "Proposal 1", "description": truncate_text("fund the grants round " * 20, 30),
+                   "link": "https://example.org/1"}
+    assert row["description"].endswith("...") and len(row["description"]) <= 33
+    assert compact_records([{"details": "plain text"}]) == [{"description": "plain text"}]
+
+
+def test_json_stays_parseable_within_the_budget():
+    output = format_records(PROPOSALS, fmt="json", token_budget=300, max_text=40)
+    assert estimate_tokens(output) <= 330
+    parsed = json.loads(output)
+    assert parsed["omitted"] == 40 - len(parsed["rows"])
+    assert [row["proposalId"] for row in parsed["rows"]] == list(range(len(parsed["rows"])))
+    assert json.loads(format_records(PROPOSALS[:2], fmt="json", token_budget=1000))[1]["proposalId"] == 1
+    assert format_records([], fmt="json") == "[]"
+
+
+def test_tables_share_one_header_and_count_the_omitted_rows():
+    lines = format_records(PROPOSALS, fmt="table", token_budget=200, max_text=20).split("\n")
+    assert lines[0] == "proposalId|yesBalance|noBalance|processed|title|description|link"
+    assert lines[-1] == f"... {40 - (len(lines) - 2)} more rows omitted"
+    assert format_records([], fmt="table") == "no results"
+
+
+def test_a_row_larger_than_the_budget_is_still_returned():
+    output = format_records(PROPOSALS[:1], fmt="json", token_budget=1, max_text=500)
+    assert json.loads(output)[0]["title"] == "Proposal 0"
+
+
+def test_dataframe_columns_lose_the_subgrounds_prefix():
+    df = pd.DataFrame({"proposals_proposalId": [1, 2], "proposals_yesBalance": [1.0, 2.5]})
+    assert dataframe_records(df) == [{"proposalId": 1, "yesBalance": 1.0}, {"proposalId": 2, "yesBalance": 2.5}]
+
+
+def test_partitions_split_the_budget():
+    output = format_partitions({"dao a": PROPOSALS, "dao b": PROPOSALS[:1]}, fmt="table", token_budget=200)
+    section_a, section_b = output.split("\ndao b:\n")
+    assert section_a.startswith("dao a:\n") and "more rows omitted" in section_a
+    assert "more rows omitted" not in section_b
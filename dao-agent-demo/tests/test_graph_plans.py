@@ -0,0 +1,68 @@
+import json
+import re
+from datetime import datetime, timezone
+
+import pytest
+
+from graph_utils import QueryPlan, compile_dao_proposals_plan, compile_proposal_plan, decode_proposals, graph_session
+
+NOW = int(datetime.now(timezone.utc).timestamp())
+
+
+def proposal_row(proposal_id: int, dao: str = "0xdao") -> dict:
+    return {"proposalId": str(proposal_id), "yesVotes": "3", "noVotes": "1", "yesBalance": str(25 * 10**17),
+            "noBalance": "0", "createdAt": str(NOW - 3600 * proposal_id), "details": json.dumps({"title": "t"}),
+            "graceEnds": "0", "passed": True, "dao": {"id": dao}}
+
+
+def resolve_by_dao(query, variables):
+    """`first` proposals per dao, aliased fields are answered per alias"""
+    aliases = re.findall(r"(\w+): proposals\(", query) or ["proposals"]
+    data = {}
+    for alias in aliases:
+        dao = variables.get(alias, variables.get("dao"))
+        data[alias] = [proposal_row(i, dao) for i in range(variables["first"])]
+    return {"data": data}
+
+
+def test_a_plan_is_compiled_once_and_run_with_variables(fake_graph):
+    server, url = fake_graph(resolve_by_dao)
+    plan = compile_proposal_plan("{dao: $dao}", "$dao: String!, $first: Int!", url)
+    assert "\n" not in plan.document and "  " not in plan.document
+    assert [row["proposalId"] for row in plan.run(dao="0xa", first=3)] == ["0", "1", "2"]
+    assert len(plan.run(dao="0xb", first=2)) == 2
+    assert [request["variables"] for request in server.requests] == [{"dao": "0xa", "first": 3},
+                                                                     {"dao": "0xb", "first": 2}]
+    assert {request["query"] for request in server.requests} == {plan.document}
+
+
+def test_plans_share_the_pooled_session(fake_graph):
+    server, url = fake_graph(resolve_by_dao)
+    first = compile_proposal_plan("{dao: $dao}", "$dao: String!, $first: Int!", url)
+    second = compile_dao_proposals_plan(2, url=url)
+    assert first.session is second.session is graph_session()
+
+
+def test_one_request_for_the_proposals_of_every_dao(fake_graph):
+    server, url = fake_graph(resolve_by_dao)
+    plan = compile_dao_proposals_plan(3, passed_only=True, url=url)
+    assert "passed: true" in plan.document
+    data = plan.run_all(first=2, dao0="0xa", dao1="0xb", dao2="0xc")
+    assert {alias: {row["dao"]["id"] for row in rows} for alias, rows in data.items()} == \
+        {"dao0": {"0xa"}, "dao1": {"0xb"}, "dao2": {"0xc"}}
+    assert len(server.requests) == 1
+
+
+def test_graphql_errors_raise(fake_graph):
+    server, url = fake_graph(lambda query, variables: {"errors": [{"message": "bad field"}, {"message": "again"}]})
+    with pytest.raises(ValueError, match="bad field; again"):
+        QueryPlan(url, "proposals", "query { proposals { id } }").run()
+
+
+def test_decode_proposals_derives_the_display_fields():
+    df = decode_proposals([proposal_row(2), proposal_row(5, "0xother")])
+    assert list(df["proposalId"]) == ["2", "5"]
+    assert list(df["displayYesBalance"]) == [2.5, 2.5]
+    assert list(df["daoId"]) == ["0xdao", "0xother"]
+    assert abs(df["ageInSeconds"].iloc[1] - df["ageInSeconds"].iloc[0] - 3 * 3600) <= 1
+    assert list(decode_proposals([]).columns) == list(df.columns)
@@ -0,0 +1,25 @@
+from tinydb import TinyDB
+from tinydb.table import Document
+
+from keyword_index_utils import KeywordIndex
+
+
+def test_rows_follow_changes(tmp_path):
+    db = TinyDB(str(tmp_path / "db.json"))
+    index = KeywordIndex(db)
+    index.rebuild([])
+    index.add(1, ["Proposals", "dao"])
+    index.add(2, ["proposal"])
+    index.remove([Document({"keywords": ["dao"]}, doc_id=1)])
+    stored = {row["keyword"]: row["ids"] for row in db.table("keyword_index").all() if "keyword" in row}
+    assert stored == {"proposal": [1, 2]}
+    assert KeywordIndex(db).lookup(["proposals", "dao"]) == [(1, 1), (2, 1)]
+
+
+def test_single_document_index_is_converted(tmp_path):
+    db = TinyDB(str(tmp_path / "db.json"))
+    db.table("keyword_index").insert({"index": {"dao": [1, 3], "vote": [3]}})
+    index = KeywordIndex(db)
+    assert index.loaded
+    assert not any("index" in row for row in db.table("keyword_index").all())
+    assert index.lookup(["dao", "vote"]) == [(3, 2), (1, 1)]
@@ -0,0 +1,42 @@
+import numpy as np
+
+from knowledge_search_utils import BM25Index, KnowledgeSearch
+from memory_storage_utils import SQLiteStorage
+
+RECORDS = [
+    (1, "treasury.md", "The treasury holds 40 ETH. Grants are paid from the treasury every month."),
+    (2, "voting.md", "Members vote on proposals. A proposal passes with a quorum of ten percent."),
+    (5, "meme.md", "Yeeter launches a meme token with a bonding curve."),
+]
+
+
+def test_bm25_save_load_round_trip(tmp_path):
+    index = BM25Index.build(RECORDS, max_words=8)
+    path = str(tmp_path / "knowledge.npz")
+    index.save(path)
+    loaded = BM25Index.load(path)
+    for name, array in index.arrays.items():
+        assert np.array_equal(loaded.arrays[name], array), name
+    for query in ("treasury grants", "proposal quorum", "meme token", "nothing matches"):
+        assert loaded.search(query) == index.search(query)
+
+
+def test_search_sees_records_imported_by_another_process(tmp_path):
+    path = str(tmp_path / "memory.db")
+    index_path = str(tmp_path / "knowledge.npz")
+    storage = SQLiteStorage(path)
+    knowledge = storage.table("knowledge")
+    knowledge.insert({"file_name": "treasury.md", "content": RECORDS[0][2]})
+    search = KnowledgeSearch(knowledge, index_path)
+    assert [hit["file_name"] for hit in search.search("treasury grants")] == ["treasury.md"]
+    assert search.search("meme token bonding curve") == []
+
+    # import_knowledge.py inserts the records and rebuilds the index file from its own connection
+    importer = SQLiteStorage(path)
+    imported = importer.table("knowledge")
+    imported.insert({"file_name": "meme.md", "content": RECORDS[2][2]})
+    KnowledgeSearch(imported, index_path).rebuild()
+    importer.close()
+
+    assert [hit["file_name"] for hit in search.search("meme token bonding curve")] == ["meme.md"]
+    storage.close()
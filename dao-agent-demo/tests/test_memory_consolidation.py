@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from acted_notifications_utils import ActedNotifications
+from memory_consolidation_utils import MemoryConsolidator
+from memory_retention_utils import MemoryRetention
+from memory_storage_utils import SQLiteStorage
+
+# monday 2025-03-03 to sunday 2025-03-23, iso weeks 10 to 12
+FIRST_DAY = datetime(2025, 3, 3, 12)
+DAYS = 21
+
+
+@pytest.fixture
+def retention(agent_env, tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "memory.db"))
+    retention = MemoryRetention(storage, ActedNotifications(str(tmp_path / "acted.log")))
+    retention.memory_vectors.path = str(tmp_path / "memory_vectors.npz")
+    for day in range(DAYS):
+        for i in range(3):
+            timestamp = (FIRST_DAY + timedelta(days=day, minutes=i)).isoformat()
+            retention.store_memory({"type": "memory", "timestamp": timestamp,
+                                    "content": f"Voted yes on proposal {day * 3 + i} of the grants dao."})
+    yield retention
+    storage.close()
+
+
+def consolidate(retention, now):
+    return MemoryConsolidator(retention, use_llm=False, start=False).run_once(now)
+
+
+def summaries(retention):
+    return retention.memories.page(field="type", value="summary")
+
+
+def test_day_summaries_are_rolled_up_by_week(retention):
+    result = consolidate(retention, datetime(2025, 5, 1))
+    assert result["memories"] == 63 and result["summaries"] == 21
+    assert result["rolled_up"] == 21 and result["rollups"] == 3
+    weeks = summaries(retention)
+    assert [(summary["window"], summary["level"], summary["count"]) for summary in weeks] == \
+        [("2025-W10", "week", 21), ("2025-W11", "week", 21), ("2025-W12", "week", 21)]
+    assert weeks[0]["content"].startswith("21 memories (2025-W10): ")
+    assert retention.get_memory_count({"type": "memory"}) == 0
+
+
+def test_week_summaries_are_rolled_up_by_month(retention):
+    consolidate(retention, datetime(2025, 5, 1))
+    result = consolidate(retention, datetime(2025, 8, 1))
+    assert result["summaries"] == 0 and result["rolled_up"] == 3 and result["rollups"] == 1
+    (month,) = summaries(retention)
+    assert (month["window"], month["level"], month["count"]) == ("2025-03", "month", 63)
+    # the proposals survive the summaries of summaries as merged facts
+    assert "proposal 0" in month["content"]
+
+    weeks = retention.get_memory_sources(month["id"])
+    assert [week["window"] for week in weeks] == ["2025-W10", "2025-W11", "2025-W12"]
+    days = retention.get_memory_sources(weeks[0]["id"], archived=True)
+    assert [day["window"] for day in days] == [f"2025-03-{day:02d}" for day in range(3, 10)]
+    originals = retention.get_memory_sources(days[0]["id"], archived=True)
+    assert [memory["type"] for memory in originals] == ["memory"] * 3
+
+
+def test_windows_that_did_not_end_long_enough_ago_are_kept(retention):
+    result = consolidate(retention, datetime(2025, 4, 8))
+    assert result["rolled_up"] == 0
+    assert {summary["level"] for summary in summaries(retention)} == {"day"}
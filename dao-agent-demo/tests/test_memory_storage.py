@@ -0,0 +1,58 @@
+import pytest
+
+from memory_storage_utils import TinyDBStorage, SQLiteStorage
+
+BACKENDS = {
+    "cached": lambda tmp_path: TinyDBStorage(str(tmp_path / "db.json")),
+    "json": lambda tmp_path: TinyDBStorage(str(tmp_path / "db.json"), cached=False),
+    "sqlite": lambda tmp_path: SQLiteStorage(str(tmp_path / "memory.db")),
+}
+
+
+@pytest.fixture(params=list(BACKENDS))
+def memories(request, tmp_path):
+    storage = BACKENDS[request.param](tmp_path)
+    table = storage.table("memories")
+    for i in range(10):
+        table.insert({"type": "memory" if i % 2 else "summary", "content": f"memory {i}", "seq": i})
+    yield table
+    storage.close()
+
+
+def seqs(records):
+    return [record["seq"] for record in records]
+
+
+def test_count(memories):
+    assert memories.count() == 10
+    assert memories.count("type", "memory") == 5
+    assert memories.count("type", "missing") == 0
+
+
+def test_page_limit_offset_and_order(memories):
+    assert seqs(memories.page(limit=3)) == [0, 1, 2]
+    assert seqs(memories.page(limit=3, offset=8)) == [8, 9]
+    assert seqs(memories.page(limit=2, newest_first=True)) == [9, 8]
+    assert len(memories.page()) == 10
+
+
+def test_page_cursor_walks_all_records(memories):
+    seen, cursor = [], None
+    while True:
+        page = memories.page(limit=4, cursor=cursor, newest_first=True)
+        if not page:
+            break
+        seen += seqs(page)
+        cursor = page[-1]["id"]
+    assert seen == list(range(9, -1, -1))
+
+
+def test_page_projects_fields_and_filters(memories):
+    page = memories.page(limit=2, fields=["seq"], field="type", value="memory")
+    assert page == [{"id": page[0]["id"], "seq": 1}, {"id": page[1]["id"], "seq": 3}]
+
+
+def test_removed_ids_are_not_reused(memories):
+    last = memories.last_id()
+    memories.delete([last])
+    assert memories.insert({"type": "memory", "content": "new"}) > last
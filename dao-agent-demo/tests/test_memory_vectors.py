@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from acted_notifications_utils import ActedNotifications
+from memory_consolidation_utils import MemoryConsolidator
+from memory_retention_utils import MemoryRetention
+from memory_storage_utils import TinyDBStorage, SQLiteStorage
+
+BACKENDS = {
+    "tinydb": lambda tmp_path: TinyDBStorage(str(tmp_path / "db.json")),
+    "sqlite": lambda tmp_path: SQLiteStorage(str(tmp_path / "memory.db")),
+}
+
+TOPICS = [
+    "the dao treasury funded the grants round",
+    "members voted on the grants round proposal",
+    "the moloch summoner deployed a new vault",
+]
+
+
+@pytest.fixture(params=list(BACKENDS))
+def retention(request, agent_env, tmp_path):
+    storage = BACKENDS[request.param](tmp_path)
+    retention = MemoryRetention(storage, ActedNotifications(str(tmp_path / "acted.log")))
+    retention.memory_vectors.path = str(tmp_path / "memory_vectors.npz")
+    yield retention
+    storage.close()
+
+
+@pytest.fixture
+def full_syncs(retention, monkeypatch):
+    """Recall once so the vectors are loaded, then count the full syncs"""
+    for i, text in enumerate(TOPICS * 4):
+        retention.store_memory({"type": "memory", "content": f"{text} #{i}"})
+    retention.recall_memories("grants")
+    vectors = retention.memory_vectors
+    calls = []
+    sync = vectors._sync
+    monkeypatch.setattr(vectors, "_sync", lambda records: (calls.append(len(records)), sync(records)))
+    return calls
+
+
+def test_delete_drops_the_vectors_by_id(retention, full_syncs):
+    retention.store_memory({"type": "note", "content": "the moloch summoner note"})
+    assert retention.delete_memory({"type": "note"}) == "Successfully deleted memory"
+    vectors = retention.memory_vectors
+    assert len(vectors.index) == 12
+    assert vectors.watermark == vectors._mark()
+    assert all(memory["type"] == "memory" for memory in retention.recall_memories("moloch summoner note"))
+    assert full_syncs == []
+
+
+def test_update_reembeds_the_updated_memories(retention, full_syncs):
+    retention.store_memory({"type": "note", "content": "nothing in common"})
+    retention.update_memory({"type": "note"}, {"content": "ragequit shares from the guild bank"})
+    best = retention.recall_memories("ragequit shares guild bank", k=1)[0]
+    assert best["type"] == "note"
+    assert retention.memory_vectors.watermark == retention.memory_vectors._mark()
+    assert full_syncs == []
+
+
+def test_clear_empties_the_index(retention, full_syncs):
+    retention.clear_memories()
+    assert len(retention.memory_vectors.index) == 0
+    assert retention.recall_memories("grants") == []
+    assert full_syncs == []
+
+
+def test_foreign_writes_trigger_a_full_sync(retention, full_syncs):
+    retention.memories.insert({"type": "memory", "content": "written by another process"})
+    retention.recall_memories("another process")
+    assert full_syncs == [13]
+
+
+def test_consolidation_swaps_the_topic_vectors_for_the_summary(retention, full_syncs):
+    old = (datetime.utcnow() - timedelta(days=30)).isoformat()
+    for memory in retention.memories.all():
+        retention.memories.update({"timestamp": old}, "content", memory["content"])
+    consolidator = MemoryConsolidator(retention, after=3600, use_llm=False, start=False)
+    result = consolidator.run_once()
+    assert result["memories"] == 12
+    vectors = retention.memory_vectors
+    assert len(vectors.index) == retention.memories.count() == result["summaries"]
+    assert vectors.watermark == vectors._mark()
+    assert all(memory["type"] == "summary" for memory in retention.recall_memories("grants"))
+    assert full_syncs == []
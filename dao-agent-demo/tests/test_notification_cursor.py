@@ -0,0 +1,50 @@
+import json
+
+from conftest import AGENT_FID
+from farcaster_utils import FarcasterBot
+
+
+def notification_requests(bot):
+    return bot.get_latency_stats()["notifications"]["count"]
+
+
+def test_only_new_notifications_are_fetched(fake_neynar):
+    server, url = fake_neynar()
+    bot = FarcasterBot(base_url=url, backoff=0.01)
+    # 40 notifications, two pages of 25
+    assert len(bot.fetch_new_notifications()) == 40
+    assert notification_requests(bot) == 2
+    assert bot.fetch_new_notifications() == []
+    assert notification_requests(bot) == 3
+
+    added = server.state.add_notification(AGENT_FID + 1, "@agent a new one")
+    assert [notification["hash"] for notification in bot.fetch_new_notifications()] == [added["cast"]["hash"]]
+    assert len(bot.get_pending_notifications(fetch=False)) == 41
+
+
+def test_an_interrupted_burst_resumes_at_the_cursor(fake_neynar, agent_env):
+    server, url = fake_neynar()
+    bot = FarcasterBot(base_url=url, backoff=0.01)
+    first = bot.fetch_new_notifications(max_pages=1)
+    assert len(first) == 25
+    state = json.loads((agent_env / "farcaster_state.json").read_text())
+    assert state["cursor"] == "25" and state["newest_seen"] is None
+
+    # a restarted agent picks the cursor up from the state file
+    restarted = FarcasterBot(base_url=url, backoff=0.01)
+    rest = restarted.fetch_new_notifications(max_pages=1)
+    assert len(rest) == 15
+    assert not {n["hash"] for n in first} & {n["hash"] for n in rest}
+    assert restarted.fetch_new_notifications() == []
+    state = json.loads((agent_env / "farcaster_state.json").read_text())
+    assert state["cursor"] is None and state["newest_seen"] is not None
+
+
+def test_discarded_notifications_leave_the_pending_list(fake_neynar):
+    server, url = fake_neynar()
+    bot = FarcasterBot(base_url=url, backoff=0.01)
+    newest = bot.get_pending_notifications()[0]
+    bot.discard_notification(newest["hash"])
+    pending = FarcasterBot(base_url=url).get_pending_notifications(fetch=False)
+    assert len(pending) == 39
+    assert newest["hash"] not in {notification["hash"] for notification in pending}
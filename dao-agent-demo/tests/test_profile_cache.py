@@ -0,0 +1,47 @@
+import time
+
+from farcaster_utils import FarcasterBot, ProfileCache
+
+
+def requests_to(bot, endpoint):
+    return bot.get_latency_stats().get(endpoint, {}).get("count", 0)
+
+
+def test_cache_expires_and_evicts_the_least_recently_used():
+    cache = ProfileCache(ttl=0.05, max_size=2)
+    cache.put({"fid": 1, "username": "one"})
+    cache.put({"fid": 2, "username": "two"})
+    assert cache.get(fid=1)["username"] == "one"
+    cache.put({"fid": 3, "username": "three"})
+    # 2 was used least recently
+    assert cache.get(username="TWO") is None
+    assert cache.get(username="one")["fid"] == 1
+    time.sleep(0.06)
+    assert cache.get(fid=3) is None
+
+
+def test_profiles_are_fetched_once(fake_neynar):
+    server, url = fake_neynar()
+    bot = FarcasterBot(base_url=url, backoff=0.01)
+    assert bot.get_user_by_username("@user3")["fid"] == 3
+    assert bot.get_user_by_username("user3")["fid"] == 3
+    assert requests_to(bot, "user/by_username") == 1
+    # fids cached by username lookups are not fetched again, the rest in one bulk request
+    profiles = bot.get_users_by_fids([3, 4, 5, 4])
+    assert [profile["fid"] for profile in profiles] == [3, 4, 5]
+    assert requests_to(bot, "user/bulk") == 1
+    assert bot.get_users_by_fids([4, 5]) == profiles[1:]
+    assert requests_to(bot, "user/bulk") == 1
+
+
+def test_get_users_mixes_fids_and_usernames(fake_neynar):
+    server, url = fake_neynar()
+    bot = FarcasterBot(base_url=url, backoff=0.01)
+    profiles = bot.get_users(["2", "@user6", "user7", "missing"])
+    assert [profile["fid"] for profile in profiles] == [2, 6, 7]
+    assert requests_to(bot, "user/bulk") == 1
+    assert requests_to(bot, "user/by_username") == 3
+    bot.get_users(["2", "user6", "user7"])
+    assert requests_to(bot, "user/bulk") == 1
+    assert requests_to(bot, "user/by_username") == 3
+    assert bot.profiles.hits >= 3
@@ -0,0 +1,60 @@
+import threading
+import time
+
+from farcaster_utils import FarcasterBot, TokenBucket, PRIORITY_READ, PRIORITY_WRITE
+
+
+def test_bucket_allows_a_burst_then_refills_at_the_rate():
+    bucket = TokenBucket(rate=20, capacity=5)
+    assert all(bucket.try_acquire() == 0 for _ in range(5))
+    assert bucket.try_acquire() > 0
+    waited = bucket.acquire()
+    assert 0.02 < waited < 0.2
+
+
+def test_reads_leave_the_reserve_to_writes():
+    bucket = TokenBucket(rate=0.01, capacity=4, reserve=2)
+    assert bucket.try_acquire(PRIORITY_READ) == 0
+    assert bucket.try_acquire(PRIORITY_READ) == 0
+    assert bucket.try_acquire(PRIORITY_READ) > 0
+    assert bucket.try_acquire(PRIORITY_WRITE) == 0
+    assert bucket.try_acquire(PRIORITY_WRITE) == 0
+
+
+def test_reads_yield_to_a_waiting_write():
+    bucket = TokenBucket(rate=50, capacity=1)
+    bucket.try_acquire(PRIORITY_WRITE)
+    order = []
+    writer = threading.Thread(target=lambda: (bucket.acquire(PRIORITY_WRITE), order.append("write")))
+    writer.start()
+    time.sleep(0.01)
+    bucket.acquire(PRIORITY_READ)
+    order.append("read")
+    writer.join()
+    assert order == ["write", "read"]
+
+
+def test_identical_reads_are_coalesced_when_the_bucket_runs_low(fake_neynar):
+    server, url = fake_neynar()
+    bot = FarcasterBot(base_url=url, backoff=0.01, rate_limits={"read": (1.0, 3, 0)})
+    first = bot.get_casts(limit=5)
+    assert bot.get_casts(limit=5) == first
+    # one token left, the same read is answered from the last response
+    assert bot.get_casts(limit=5) == first
+    assert server.requests == 2
+    assert bot.get_latency_stats()["feed/user/casts"]["coalesced"] == 1
+    # other reads still go out
+    assert len(bot.get_casts(limit=6)) == 6
+    assert server.requests == 3
+
+
+def test_a_429_drains_the_buckets_and_is_retried(fake_neynar):
+    server, url = fake_neynar(rate_limit=5, burst=1)
+    bot = FarcasterBot(base_url=url, backoff=0.01)
+    assert len(bot.get_casts(limit=5)) == 5
+    start = time.monotonic()
+    assert len(bot.get_casts(limit=6)) == 6
+    assert server.rate_limited >= 1
+    # the retry waited for the Retry-After of the server and the drained client buckets
+    assert time.monotonic() - start >= 0.1
+    assert bot.get_latency_stats()["feed/user/casts"]["retries"] >= 1
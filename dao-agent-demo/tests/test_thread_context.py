@@ -0,0 +1,65 @@
+import time
+from datetime import datetime
+
+from conftest import AGENT_FID
+from farcaster_utils import FarcasterBot, parse_notification
+from thread_context_utils import ThreadContext
+
+
+def conversation_requests(bot):
+    return bot.get_latency_stats().get("cast/conversation", {}).get("count", 0)
+
+
+def reply_to(server, parent_hash, fid, text):
+    cast = server.state._make_cast(fid, text, datetime.utcnow(), parent=parent_hash)
+    return parse_notification({"type": "reply", "cast": cast})
+
+
+def test_context_block_has_the_author_thread_and_recent_casts(fake_neynar):
+    server, url = fake_neynar()
+    bot = FarcasterBot(base_url=url, backoff=0.01)
+    reply = next(n for n in bot.fetch_new_notifications() if n["type"] == "reply")
+    context = ThreadContext(bot).get_context(reply)
+    lines = context.split("\n")
+    assert lines[0].startswith(f"author: @{reply['author']} (fid {reply['author_fid']}")
+    assert f"thread {reply['thread_hash']}:" in lines
+    assert f"> @{reply['author']}: {reply['text']}" in lines
+    # the agent cast it replies to is a parent
+    assert any(line.startswith("- @agent: ") for line in lines)
+    assert "recent casts by author:" in lines
+
+
+def test_the_reads_run_in_parallel(fake_neynar):
+    server, url = fake_neynar(latency_ms=100)
+    bot = FarcasterBot(base_url=url, backoff=0.01)
+    notification = bot.get_pending_notifications()[0]
+    start = time.monotonic()
+    assert not ThreadContext(bot).get_context(notification).startswith("Error")
+    # conversation, profile and casts at 100 ms each
+    assert time.monotonic() - start < 0.25
+
+
+def test_threads_are_cached_until_a_reply_is_not_in_them(fake_neynar):
+    server, url = fake_neynar()
+    bot = FarcasterBot(base_url=url, backoff=0.01)
+    agent_cast = next(cast for cast in server.state.casts if cast["author"]["fid"] == AGENT_FID)
+    context = ThreadContext(bot)
+    first = reply_to(server, agent_cast["hash"], AGENT_FID + 1, "first reply")
+    context.get_context(first)
+    context.get_context(first)
+    assert conversation_requests(bot) == 1
+
+    second = reply_to(server, agent_cast["hash"], AGENT_FID + 2, "second reply")
+    assert second["thread_hash"] == first["thread_hash"]
+    assert "> @user3: second reply" in context.get_context(second)
+    assert conversation_requests(bot) == 2
+
+
+def test_expired_threads_are_fetched_again(fake_neynar):
+    server, url = fake_neynar()
+    bot = FarcasterBot(base_url=url, backoff=0.01)
+    notification = bot.get_pending_notifications()[0]
+    context = ThreadContext(bot, ttl=0)
+    context.get_context(notification)
+    context.get_context(notification)
+    assert conversation_requests(bot) == 2
@@ -0,0 +1,99 @@
+import json
+
+import pytest
+import requests
+
+from conftest import AGENT_FID
+from farcaster_utils import FarcasterBot
+from farcaster_webhook_utils import NotificationWebhook, SIGNATURE_HEADER, sign_payload, verify_signature
+from replay_webhook_events import replay_events, synthetic_events
+
+SECRET = "webhook secret"
+
+
+@pytest.fixture
+def webhook(agent_env):
+    webhook = NotificationWebhook(secret=SECRET, port=0, agent_fid=AGENT_FID)
+    webhook.start()
+    yield webhook
+    webhook.stop()
+
+
+def post(webhook, event, secret=SECRET):
+    body = json.dumps(event).encode()
+    return requests.post(f"http://127.0.0.1:{webhook.port}/", data=body,
+                         headers={SIGNATURE_HEADER: sign_payload(body, secret)}, timeout=5)
+
+
+def test_verify_signature():
+    body = b'{"type": "cast.created"}'
+    assert verify_signature(body, sign_payload(body, SECRET), SECRET)
+    assert not verify_signature(body, sign_payload(body, "other secret"), SECRET)
+    assert not verify_signature(body + b" ", sign_payload(body, SECRET), SECRET)
+    assert not verify_signature(body, None, SECRET)
+
+
+def test_replayed_events_reach_the_pending_notifications(fake_neynar):
+    server, url = fake_neynar()
+    bot = FarcasterBot(base_url=url)
+    webhook = NotificationWebhook(secret=SECRET, port=0, agent_fid=AGENT_FID,
+                                  on_notification=bot.add_pending_notification)
+    webhook.start()
+    try:
+        events = synthetic_events(6, AGENT_FID)
+        replay_events(f"http://127.0.0.1:{webhook.port}/", SECRET, events)
+        received = [webhook.wait(1) for _ in events]
+        assert [notification["hash"] for notification in received] == [event["data"]["hash"] for event in events]
+        assert [notification["type"] for notification in received] == ["mention", "reply"] * 3
+        pending = {notification["hash"] for notification in bot.get_pending_notifications(fetch=False)}
+        assert pending == {event["data"]["hash"] for event in events}
+        assert webhook.received == 6 and webhook.rejected == 0
+    finally:
+        webhook.stop()
+
+
+def test_bad_signatures_are_rejected(webhook):
+    replay_events(f"http://127.0.0.1:{webhook.port}/", SECRET, synthetic_events(3, AGENT_FID), bad_signature=True)
+    assert post(webhook, synthetic_events(1, AGENT_FID)[0], secret="other secret").status_code == 401
+    assert webhook.rejected == 4 and webhook.received == 0
+    assert webhook.queue.empty()
+
+
+def test_casts_not_for_the_agent_are_ignored(webhook):
+    own, unrelated = synthetic_events(2, AGENT_FID)
+    own["data"]["author"]["fid"] = AGENT_FID
+    unrelated["data"]["parent_author"] = {"fid": AGENT_FID + 5}
+    for event in (own, unrelated, {"type": "reaction.created", "data": {}}):
+        assert post(webhook, event).status_code == 200
+    assert webhook.received == 3
+    assert webhook.queue.empty()
+
+
+def test_binds_localhost_unless_configured(agent_env, monkeypatch):
+    assert NotificationWebhook(secret=SECRET, agent_fid=AGENT_FID).host == "127.0.0.1"
+    monkeypatch.setenv("WEBHOOK_HOST", "0.0.0.0")
+    assert NotificationWebhook(secret=SECRET, agent_fid=AGENT_FID).host == "0.0.0.0"
+
+
+@pytest.mark.parametrize("event", [[1], "cast.created", None])
+def test_non_object_events_get_a_400(webhook, event):
+    assert post(webhook, event).status_code == 400
+    assert webhook.queue.empty()
+
+
+def test_casts_that_are_not_objects_are_ignored(webhook):
+    assert post(webhook, {"type": "cast.created", "data": [1]}).status_code == 200
+    assert webhook.queue.empty()
+
+
+@pytest.mark.parametrize("missing", [("timestamp",), ("author", "username")])
+def test_casts_missing_fields_get_a_400_and_the_receiver_keeps_serving(webhook, missing):
+    event = synthetic_events(1, AGENT_FID)[0]
+    broken = json.loads(json.dumps(event))
+    fields = broken["data"]
+    for key in missing[:-1]:
+        fields = fields[key]
+    del fields[missing[-1]]
+    assert post(webhook, broken).status_code == 400
+    assert post(webhook, event).status_code == 200
+    assert webhook.wait(1)["hash"] == event["data"]["hash"]
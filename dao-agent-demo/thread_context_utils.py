@@ -0,0 +1,161 @@
+import threading
+
+from time import monotonic
+from typing import List, Dict, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from graph_format_utils import truncate_text
+
+# assembled thread context is reused this long, a reply that is not in the cached thread refreshes it
+THREAD_CONTEXT_TTL_SEC = 300
+THREAD_CONTEXT_CACHE_SIZE = 200
+# recent casts of the mention author included in the context
+AUTHOR_CASTS = 5
+# max characters per cast text in the context block
+CONTEXT_MAX_TEXT = 200
+
+
+class ThreadContext:
+    def __init__(self, bot, ttl: float = THREAD_CONTEXT_TTL_SEC, max_size: int = THREAD_CONTEXT_CACHE_SIZE,
+                 author_casts: int = AUTHOR_CASTS, max_text: int = CONTEXT_MAX_TEXT):
+        """
+        Prefetch and cache what the agent reads before replying to a mention
+        The thread around the mention, the author profile and the author's recent casts are fetched in
+        parallel and rendered as one compact text block, cached by thread hash.
+        Args:
+            bot: FarcasterBot or SyncFarcasterBot
+            ttl (float): Seconds a fetched thread is reused
+            max_size (int): Max cached threads
+            author_casts (int): Number of recent author casts included
+            max_text (int): Max characters per cast text
+        """
+        print("initializing thread context")
+        self.bot = bot
+        self.ttl = ttl
+        self.max_size = max_size
+        self.author_casts = author_casts
+        self.max_text = max_text
+        # api reads run on `executor`, `assembler` waits on them, separate pools so waiting never starves reads
+        self.executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix="thread-context")
+        self.assembler = ThreadPoolExecutor(max_workers=2, thread_name_prefix="thread-context-assembler")
+        # thread hash -> (fetched at, future of the context parts)
+        self.cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _fetch(self, notification: Dict) -> Dict:
+        """
+        Fetch the thread, profile and recent casts of a notification in parallel
+        Returns:
+            Dict: conversation, author profile and author casts (errors are kept as strings)
+        """
+        author_fid = notification['author_fid']
+        conversation = self.executor.submit(self.bot.get_conversation, notification['hash'])
+        profiles = self.executor.submit(self.bot.get_users_by_fids, [author_fid])
+        casts = self.executor.submit(self.bot.get_casts, str(author_fid), self.author_casts, False)
+        profiles = profiles.result()
+        return {
+            "conversation": conversation.result(),
+            "author": profiles[0] if isinstance(profiles, list) and profiles else None,
+            "author_casts": casts.result(),
+        }
+
+    def prefetch(self, notification: Dict) -> Future:
+        """
+        Start fetching the context of a notification, cached fetches are reused
+
+        Args:
+            notification (Dict): A parsed notification
+
+        Returns:
+            Future: Resolves to the context parts
+        """
+        thread_hash = notification.get('thread_hash') or notification['hash']
+        now = monotonic()
+        with self.lock:
+            cached = self.cache.get(thread_hash)
+            if cached and now - cached[0] <= self.ttl and self._covers(cached[1], notification):
+                self.cache.move_to_end(thread_hash)
+                return cached[1]
+            future = self.assembler.submit(self._fetch, notification)
+            self.cache[thread_hash] = (now, future)
+            self.cache.move_to_end(thread_hash)
+            while len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+            return future
+
+    def _covers(self, future: Future, notification: Dict) -> bool:
+        """
+        Returns:
+            bool: False if a finished fetch is for another cast of the thread that does not include this one
+        """
+        if not future.done() or future.exception() is not None:
+            return not future.done()
+        parts = future.result()
+        conversation = parts["conversation"]
+        if not isinstance(conversation, dict) or not conversation.get("cast"):
+            return False
+        hashes = {conversation["cast"]["hash"]}
+        hashes.update(cast["hash"] for cast in conversation["parents"] + conversation["replies"])
+        return notification['hash'] in hashes and parts["author"] is not None \
+            and parts["author"].get("fid") == notification['author_fid']
+
+    def get_context(self, notification: Dict, timeout: float = 20) -> str:
+        """
+        Get the compact context block of a notification
+
+        Args:
+            notification (Dict): A parsed notification
+            timeout (float): Max seconds to wait for the fetch
+
+        Returns:
+            str: The context block
+        """
+        try:
+            parts = self.prefetch(notification).result(timeout=timeout)
+            return self.render(notification, parts)
+        except Exception as e:
+            return f"Error getting thread context: {str(e)}"
+
+    def _line(self, cast: Dict, marker: str = "-") -> str:
+        return f"{marker} @{cast['author']}: {truncate_text(cast['text'], self.max_text)}"
+
+    def render(self, notification: Dict, parts: Dict) -> str:
+        """
+        Render the context parts as a compact text block
+
+        Args:
+            notification (Dict): The notification
+            parts (Dict): conversation, author and author_casts
+
+        Returns:
+            str: The context block
+        """
+        lines: List[str] = []
+        author: Optional[Dict] = parts["author"]
+        if author:
+            address = next(iter(author.get("verified_addresses") or []), None)
+            lines.append(f"author: @{author['username']} (fid {author['fid']}, {author.get('follower_count', 0)} followers"
+                         + (f", {address}" if address else "") + ")")
+            if author.get("bio"):
+                lines.append(f"bio: {truncate_text(author['bio'], self.max_text)}")
+
+        conversation = parts["conversation"]
+        if isinstance(conversation, dict) and conversation.get("cast"):
+            lines.append(f"thread {notification.get('thread_hash') or notification['hash']}:")
+            lines.extend(self._line(cast) for cast in conversation["parents"])
+            lines.append(self._line(conversation["cast"], ">"))
+            lines.extend(self._line(cast, "  -") for cast in conversation["replies"])
+        else:
+            lines.append(self._line(notification, ">"))
+
+        casts = parts["author_casts"]
+        if isinstance(casts, list) and casts:
+            lines.append("recent casts by author:")
+            lines.extend(f"- {truncate_text(cast['text'], self.max_text)}" for cast in casts)
+        return "\n".join(lines)
+
+    def clear(self):
+        """Drop all cached threads"""
+        with self.lock:
+            self.cache.clear()